@@ -3,13 +3,28 @@
 @author: Filip Lindau
 """
 import sys
+import os
+import fcntl
+import select
 import PyTango
 import Superlogics8080_control as sc
+import Superlogics8080_bus as sb
+import Superlogics8080_history as sh
+import Superlogics8080_scheduler as ssched
+import Superlogics8080_store as sst
+import Superlogics8080_alarm as salarm
+import Superlogics8080_async as sasync
+import Superlogics8080_engine as sengine
+import Superlogics8080_capture as scap
 import threading
 import logging
 import time
 import numpy as np
 import Queue
+import collections
+
+# Upper limit of the historyDepth property, sets the size of the history spectrum attributes
+MAX_HISTORY_DEPTH = 100000
 
 logging.basicConfig(format='%(asctime)s - %(module)s.   %(funcName)s - %(levelname)s - %(message)s', level=logging.INFO)
 
@@ -18,6 +33,20 @@ class Command:
     def __init__(self, command, data=None):
         self.command = command
         self.data = data
+        self.time = time.time()
+
+
+# Immutable reading published by the state thread. Attribute reads pick up the
+# latest one without taking any lock.
+FrequencySnapshot = collections.namedtuple('FrequencySnapshot', ['value', 'quality', 'timestamp'])
+
+
+def makeSnapshot(value, timestamp):
+    """Snapshot of a frequency reading. None is stored as an invalid reading.
+    """
+    if value is None:
+        return FrequencySnapshot(0, PyTango.AttrQuality.ATTR_INVALID, timestamp)
+    return FrequencySnapshot(value, PyTango.AttrQuality.ATTR_VALID, timestamp)
 
 # ==================================================================
 #   Superlogics8080DS Class Description:
@@ -61,6 +90,18 @@ class Superlogics8080DS(PyTango.Device_4Impl):
 # ------------------------------------------------------------------
     def init_device(self):
         self.streamLock = threading.Lock()
+        self.logger = self.get_logger()
+        self.logLimits = {}
+        # logLimited is called from the polling thread, engine workers and clients
+        self.logLock = threading.Lock()
+        self.loopCount = 0
+        self.readCount = 0
+        self.errorCount = 0
+        self.commandLatency = 0.0
+        self.commandLatencyMax = 0.0
+        self.faultStartTime = None
+        self.recoveryTime = 0.0
+        self.recoveryCount = 0
         with self.streamLock:
             self.info_stream(''.join(("In ", self.get_name(), "::init_device()")))
         self.set_state(PyTango.DevState.UNKNOWN)
@@ -76,46 +117,245 @@ class Superlogics8080DS(PyTango.Device_4Impl):
 
 
         self.attrLock = threading.Lock()
+        # Module addresses are 0-255, the default address 1 is used if none is valid
+        addresses = [int(adr) for adr in self.addresses if adr >= 0 and adr <= 0xff]
+        if len(addresses) == 0 or len(addresses) != len(self.addresses):
+            if len(addresses) == 0:
+                addresses = [1]
+            with self.streamLock:
+                self.error_stream(''.join(('Invalid module addresses ', str(list(self.addresses)),
+                                           ', using ', str(addresses))))
+        self.addresses = addresses
+        if self.mode not in ['frequency', 'counter']:
+            with self.streamLock:
+                self.error_stream(''.join(('Unknown mode ', str(self.mode), ', using frequency')))
+            self.mode = 'frequency'
+        # Same lower limit as the PollRate attribute, NaN fails the test too
+        if not self.pollRate >= 0.01:
+            with self.streamLock:
+                self.error_stream(''.join(('Invalid poll rate ', str(self.pollRate), ' Hz, using 5 Hz')))
+            self.pollRate = 5.0
+        self.inputMode = None
+        t = time.time()
+        self.frequencySnapshot = makeSnapshot(None, t)
+        self.frequencySnapshotDict = dict([(adr, self.frequencySnapshot) for adr in self.addresses])
+        self.dataReadyCounter = 0
+        self.frequencyDevice = None
+        self.forceReopen = False
+        self.bus = None
+        self.lastGoodBaudrate = self.baudrate
+        self.linkBaudrate = None
+        depth = max(1, min(self.historyDepth, MAX_HISTORY_DEPTH))
+        self.history = sh.FrequencyHistory(depth, self.statisticsWindow)
+        self.statisticsSnapshot = self.history.getStatistics()
+        # Raw counts of both channels per address in counter mode
+        self.counterHistories = dict([(adr, sh.CounterHistory(depth)) for adr in self.addresses])
+        # Every valid reading is appended to the sample store file, if there is one
+        self.store = None
+        if self.storeFile != '':
+            try:
+                self.store = sst.SampleStore(self.storeFile, self.storeSize * 1024 * 1024)
+            except Exception, ex:
+                with self.streamLock:
+                    self.error_stream(''.join(('Could not open sample store ', self.storeFile, ': ', str(ex))))
+        # Raw serial traffic is recorded to captureFile, and the port replaced by
+        # a replay of replayFile, if they are set
+        self.capture = None
+        if self.captureFile != '':
+            try:
+                self.capture = scap.CaptureWriter(self.captureFile)
+            except Exception, ex:
+                with self.streamLock:
+                    self.error_stream(''.join(('Could not open capture file ', self.captureFile, ': ', str(ex))))
+        self.replay = None
+        if self.replayFile != '':
+            try:
+                self.replay = scap.CaptureReplay(self.replayFile, self.replaySpeed, loop=True)
+            except Exception, ex:
+                with self.streamLock:
+                    self.error_stream(''.join(('Could not open replay file ', self.replayFile, ': ', str(ex))))
+        self.scheduler = ssched.DeadlineScheduler(1.0 / self.pollRate)
+        # Limits checked on every reading of the first address, see evaluateAlarm
+        self.alarm = salarm.AlarmLimits(self.alarmMin, self.alarmMax, self.alarmRateMax,
+                                        self.alarmHysteresis, self.alarmRateHysteresis)
+        self.addFrequencyAttributes()
+        # Change and archive events are pushed from the state thread. Tango checks
+        # them against the abs_change/rel_change attribute properties.
+        self.set_change_event('Frequency', True, True)
+        self.set_archive_event('Frequency', True, True)
+        self.set_data_ready_event('Frequency', True)
+        self.set_change_event('State', True, False)
         self.eventIdList = []
-        self.stateThread = threading.Thread()
-        threading.Thread.__init__(self.stateThread, target=self.stateHandlerDispatcher)
+        # The state machine runs in a thread of its own, or in steps on the I/O
+        # engine shared by all devices of the server if engineWorkers > 0
+        self.engine = None
+        self.stepper = None
+        self.asyncDevice = None
+        self.pollInFlight = False
+        self.pollTimer = None
+        self.pollLock = threading.Lock()
+        if self.engineWorkers > 0:
+            self.engine = sengine.sharedEngine(self.engineWorkers)
+            self.stepper = sengine.StateStepper(self.engine, self.engineStep)
+            self.asyncDevice = sasync.AsyncSuperlogics8080_control(self.engine.loop, self.port, connect=False)
+        else:
+            self.stateThread = threading.Thread()
+            threading.Thread.__init__(self.stateThread, target=self.stateHandlerDispatcher)
 
         self.commandQueue = Queue.Queue(100)
-
-        self.stateHandlerDict = {PyTango.DevState.ON: self.onHandler,
-                                 PyTango.DevState.MOVING: self.onHandler,
-                                 PyTango.DevState.ALARM: self.onHandler,
-                                 PyTango.DevState.FAULT: self.faultHandler,
-                                 PyTango.DevState.INIT: self.initHandler,
-                                 PyTango.DevState.UNKNOWN: self.unknownHandler,
-                                 PyTango.DevState.OFF: self.offHandler}
+        # Written to when a command is queued, so that the state thread can wait
+        # for commands with select and wake up at once
+        self.commandWakeup = os.pipe()
+        fcntl.fcntl(self.commandWakeup[0], fcntl.F_SETFL, os.O_NONBLOCK)
+
+        # Handler called when a state is entered, and step called repeatedly while in it
+        self.stateHandlerDict = {PyTango.DevState.ON: (self.onHandler, self.onStep),
+                                 PyTango.DevState.MOVING: (self.onHandler, self.onStep),
+                                 PyTango.DevState.ALARM: (self.onHandler, self.onStep),
+                                 PyTango.DevState.FAULT: (self.faultHandler, self.faultStep),
+                                 PyTango.DevState.INIT: (self.initHandler, self.initStep),
+                                 PyTango.DevState.UNKNOWN: (self.unknownHandler, self.unknownStep),
+                                 PyTango.DevState.OFF: (self.offHandler, self.offStep)}
+        self.stepHandler = None
+        self.stepState = self.get_state()
 
         self.stopStateThreadFlag = False
 
-        self.stateThread.start()
+        if self.stepper is not None:
+            self.stepper.start()
+        else:
+            self.stateThread.start()
+
+    def addFrequencyAttributes(self):
+        """Adds one FrequencyAA attribute per module address on the bus.
+        """
+        for adr in self.addresses:
+            name = ''.join(('Frequency', str(adr).zfill(2)))
+            attr = PyTango.Attr(name, PyTango.DevLong, PyTango.READ)
+            prop = PyTango.UserDefaultAttrProp()
+            prop.set_description(''.join(('Detected frequency of module at address ', str(adr))))
+            prop.set_unit('Hz')
+            prop.set_abs_change('1')
+            prop.set_archive_abs_change('1')
+            attr.set_default_properties(prop)
+            try:
+                self.add_attribute(attr, self.read_FrequencyAddress, None, self.is_Frequency_allowed)
+            except PyTango.DevFailed:
+                # Attribute already added in a previous init
+                pass
+            self.set_change_event(name, True, True)
+            self.set_archive_event(name, True, True)
+
+    def pushFrequencyEvents(self, name, snap):
+        """Push change and archive events for a frequency attribute with the
+        acquisition timestamp of the snapshot.
+        """
+        try:
+            self.push_change_event(name, snap.value, snap.timestamp, snap.quality)
+            self.push_archive_event(name, snap.value, snap.timestamp, snap.quality)
+        except PyTango.DevFailed, ex:
+            self.logLimited(self.error_stream, ''.join(('Could not push event for ', name, ': ', str(ex))),
+                            ''.join(('push', name)))
+
+    def logLimited(self, stream, msg, key=None, interval=10.0):
+        """Log msg to stream at most once per interval for the same key (msg if None).
+        The number of messages dropped in between is added to the next one that is logged.
+        """
+        if key is None:
+            key = msg
+        t = time.time()
+        with self.logLock:
+            last, suppressed = self.logLimits.get(key, (0.0, 0))
+            if t - last < interval:
+                self.logLimits[key] = (last, suppressed + 1)
+                return
+            self.logLimits[key] = (t, 0)
+        if suppressed > 0:
+            msg = ''.join((msg, ' (', str(suppressed), ' similar messages suppressed)'))
+        with self.streamLock:
+            stream(msg)
 
     def stateHandlerDispatcher(self):
-        """Handles switch of states in the state machine thread.
-        Each state handled method should exit by setting the next state,
-        going back to this method. The previous state is also included when
-        calling the next state handler method.
-        The thread is stopped by setting the stopStateThreadFlag.
+        """Runs the state machine in the state thread, handling commands
+        between the steps. The thread is stopped by setting the stopStateThreadFlag.
         """
-        prevState = self.get_state()
         while self.stopStateThreadFlag is False:
-            try:
-                self.stateHandlerDict[self.get_state()](prevState)
-                prevState = self.get_state()
-            except KeyError:
-                self.stateHandlerDict[PyTango.DevState.UNKNOWN](prevState)
-                prevState = self.get_state()
+            delay = self.runStateStep()
+            if self.stopStateThreadFlag is True:
+                break
+            if delay is None:
+                delay = 1.0
+            self.checkCommands(blockTime=delay)
+
+    def engineStep(self):
+        """Runs one step of the state machine on the shared engine, the
+        counterpart of one turn of the stateHandlerDispatcher loop.
+        """
+        if self.stopStateThreadFlag is True:
+            return None
+        if self.pollInFlight is True and self.cancelPoll() is False:
+            # The port belongs to the event loop until the poll is done,
+            # commands are handled when the results come back
+            return None
+        if self.get_state() in [PyTango.DevState.UNKNOWN, PyTango.DevState.INIT, PyTango.DevState.FAULT]:
+            # Opening and probing the port wait for seconds on silent modules,
+            # they run in a thread of their own instead of holding an engine worker
+            self.stepper.runBlocking(self.commandsAndStep)
+            return None
+        return self.commandsAndStep()
+
+    def commandsAndStep(self):
+        self.checkCommands()
+        return self.runStateStep()
+
+    def runStateStep(self):
+        """Runs one step of the handler of the current state. When the state
+        has a new handler its entry method is called first, with the previous state.
+
+        output:
+            Time in s until the next step, None to wait for a command
+        """
+        state = self.get_state()
+        handler, step = self.stateHandlerDict.get(state, self.stateHandlerDict[PyTango.DevState.UNKNOWN])
+        if handler != self.stepHandler:
+            self.stepHandler = handler
+            handler(self.stepState)
+        self.stepState = state
+        return step()
 
     def stopThread(self):
-        """Stops the state handler thread by setting the stopStateThreadFlag
+        """Stops the state handler thread, or the steps on the engine, by
+        setting the stopStateThreadFlag
         """
         self.stopStateThreadFlag = True
-        self.stateThread.join(3)
-        self.frequencyDevice.close()
+        if self.stepper is not None:
+            self.stepper.stop(3)
+            self.cancelPoll()
+            if self.asyncDevice is not None:
+                try:
+                    self.engine.loop.callAndWait(self.asyncDevice.detach)
+                except Exception, ex:
+                    self.error_stream(''.join(('Could not detach the port from the engine: ', str(ex))))
+        else:
+            self.wakeStateThread()
+            self.stateThread.join(3)
+        for fd in self.commandWakeup:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self.commandWakeup = ()
+        if self.frequencyDevice is not None:
+            self.frequencyDevice.close()
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+        if self.capture is not None:
+            self.capture.close()
+            self.capture = None
+        if self.replay is not None:
+            self.replay.close()
+            self.replay = None
 
     def unknownHandler(self, prevState):
         """Handles the UNKNOWN state, before communication with the hardware devices
@@ -123,183 +363,465 @@ class Superlogics8080DS(PyTango.Device_4Impl):
         """
         with self.streamLock:
             self.info_stream('Entering unknownHandler')
-        connectionTimeout = 1.0
         self.set_status('Connecting to frequency counter')
+        if prevState != PyTango.DevState.UNKNOWN:
+            self.markFault()
+        self.connectAttempt = 0
 
-        # Need to connect to frequency counter
-
-        while self.stopStateThreadFlag is False:
-            # Frequency counter:
-            try:
-                with self.streamLock:
-                    self.info_stream('Closing old frequency device')
-                self.frequencyDevice.close()
-            except:
-                pass
-            try:
+    def unknownStep(self):
+        # Need to connect to frequency counter. An existing port handle is reused
+        # if it still works, keeping the cached module configuration.
+        try:
+            if self.frequencyDevice is None:
                 with self.streamLock:
                     self.info_stream(''.join(('Opening frequency device on port ', self.port)))
-                self.frequencyDevice = sc.Superlogics8080_control(self.port)
-            except Exception, ex:
-                with self.streamLock:
-                    self.error_stream(''.join(('Could not connect to frequency counter ', self.port)))
-                with self.streamLock:
-                    self.error_stream(str(ex))
-                self.set_status('Could not connect to frequency counter')
-                self.checkCommands(blockTime=connectionTimeout)
-                continue
-            self.set_state(PyTango.DevState.INIT)
-            break
+                # Probing is done in initHandler
+                transport = None
+                if self.replay is not None:
+                    transport = self.replay.open
+                self.frequencyDevice = sc.Superlogics8080_control(self.port, self.lastGoodBaudrate, probe=False,
+                                                                   checksum=self.checksum, capture=self.capture,
+                                                                   transport=transport)
+                self.bus = sb.Superlogics8080_bus(self.frequencyDevice, self.addresses, mode=self.mode)
+            elif self.forceReopen is True:
+                self.frequencyDevice.connect()
+            else:
+                self.frequencyDevice.reconnect()
+            self.forceReopen = False
+        except Exception, ex:
+            self.logLimited(self.error_stream, ''.join(('Could not connect to frequency counter ',
+                                                        self.port, ': ', str(ex))), 'connect')
+            self.set_status('Could not connect to frequency counter')
+            # Jittered exponential backoff, 0.1 s doubling up to 10 s
+            self.connectAttempt += 1
+            return sc.backoffDelay(self.connectAttempt - 1, 0.1, 10.0)
+        self.set_state(PyTango.DevState.INIT)
+        return 0
+
+    def markFault(self):
+        """Start the time to recover clock, if it is not already running.
+        """
+        if self.faultStartTime is None:
+            self.faultStartTime = time.time()
+
+    def markRecovered(self):
+        """Stop the time to recover clock when readings work again.
+        """
+        if self.faultStartTime is not None:
+            self.recoveryTime = time.time() - self.faultStartTime
+            self.recoveryCount += 1
+            self.faultStartTime = None
 
     def initHandler(self, prevState):
         """Handles the INIT state. Query Halcyon device to see if it is alive.
         """
         with self.streamLock:
             self.info_stream('Entering initHandler')
-        waitTime = 1.0
         self.set_status('Initializing device')
-        retries = 0
-        maxTries = 5
+        self.initRetries = 0
 
-        while self.stopStateThreadFlag is False:
-            retries += 1
-            if retries > maxTries:
-                self.set_state(PyTango.DevState.UNKNOWN)
-                break
+    def initStep(self):
+        maxTries = 5
+        self.initRetries += 1
+        if self.initRetries > maxTries:
+            self.set_state(PyTango.DevState.UNKNOWN)
+            return 0
+        try:
+            with self.streamLock:
+                self.info_stream('Trying to connect...')
+            # Find the baud rate the modules are using. The current rate is tried first,
+            # and a configuration cached at that rate is kept unless the module stopped answering.
+            self.linkBaudrate = None
+            for adr in self.addresses:
+                if self.commandInterrupt([PyTango.DevState.INIT]) is True:
+                    return 0
+                self.linkBaudrate = self.frequencyDevice.probeBaudrate(adr, refresh=False)
+                if self.linkBaudrate is not None:
+                    break
+            if self.linkBaudrate is None:
+                raise(ValueError('No module answered at any baud rate'))
+            self.lastGoodBaudrate = self.linkBaudrate
+
+            # Check configuration of each module, read in one batch, and set it to
+            # the mode property if not. A module that does not answer is marked
+            # faulty on the bus, the others are still used.
+            configured = 0
+            configurations = self.frequencyDevice.getConfigurations(self.addresses)
+            for adr in self.addresses:
+                if self.commandInterrupt([PyTango.DevState.INIT]) is True:
+                    return 0
+                try:
+                    self.configuration = configurations[adr]
+                    if isinstance(self.configuration, Exception):
+                        raise self.configuration
+                    if self.configuration[1] != self.mode:
+                        self.frequencyDevice.setConfiguration(adr, self.mode, self.linkBaudrate)
+                        self.configuration = self.frequencyDevice.getConfiguration(adr)
+                    self.bus.markOk(adr)
+                    configured += 1
+                except Exception, ex:
+                    self.logLimited(self.error_stream,
+                                    ''.join(('Error initializing module at address ', str(adr), ': ', str(ex))),
+                                    ''.join(('init', str(adr))))
+                    self.bus.markError(adr, ex)
+            if configured == 0:
+                raise(ValueError('No module answered'))
             try:
-                with self.streamLock:
-                    self.info_stream('Trying to connect...')
-                self.frequency = 0
-                # Check configuration and set it to frequency if not:
-                self.configuration = self.frequencyDevice.getConfiguration(01)
-                if self.configuration[1] != 'frequency':
-                    self.frequencyDevice.setConfiguration(01, 'frequency')
-                    self.configuration = self.frequencyDevice.getConfiguration(01)
+                self.inputMode = self.frequencyDevice.getInputMode(self.addresses[0])[1]
+            except Exception:
+                self.inputMode = None
 
-            except Exception, ex:
-                with self.streamLock:
-                    self.error_stream(''.join(('Error when initializing device')))
-                    self.error_stream(str(ex))
-                self.checkCommands(blockTime=waitTime)
-                continue
+            if self.targetBaudrate > 0 and self.targetBaudrate != self.linkBaudrate:
+                self.negotiateBaudrate(self.targetBaudrate)
 
-            self.set_state(PyTango.DevState.ON)
-            break
+        except Exception, ex:
+            self.logLimited(self.error_stream, ''.join(('Error when initializing device: ', str(ex))), 'init')
+            return sc.backoffDelay(self.initRetries - 1, 0.1, 5.0)
+
+        self.markRecovered()
+        self.set_state(PyTango.DevState.ON)
+        return 0
+
+    def negotiateBaudrate(self, baudrate):
+        """Switch the modules that answer, and the port, to baudrate. The link
+        falls back to the last known good rate if it does not work.
+        """
+        addresses = [adr for adr in self.addresses if adr not in self.bus.faultyAddresses()]
+        with self.streamLock:
+            self.info_stream(''.join(('Switching link to ', str(baudrate), ' baud')))
+        if self.frequencyDevice.setLinkSpeed(addresses, baudrate) is False:
+            with self.streamLock:
+                self.error_stream(''.join(('Link did not work at ', str(baudrate), ' baud, back at ',
+                                           str(self.frequencyDevice.baudrate), ' baud')))
+        self.linkBaudrate = self.frequencyDevice.baudrate
+        self.lastGoodBaudrate = self.linkBaudrate
 
     def onHandler(self, prevState):
         """Handles the ON state. Connected to the Halcyon driver.
-        Waits in a loop checking commands.
         """
         with self.streamLock:
             self.info_stream('Entering onHandler')
-        handledStates = [PyTango.DevState.ON, PyTango.DevState.ALARM, PyTango.DevState.MOVING]
-        waitTime = 0.2
         self.set_status('On')
-        while self.stopStateThreadFlag is False:
-            self.info_stream('onhandler loop')
-            state = self.get_state()
-            self.info_stream(''.join(('State: ', str(state))))
-            if state not in handledStates:
-                break
+        self.alarm.reset()
+        # Polls start on the scheduler time grid. Commands are handled while waiting for the next deadline.
+        self.scheduler.start()
+
+    def onStep(self):
+        wait = self.scheduler.timeToDeadline()
+        if self.engine is not None:
+            # On the engine the poll is started by a timer in the event loop
+            # thread, without waking up a worker
+            with self.pollLock:
+                self.pollInFlight = True
+                self.pollTimer = self.engine.loop.callLater(max(wait, 0), self.startPoll)
+            return None
+        if wait > 0:
+            return wait
+        self.scheduler.cycleStarted()
+        self.loopCount += 1
+
+        # Read frequency from the frequency counters on the bus
+        self.processPoll(self.bus.pollCycle(self.commandPending))
+        return max(self.scheduler.timeToDeadline(), 0)
+
+    def startPoll(self):
+        """Starts a poll cycle on the engine, in the event loop thread. The port
+        is lent to the event loop until a command or a state change needs it back,
+        see pollDone.
+        """
+        with self.pollLock:
+            if self.pollTimer is None or self.stopStateThreadFlag is True:
+                return
+            self.pollTimer = None
+        self.scheduler.cycleStarted()
+        self.loopCount += 1
+        if self.asyncDevice.attached is not self.frequencyDevice:
+            self.asyncDevice.attach(self.frequencyDevice)
+        self.bus.pollCycleAsync(self.asyncDevice, self.pollDone)
+
+    def cancelPoll(self):
+        """Cancels a poll on the engine that has not started yet, and takes the
+        port back from the event loop.
+
+        output:
+            True if there is no poll in flight any more
+        """
+        with self.pollLock:
+            if self.pollTimer is None:
+                return self.pollInFlight is False
+            self.engine.loop.cancelTimer(self.pollTimer)
+            self.pollTimer = None
+            self.pollInFlight = False
+        self.engine.loop.callAndWait(self.asyncDevice.detach)
+        return True
 
-            # Read frequency from frequency counter
+    def pollDone(self, polled):
+        """Called in the event loop thread when the requests of a poll cycle on
+        the engine have finished. The readings are processed right here, and the
+        next poll is started by a timer in the loop as long as the state stays on
+        and no command is waiting. Otherwise the port is given back and the state
+        machine continues on the strand of the device.
+        """
+        try:
+            self.processPoll(polled)
+        except Exception, ex:
+            self.logLimited(self.error_stream, ''.join(('Error processing readings: ', str(ex))), 'processPoll')
+        with self.pollLock:
+            if (self.stopStateThreadFlag is False and self.commandPending() is False and
+                    self.get_state() in [PyTango.DevState.ON, PyTango.DevState.MOVING, PyTango.DevState.ALARM]):
+                self.pollTimer = self.engine.loop.callLater(max(self.scheduler.timeToDeadline(), 0),
+                                                            self.startPoll)
+                return
+        self.asyncDevice.detach()
+        with self.pollLock:
+            self.pollInFlight = False
+        self.stepper.wake()
+
+    def processPoll(self, polled):
+        """Publishes the readings of a poll cycle and updates the state.
+        """
+        if self.logger.is_debug_enabled():
+            self.debug_stream(''.join(('Polled ', ', '.join(['%d: %s' % (st.adr, st.frequency) for st in polled]))))
+        for st in polled:
+            if st.consecutiveErrors > 0:
+                self.errorCount += 1
+            value = st.frequency
+            if self.mode == 'counter':
+                value = self.counterRate(st)
+            # Publishing is a plain reference assignment, readers never wait for the bus
+            snap = makeSnapshot(value, st.timestamp)
+            if value is not None and st.adr == self.addresses[0]:
+                self.evaluateAlarm(value, st.timestamp)
+                if self.alarm.active is True:
+                    snap = snap._replace(quality=PyTango.AttrQuality.ATTR_ALARM)
+            self.frequencySnapshotDict[st.adr] = snap
+            if value is not None and self.store is not None:
+                self.store.append(st.timestamp, st.adr, value)
+            self.pushFrequencyEvents(''.join(('Frequency', str(st.adr).zfill(2))), snap)
+            if st.adr == self.addresses[0]:
+                if value is not None:
+                    with self.attrLock:
+                        self.history.append(value, st.timestamp)
+                        self.statisticsSnapshot = self.history.getStatistics()
+                self.frequencySnapshot = snap
+                self.pushFrequencyEvents('Frequency', snap)
+                self.dataReadyCounter += 1
+                self.push_data_ready_event('Frequency', self.dataReadyCounter)
+        faulty = self.bus.faultyAddresses()
+        if len(faulty) == len(self.addresses):
+            lastError = self.bus.states[self.addresses[0]].lastError
+            self.logLimited(self.error_stream, ''.join(('Error reading frequency counter: ', lastError)),
+                            'readError')
+            self.set_status(''.join(('Error reading frequency counter: ', lastError)))
+            self.markFault()
+            self.set_state(PyTango.DevState.FAULT)
+        elif len(faulty) > 0:
+            self.set_status(''.join(('On, no reply from address ', ', '.join([str(adr) for adr in faulty]))))
+        elif self.alarm.active is True:
+            self.set_status(self.alarm.reason)
+        else:
+            self.set_status('On')
+
+    def evaluateAlarm(self, value, timestamp):
+        """Checks a reading of the first address against the alarm limits. The
+        state goes from ON to ALARM, or back, when the alarm changes, and the
+        state event is pushed at once.
+        """
+        if self.alarm.evaluate(value, timestamp) is False:
+            return
+        state = self.get_state()
+        if self.alarm.active is True and state == PyTango.DevState.ON:
+            newState = PyTango.DevState.ALARM
+        elif self.alarm.active is False and state == PyTango.DevState.ALARM:
+            newState = PyTango.DevState.ON
+        else:
+            return
+        self.set_state(newState)
+        with self.streamLock:
+            if self.alarm.active is True:
+                self.info_stream(''.join(('Alarm: ', self.alarm.reason)))
+            else:
+                self.info_stream('Alarm cleared')
+        try:
+            self.push_change_event('State', newState)
+        except PyTango.DevFailed, ex:
+            self.logLimited(self.error_stream, ''.join(('Could not push state event: ', str(ex))), 'pushState')
 
-            try:
-                self.info_stream('frequency check')
-                with self.attrLock:
-                    self.frequency = self.frequencyDevice.getFrequency(1)
-                self.info_stream('frequency ok')
-            except Exception, ex:
-                with self.streamLock:
-                    self.error_stream(''.join(('Error reading frequency counter: ', str(ex))))
-                self.set_status(''.join(('Error reading frequency counter: ', str(ex))))
-                self.set_state(PyTango.DevState.FAULT)
-                with self.attrLock:
-                    self.frequency = None
+    def counterRate(self, st):
+        """Adds the counts of a poll to the counter history of the address.
 
-            self.checkCommands(blockTime=waitTime)
-        time.sleep(1.0)
+        output:
+            Count rate of channel 0 in Hz since the previous poll, None if there is none
+        """
+        if st.counts is None:
+            return None
+        hist = self.counterHistories[st.adr]
+        with self.attrLock:
+            hist.append(st.counts, st.timestamp)
+        if hist.latestRate is None:
+            return None
+        return int(round(hist.latestRate[0]))
 
     def faultHandler(self, prevState):
         """Handles the FAULT state. A problem has been detected.
         """
         with self.streamLock:
             self.info_stream('Entering faultHandler')
+        self.faultRetries = 0
+
+    def faultStep(self):
         handledStates = [PyTango.DevState.FAULT]
         waitTime = 0.5
-        retries = 0
         maxTries = 5
 
-        while self.stopStateThreadFlag is False:
-            if self.get_state() not in handledStates:
+        # Test frequency counters. Go back to on as soon as one module answers
+        # with the right mode.
+        errors = 0
+        for adr in self.addresses:
+            if self.commandInterrupt(handledStates) is True:
                 break
-            # Test frequency counter:
             try:
-                status = self.frequencyDevice.getStatus(01)
+                status = self.frequencyDevice.getStatus(adr)
                 self.set_status(status)
                 if status == 'host down':
-                    self.frequencyDevice.resetStatus(01)
-                self.configuration = self.frequencyDevice.getConfiguration(01)
-                self.debug_stream(''.join(('Configuration: ', str(self.configuration))))
-                if self.configuration[1] != 'frequency':
-                    self.frequencyDevice.setConfiguration(01, 'frequency')
-                    self.configuration = self.frequencyDevice.getConfiguration(01)
+                    self.frequencyDevice.resetStatus(adr)
+                    self.frequencyDevice.invalidateCache(adr)
+                self.configuration = self.frequencyDevice.getConfiguration(adr)
+                if self.configuration[1] != self.mode:
+                    self.frequencyDevice.setConfiguration(adr, self.mode, self.frequencyDevice.baudrate)
+                    self.configuration = self.frequencyDevice.getConfiguration(adr)
                 else:
-                    self.debug_stream('Going back to on state')
+                    self.bus.markOk(adr)
+                    self.markRecovered()
                     self.set_state(PyTango.DevState.ON)
 
-                with self.streamLock:
-                    self.info_stream(''.join(('Frequency counter configuration: ', str(self.configuration))))
+                if self.logger.is_debug_enabled():
+                    self.debug_stream(''.join(('Frequency counter configuration: ', str(self.configuration))))
 
-            except Exception:
-                self.set_state(PyTango.DevState.UNKNOWN)
+            except Exception, ex:
+                self.bus.markError(adr, ex)
+                errors += 1
+
+        if self.get_state() not in handledStates:
+            return 0
+        if errors == len(self.addresses):
+            self.set_state(PyTango.DevState.UNKNOWN)
 
-            if self.get_state() == PyTango.DevState.FAULT:
-                retries += 1
-                if retries > maxTries:
-                    self.set_state(PyTango.DevState.UNKNOWN)
-            self.checkCommands(blockTime=waitTime)
-        self.checkCommands(blockTime=waitTime)
+        if self.get_state() == PyTango.DevState.FAULT:
+            self.faultRetries += 1
+            if self.faultRetries > maxTries:
+                self.set_state(PyTango.DevState.UNKNOWN)
+        return waitTime
 
     def offHandler(self, prevState):
-        """Handles the OFF state. Does nothing, just goes back to ON.
+        """Handles the OFF state. The port stays open but no readings are made
+        until the On command.
         """
         with self.streamLock:
             self.info_stream('Entering offHandler')
-        self.set_state(PyTango.DevState.ON)
+        self.set_status('Off')
 
-    def checkCommands(self, blockTime=0):
-        """Checks the commandQueue for new commands. Must be called regularly.
-        If the queue is empty the method exits immediately.
+    def offStep(self):
+        return None
+
+    def queueCommand(self, cmd):
+        """Put a command on the commandQueue and wake up the state thread.
         """
-        with self.streamLock:
-            self.debug_stream('Entering checkCommands')
+        self.commandQueue.put(cmd)
+        self.wakeStateThread()
+
+    def wakeStateThread(self):
+        if self.stepper is not None:
+            self.stepper.wake()
+            return
         try:
-            if blockTime == 0:
-                cmd = self.commandQueue.get(block=False)
-            else:
-                cmd = self.commandQueue.get(block=True, timeout=blockTime)
+            os.write(self.commandWakeup[1], 'c')
+        except (OSError, AttributeError, IndexError):
+            pass
 
-            if cmd.command == 'off':
-                if self.get_state() not in [PyTango.DevState.INIT, PyTango.DevState.UNKNOWN]:
-                    self.set_state(PyTango.DevState.OFF)
+    def commandPending(self):
+        return self.commandQueue.empty() is False
 
-            elif cmd.command == 'init':
-                if self.get_state() not in [PyTango.DevState.UNKNOWN]:
-                    self.set_state(PyTango.DevState.UNKNOWN)
+    def commandInterrupt(self, handledStates):
+        """Handles pending commands between serial transactions.
 
-            elif cmd.command == 'alarm':
-                if self.get_state() not in [PyTango.DevState.UNKNOWN]:
-                    self.set_state(PyTango.DevState.ALARM)
+        output:
+            True if a command moved the state out of handledStates
+        """
+        if self.commandPending() is False:
+            return False
+        self.checkCommands()
+        return self.get_state() not in handledStates
 
-            elif cmd.command == 'on':
-                if self.get_state() not in [PyTango.DevState.UNKNOWN]:
-                    self.set_state(PyTango.DevState.ON)
+    def checkCommands(self, blockTime=0):
+        """Handles all commands in the commandQueue. Must be called regularly.
+        If the queue is empty the method waits up to blockTime for a command,
+        returning as soon as one is queued.
 
-        except Queue.Empty:
-            # with self.streamLock:
-            # self.debug_stream('checkCommands: queue empty')
+        output:
+            Number of commands handled
+        """
+        if blockTime > 0 and self.commandPending() is False:
+            select.select([self.commandWakeup[0]], [], [], blockTime)
+        try:
+            os.read(self.commandWakeup[0], 4096)
+        except OSError:
             pass
+        handled = 0
+        while True:
+            try:
+                cmd = self.commandQueue.get(block=False)
+            except Queue.Empty:
+                break
+            handled += 1
+            self.handleCommand(cmd)
+            self.commandLatency = time.time() - cmd.time
+            if self.commandLatency > self.commandLatencyMax:
+                self.commandLatencyMax = self.commandLatency
+        return handled
+
+    def handleCommand(self, cmd):
+        """Applies a command from the commandQueue in the state thread.
+        """
+        if cmd.command == 'off':
+            if self.get_state() not in [PyTango.DevState.INIT, PyTango.DevState.UNKNOWN]:
+                self.set_state(PyTango.DevState.OFF)
+
+        elif cmd.command == 'init':
+            if self.get_state() not in [PyTango.DevState.UNKNOWN]:
+                self.forceReopen = True
+                self.set_state(PyTango.DevState.UNKNOWN)
+
+        elif cmd.command == 'alarm':
+            if self.get_state() not in [PyTango.DevState.UNKNOWN]:
+                self.set_state(PyTango.DevState.ALARM)
+
+        elif cmd.command == 'on':
+            if self.get_state() not in [PyTango.DevState.INIT, PyTango.DevState.UNKNOWN]:
+                self.set_state(PyTango.DevState.ON)
+
+        elif cmd.command == 'clear':
+            if self.get_state() not in [PyTango.DevState.INIT, PyTango.DevState.UNKNOWN]:
+                for adr in self.addresses:
+                    try:
+                        self.frequencyDevice.clearCounter(adr, 0)
+                        self.frequencyDevice.clearCounter(adr, 1)
+                    except Exception, ex:
+                        with self.streamLock:
+                            self.error_stream(''.join(('Could not clear counters of address ',
+                                                       str(adr), ': ', str(ex))))
+                    with self.attrLock:
+                        self.counterHistories[adr].reset()
+
+        elif cmd.command == 'refresh':
+            if self.get_state() not in [PyTango.DevState.INIT, PyTango.DevState.UNKNOWN]:
+                for adr in self.addresses:
+                    try:
+                        self.frequencyDevice.refreshCache(adr)
+                    except Exception, ex:
+                        with self.streamLock:
+                            self.error_stream(''.join(('Could not refresh configuration of address ',
+                                                       str(adr), ': ', str(ex))))
 
 # ------------------------------------------------------------------
 #     Always excuted hook method
@@ -312,14 +834,232 @@ class Superlogics8080DS(PyTango.Device_4Impl):
 #     Frequency attribute
 # ------------------------------------------------------------------
     def read_Frequency(self, attr):
-        with self.streamLock:
-            self.info_stream(''.join(('Reading frequency')))
+        self.readCount += 1
+        snap = self.frequencySnapshot
+        attr.set_value_date_quality(snap.value, snap.timestamp, snap.quality)
+
+# ------------------------------------------------------------------
+#     Frequency history and statistics attributes
+# ------------------------------------------------------------------
+    def read_FrequencyHistory(self, attr):
+        with self.attrLock:
+            attr.set_value(self.history.getValues())
+
+    def read_FrequencyHistoryTime(self, attr):
+        with self.attrLock:
+            attr.set_value(self.history.getTimestamps())
+
+    def readStatistic(self, attr, key):
+        attr_read = self.statisticsSnapshot[key]
+        if attr_read is None:
+            attr.set_quality(PyTango.AttrQuality.ATTR_INVALID)
+            attr_read = 0.0
+        attr.set_value(attr_read)
+
+    def read_FrequencyMean(self, attr):
+        self.readStatistic(attr, 'mean')
+
+    def read_FrequencyStd(self, attr):
+        self.readStatistic(attr, 'std')
+
+    def read_FrequencyMin(self, attr):
+        self.readStatistic(attr, 'min')
+
+    def read_FrequencyMax(self, attr):
+        self.readStatistic(attr, 'max')
+
+    def read_FrequencyAllanDeviation(self, attr):
+        self.readStatistic(attr, 'allan')
+
+    def read_StatisticsWindow(self, attr):
         with self.attrLock:
-            attr_read = self.frequency
-            if attr_read is None:
-                attr.set_quality(PyTango.AttrQuality.ATTR_INVALID)
-                attr_read = 0.0
-            attr.set_value(attr_read)
+            attr.set_value(self.history.window)
+
+    def write_StatisticsWindow(self, attr):
+        with self.attrLock:
+            self.history.setWindow(attr.get_write_value())
+            self.statisticsSnapshot = self.history.getStatistics()
+
+# ------------------------------------------------------------------
+#     Counter mode attributes, for the first address
+# ------------------------------------------------------------------
+    def readCounter(self, attr, func, empty):
+        """Set attr to func(counter history of the first address). Invalid with
+        empty as value if there are no counts, e.g. in frequency mode.
+        """
+        with self.attrLock:
+            hist = self.counterHistories[self.addresses[0]]
+            if hist.count > 0:
+                attr.set_value(func(hist))
+                return
+        attr.set_quality(PyTango.AttrQuality.ATTR_INVALID)
+        attr.set_value(empty)
+
+    def read_Counts(self, attr):
+        self.readCounter(attr, lambda h: h.counts[h.index(h.count - 1)], np.zeros(2, dtype=np.int64))
+
+    def read_CounterTotal(self, attr):
+        self.readCounter(attr, lambda h: h.total, np.zeros(2, dtype=np.int64))
+
+    def read_CounterRate(self, attr):
+        self.readCounter(attr, lambda h: h.latestRate if h.latestRate is not None else np.zeros(2),
+                         np.zeros(2))
+
+    def read_CounterRateHistory(self, attr):
+        self.readCounter(attr, lambda h: h.getRates(), np.zeros((0, 2)))
+
+    def read_CounterTotalHistory(self, attr):
+        self.readCounter(attr, lambda h: h.getTotals(), np.zeros((0, 2), dtype=np.int64))
+
+    def read_CounterHistoryTime(self, attr):
+        self.readCounter(attr, lambda h: h.getTimestamps(), np.zeros(0))
+
+    def read_Mode(self, attr):
+        attr.set_value(self.mode)
+
+    def read_InputMode(self, attr):
+        attr_read = self.inputMode
+        if attr_read is None:
+            attr.set_quality(PyTango.AttrQuality.ATTR_INVALID)
+            attr_read = ''
+        attr.set_value(attr_read)
+
+# ------------------------------------------------------------------
+#     Alarm limit attributes
+# ------------------------------------------------------------------
+    def read_AlarmMin(self, attr):
+        attr.set_value(self.alarm.minimum)
+
+    def write_AlarmMin(self, attr):
+        self.alarm.minimum = attr.get_write_value()
+
+    def read_AlarmMax(self, attr):
+        attr.set_value(self.alarm.maximum)
+
+    def write_AlarmMax(self, attr):
+        self.alarm.maximum = attr.get_write_value()
+
+    def read_AlarmRateMax(self, attr):
+        attr.set_value(self.alarm.maxRate)
+
+    def write_AlarmRateMax(self, attr):
+        self.alarm.maxRate = attr.get_write_value()
+
+    def read_AlarmHysteresis(self, attr):
+        attr.set_value(self.alarm.hysteresis)
+
+    def write_AlarmHysteresis(self, attr):
+        self.alarm.hysteresis = attr.get_write_value()
+
+    def read_AlarmRateHysteresis(self, attr):
+        attr.set_value(self.alarm.rateHysteresis)
+
+    def write_AlarmRateHysteresis(self, attr):
+        self.alarm.rateHysteresis = attr.get_write_value()
+
+# ------------------------------------------------------------------
+#     Acquisition counter attributes
+# ------------------------------------------------------------------
+    def read_SkippedCycles(self, attr):
+        attr.set_value(self.scheduler.skipped)
+
+    def read_PollJitter(self, attr):
+        attr.set_value(self.scheduler.jitter * 1e3)
+
+    def read_PollJitterMax(self, attr):
+        attr.set_value(self.scheduler.jitterMax * 1e3)
+
+    def read_PollRate(self, attr):
+        attr.set_value(1.0 / self.scheduler.period)
+
+    def write_PollRate(self, attr):
+        self.scheduler.setPeriod(1.0 / attr.get_write_value())
+
+    def read_CommandLatency(self, attr):
+        attr.set_value(self.commandLatency * 1e3)
+
+    def read_CommandLatencyMax(self, attr):
+        attr.set_value(self.commandLatencyMax * 1e3)
+
+    def read_RecoveryTime(self, attr):
+        attr.set_value(self.recoveryTime)
+
+    def read_RecoveryCount(self, attr):
+        attr.set_value(self.recoveryCount)
+
+    def read_LoopCount(self, attr):
+        attr.set_value(self.loopCount)
+
+    def read_ReadCount(self, attr):
+        attr.set_value(self.readCount)
+
+    def read_ErrorCount(self, attr):
+        attr.set_value(self.errorCount)
+
+# ------------------------------------------------------------------
+#     Baudrate attribute
+# ------------------------------------------------------------------
+    def read_Baudrate(self, attr):
+        attr_read = self.linkBaudrate
+        if attr_read is None:
+            attr.set_quality(PyTango.AttrQuality.ATTR_INVALID)
+            attr_read = 0
+        attr.set_value(attr_read)
+
+# ------------------------------------------------------------------
+#     Serial link counter attributes
+# ------------------------------------------------------------------
+    def readLinkCounter(self, attr, key):
+        try:
+            attr.set_value(self.frequencyDevice.counters[key])
+        except AttributeError:
+            # Not connected yet
+            attr.set_quality(PyTango.AttrQuality.ATTR_INVALID)
+            attr.set_value(0)
+
+    def read_TimeoutCount(self, attr):
+        self.readLinkCounter(attr, 'timeouts')
+
+    def read_RetryCount(self, attr):
+        self.readLinkCounter(attr, 'retries')
+
+    def read_ReconnectCount(self, attr):
+        self.readLinkCounter(attr, 'reconnects')
+
+    def read_OverlongFrameCount(self, attr):
+        self.readLinkCounter(attr, 'overlong')
+
+    def read_InvalidReplyCount(self, attr):
+        self.readLinkCounter(attr, 'invalid')
+
+    def read_ChecksumErrorCount(self, attr):
+        self.readLinkCounter(attr, 'checksum')
+
+    def read_LatencyHistogramBins(self, attr):
+        attr.set_value(np.array(sc.latencyBins))
+
+    def read_LatencyHistogramCommands(self, attr):
+        try:
+            attr.set_value(sorted(self.frequencyDevice.histograms.keys()))
+        except AttributeError:
+            attr.set_value([])
+
+    def read_LatencyHistogram(self, attr):
+        try:
+            histograms = self.frequencyDevice.histograms
+        except AttributeError:
+            histograms = {}
+        if len(histograms) == 0:
+            attr.set_quality(PyTango.AttrQuality.ATTR_INVALID)
+            attr.set_value(np.zeros((1, len(sc.latencyBins) + 1), dtype=np.int64))
+            return
+        # Same row order as LatencyHistogramCommands
+        attr.set_value(np.array([histograms[key] for key in sorted(histograms.keys())], dtype=np.int64))
+
+    def read_FrequencyAddress(self, attr):
+        adr = int(attr.get_name()[len('Frequency'):])
+        snap = self.frequencySnapshotDict[adr]
+        attr.set_value_date_quality(snap.value, snap.timestamp, snap.quality)
 
     def is_Frequency_allowed(self, req_type):
         if self.get_state() in [PyTango.DevState.INIT,
@@ -350,16 +1090,165 @@ class Superlogics8080DS(PyTango.Device_4Impl):
         with self.streamLock:
             self.info_stream(''.join(("In ", self.get_name(), "::On")))
         cmdMsg = Command('on')
-        self.commandQueue.put(cmdMsg)
+        self.queueCommand(cmdMsg)
 
 # ---- On command State Machine -----------------
     def is_On_allowed(self):
-        if self.get_state() in [PyTango.DevState.UNKNOWN]:
+        if self.get_state() in [PyTango.DevState.INIT, PyTango.DevState.UNKNOWN]:
             #     End of Generated Code
             #     Re-Start of Generated Code
             return False
         return True
 
+# ------------------------------------------------------------------
+#     Off command:
+#
+#     Description: Stop reading the frequency counters
+#
+# ------------------------------------------------------------------
+    def Off(self):
+        with self.streamLock:
+            self.info_stream(''.join(("In ", self.get_name(), "::Off")))
+        cmdMsg = Command('off')
+        self.queueCommand(cmdMsg)
+
+# ---- Off command State Machine -----------------
+    def is_Off_allowed(self):
+        if self.get_state() in [PyTango.DevState.INIT, PyTango.DevState.UNKNOWN]:
+            return False
+        return True
+
+# ------------------------------------------------------------------
+#     Reconnect command:
+#
+#     Description: Close the port and connect to the frequency
+#                  counters again. Named Reconnect since Init is the
+#                  Tango device initialization command.
+#
+# ------------------------------------------------------------------
+    def Reconnect(self):
+        with self.streamLock:
+            self.info_stream(''.join(("In ", self.get_name(), "::Reconnect")))
+        cmdMsg = Command('init')
+        self.queueCommand(cmdMsg)
+
+# ---- Reconnect command State Machine -----------------
+    def is_Reconnect_allowed(self):
+        if self.get_state() in [PyTango.DevState.UNKNOWN]:
+            return False
+        return True
+
+# ------------------------------------------------------------------
+#     Alarm command:
+#
+#     Description: Set the device in alarm state. Readings continue.
+#
+# ------------------------------------------------------------------
+    def Alarm(self):
+        with self.streamLock:
+            self.info_stream(''.join(("In ", self.get_name(), "::Alarm")))
+        cmdMsg = Command('alarm')
+        self.queueCommand(cmdMsg)
+
+# ---- Alarm command State Machine -----------------
+    def is_Alarm_allowed(self):
+        if self.get_state() in [PyTango.DevState.UNKNOWN]:
+            return False
+        return True
+
+# ------------------------------------------------------------------
+#     ResetStatistics command:
+#
+#     Description: Zero the acquisition and serial link counters and
+#                  the latency histograms
+#
+# ------------------------------------------------------------------
+    def ResetStatistics(self):
+        with self.streamLock:
+            self.info_stream(''.join(("In ", self.get_name(), "::ResetStatistics")))
+        self.loopCount = 0
+        self.readCount = 0
+        self.errorCount = 0
+        self.commandLatency = 0.0
+        self.commandLatencyMax = 0.0
+        self.recoveryTime = 0.0
+        self.recoveryCount = 0
+        self.scheduler.resetStatistics()
+        try:
+            self.frequencyDevice.resetStatistics()
+        except AttributeError:
+            pass
+
+# ------------------------------------------------------------------
+#     RefreshConfiguration command:
+#
+#     Description: Read configuration, input mode and trigger levels
+#                  of all modules again instead of using cached values
+#
+# ------------------------------------------------------------------
+    def RefreshConfiguration(self):
+        with self.streamLock:
+            self.info_stream(''.join(("In ", self.get_name(), "::RefreshConfiguration")))
+        cmdMsg = Command('refresh')
+        self.queueCommand(cmdMsg)
+
+# ---- RefreshConfiguration command State Machine -----------------
+    def is_RefreshConfiguration_allowed(self):
+        if self.get_state() in [PyTango.DevState.INIT, PyTango.DevState.UNKNOWN]:
+            return False
+        return True
+
+
+# ------------------------------------------------------------------
+#     GetStoredFrequency command:
+#
+#     Description: Readings from the sample store in a time interval,
+#                  decimated to a maximum number of points
+#
+#     argin:  DevVarDoubleArray    [start time, end time, max points, (address)]
+#     argout: DevVarDoubleArray    [t0, f0, t1, f1, ...]
+# ------------------------------------------------------------------
+    def GetStoredFrequency(self, argin):
+        with self.streamLock:
+            self.info_stream(''.join(("In ", self.get_name(), "::GetStoredFrequency")))
+        if len(argin) < 3:
+            PyTango.Except.throw_exception('Superlogics8080DS_argument', 'Expected start time, end time, max points',
+                                           'GetStoredFrequency')
+        if len(argin) > 3:
+            adr = int(argin[3])
+        else:
+            adr = self.addresses[0]
+        # Read without taking a lock. The store only ever appends, only records
+        # at the oldest end could change while they are read.
+        rec = self.store.decimated(argin[0], argin[1], int(argin[2]), adr)
+        out = np.empty(2 * rec.shape[0])
+        out[0::2] = rec['timestamp']
+        out[1::2] = rec['value']
+        return out
+
+# ---- GetStoredFrequency command State Machine -----------------
+    def is_GetStoredFrequency_allowed(self):
+        return self.store is not None
+
+# ------------------------------------------------------------------
+#     ClearCounters command:
+#
+#     Description: Zero both counters of all modules and forget the
+#                  counter history
+#
+# ------------------------------------------------------------------
+    def ClearCounters(self):
+        with self.streamLock:
+            self.info_stream(''.join(("In ", self.get_name(), "::ClearCounters")))
+        cmdMsg = Command('clear')
+        self.queueCommand(cmdMsg)
+
+# ---- ClearCounters command State Machine -----------------
+    def is_ClearCounters_allowed(self):
+        if self.get_state() in [PyTango.DevState.INIT, PyTango.DevState.UNKNOWN]:
+            return False
+        return True
+
 
 # ==================================================================
 #
@@ -378,6 +1267,83 @@ class Superlogics8080DSClass(PyTango.DeviceClass):
             [PyTango.DevString,
              "Com port of the 8080 frequency counter",
              []],
+        'addresses':
+            [PyTango.DevVarLongArray,
+             "Addresses of the 8080 modules sharing the port. The Frequency attribute shows the first address.",
+             [1]],
+        'baudrate':
+            [PyTango.DevLong,
+             "Baud rate tried first when connecting. Other rates are probed if the modules do not answer.",
+             [9600]],
+        'targetBaudrate':
+            [PyTango.DevLong,
+             "Baud rate the link is switched to after init. 0 keeps the rate the modules are found at.",
+             [0]],
+        'checksum':
+            [PyTango.DevBoolean,
+             "The modules are configured with checksums enabled",
+             [False]],
+        'mode':
+            [PyTango.DevString,
+             "Acquisition mode the modules are configured to: frequency, or counter to read the counts of both "
+             "channels. In counter mode Frequency shows the count rate of channel 0.",
+             ['frequency']],
+        'alarmMin':
+            [PyTango.DevDouble,
+             "Initial lowest allowed frequency in Hz, 0 to disable",
+             [0.0]],
+        'alarmMax':
+            [PyTango.DevDouble,
+             "Initial highest allowed frequency in Hz, 0 to disable",
+             [0.0]],
+        'alarmRateMax':
+            [PyTango.DevDouble,
+             "Initial highest allowed rate of change of the frequency in Hz/s, 0 to disable",
+             [0.0]],
+        'alarmHysteresis':
+            [PyTango.DevDouble,
+             "Initial margin in Hz inside the frequency limits to clear an alarm",
+             [0.0]],
+        'alarmRateHysteresis':
+            [PyTango.DevDouble,
+             "Initial margin in Hz/s below the rate of change limit to clear an alarm",
+             [0.0]],
+        'engineWorkers':
+            [PyTango.DevLong,
+             "Worker threads of the I/O engine shared by the devices of the server, 0 for a thread per device. The first device started on the engine decides its number of workers.",
+             [4]],
+        'storeFile':
+            [PyTango.DevString,
+             "File of the persistent sample store, a memory mapped ring of all readings. Empty to disable.",
+             ['']],
+        'captureFile':
+            [PyTango.DevString,
+             "File to record the raw serial traffic to, overwritten at init. Empty to disable.",
+             ['']],
+        'replayFile':
+            [PyTango.DevString,
+             "Capture file answering the commands instead of the serial port, for tests without hardware. Empty to use the port.",
+             ['']],
+        'replaySpeed':
+            [PyTango.DevDouble,
+             "Speed factor of the replies in replayFile, 1 for the recorded timing",
+             [1.0]],
+        'storeSize':
+            [PyTango.DevLong,
+             "Size in MB of a new sample store file, 24 bytes per reading",
+             [64]],
+        'pollRate':
+            [PyTango.DevDouble,
+             "Initial frequency reading rate in Hz",
+             [5.0]],
+        'historyDepth':
+            [PyTango.DevLong,
+             "Number of frequency readings kept in the FrequencyHistory attribute",
+             [1000]],
+        'statisticsWindow':
+            [PyTango.DevLong,
+             "Initial number of latest readings used for the frequency statistics",
+             [100]],
 
         }
 
@@ -386,6 +1352,27 @@ class Superlogics8080DSClass(PyTango.DeviceClass):
         'On':
             [[PyTango.DevVoid, ""],
              [PyTango.DevVoid, ""]],
+        'Off':
+            [[PyTango.DevVoid, ""],
+             [PyTango.DevVoid, ""]],
+        'Reconnect':
+            [[PyTango.DevVoid, ""],
+             [PyTango.DevVoid, ""]],
+        'Alarm':
+            [[PyTango.DevVoid, ""],
+             [PyTango.DevVoid, ""]],
+        'RefreshConfiguration':
+            [[PyTango.DevVoid, ""],
+             [PyTango.DevVoid, ""]],
+        'ResetStatistics':
+            [[PyTango.DevVoid, ""],
+             [PyTango.DevVoid, ""]],
+        'ClearCounters':
+            [[PyTango.DevVoid, ""],
+             [PyTango.DevVoid, ""]],
+        'GetStoredFrequency':
+            [[PyTango.DevVarDoubleArray, "[start time, end time, max points, (address)]"],
+             [PyTango.DevVarDoubleArray, "[t0, f0, t1, f1, ...]"]],
         }
 
     #     Attribute definitions
@@ -397,6 +1384,329 @@ class Superlogics8080DSClass(PyTango.DeviceClass):
              {
                 'description': "Detected frequency",
                 'unit': 'Hz',
+                'abs_change': "1",
+                'archive_abs_change': "1",
+                'archive_period': "60000",
+             }],
+        'FrequencyHistory':
+            [[PyTango.DevDouble,
+             PyTango.SPECTRUM,
+             PyTango.READ, MAX_HISTORY_DEPTH],
+             {
+                'description': "Latest frequency readings, oldest first",
+                'unit': 'Hz',
+             }],
+        'FrequencyHistoryTime':
+            [[PyTango.DevDouble,
+             PyTango.SPECTRUM,
+             PyTango.READ, MAX_HISTORY_DEPTH],
+             {
+                'description': "Timestamps of the FrequencyHistory readings",
+                'unit': 's',
+             }],
+        'FrequencyMean':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Mean frequency over the statistics window",
+                'unit': 'Hz',
+             }],
+        'FrequencyStd':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Standard deviation of the frequency over the statistics window",
+                'unit': 'Hz',
+             }],
+        'FrequencyMin':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Minimum frequency over the statistics window",
+                'unit': 'Hz',
+             }],
+        'FrequencyMax':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Maximum frequency over the statistics window",
+                'unit': 'Hz',
+             }],
+        'FrequencyAllanDeviation':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Allan deviation at the sample interval over the statistics window",
+                'unit': 'Hz',
+             }],
+        'AlarmMin':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ_WRITE],
+             {
+                'description': "Lowest allowed frequency of the first address, 0 to disable",
+                'unit': 'Hz',
+             }],
+        'AlarmMax':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ_WRITE],
+             {
+                'description': "Highest allowed frequency of the first address, 0 to disable",
+                'unit': 'Hz',
+             }],
+        'AlarmRateMax':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ_WRITE],
+             {
+                'description': "Highest allowed rate of change of the frequency, 0 to disable",
+                'unit': 'Hz/s',
+             }],
+        'AlarmHysteresis':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ_WRITE],
+             {
+                'description': "Margin inside the frequency limits needed to clear an alarm",
+                'unit': 'Hz',
+             }],
+        'AlarmRateHysteresis':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ_WRITE],
+             {
+                'description': "Margin below the rate of change limit needed to clear an alarm",
+                'unit': 'Hz/s',
+             }],
+        'Counts':
+            [[PyTango.DevLong64,
+             PyTango.SPECTRUM,
+             PyTango.READ, 2],
+             {
+                'description': "Latest raw counts of channel 0 and 1 of the first address in counter mode",
+             }],
+        'CounterTotal':
+            [[PyTango.DevLong64,
+             PyTango.SPECTRUM,
+             PyTango.READ, 2],
+             {
+                'description': "Counts of channel 0 and 1 corrected for counter overflow",
+             }],
+        'CounterRate':
+            [[PyTango.DevDouble,
+             PyTango.SPECTRUM,
+             PyTango.READ, 2],
+             {
+                'description': "Count rate of channel 0 and 1 between the latest two readings",
+                'unit': 'Hz',
+             }],
+        'CounterRateHistory':
+            [[PyTango.DevDouble,
+             PyTango.IMAGE,
+             PyTango.READ, 2, MAX_HISTORY_DEPTH],
+             {
+                'description': "Count rate of channel 0 and 1 (columns) between consecutive readings (rows), "
+                               "oldest first. One row less than CounterHistoryTime.",
+                'unit': 'Hz',
+             }],
+        'CounterTotalHistory':
+            [[PyTango.DevLong64,
+             PyTango.IMAGE,
+             PyTango.READ, 2, MAX_HISTORY_DEPTH],
+             {
+                'description': "Overflow corrected counts of channel 0 and 1 (columns) per reading (rows), oldest first",
+             }],
+        'CounterHistoryTime':
+            [[PyTango.DevDouble,
+             PyTango.SPECTRUM,
+             PyTango.READ, MAX_HISTORY_DEPTH],
+             {
+                'description': "Timestamps of the counter readings",
+                'unit': 's',
+             }],
+        'Mode':
+            [[PyTango.DevString,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Acquisition mode, frequency or counter",
+             }],
+        'InputMode':
+            [[PyTango.DevString,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Input isolation mode of the first address",
+             }],
+        'Baudrate':
+            [[PyTango.DevLong,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Negotiated baud rate of the serial link",
+                'unit': 'baud',
+             }],
+        'PollRate':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ_WRITE],
+             {
+                'description': "Target rate of frequency readings. Readings start on a fixed time grid at this rate.",
+                'unit': 'Hz',
+                'min value': 0.01,
+             }],
+        'SkippedCycles':
+            [[PyTango.DevLong64,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Number of poll cycles skipped because the previous one overran its period",
+             }],
+        'PollJitter':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Mean delay of poll cycle starts after their deadline, over about 16 cycles",
+                'unit': 'ms',
+             }],
+        'PollJitterMax':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Largest delay of a poll cycle start after its deadline",
+                'unit': 'ms',
+             }],
+        'CommandLatency':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Time from queuing to applying the latest command",
+                'unit': 'ms',
+             }],
+        'CommandLatencyMax':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Longest time from queuing to applying a command",
+                'unit': 'ms',
+             }],
+        'RecoveryTime':
+            [[PyTango.DevDouble,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Time from the latest read failure until frequency readings worked again",
+                'unit': 's',
+             }],
+        'RecoveryCount':
+            [[PyTango.DevLong64,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Number of recoveries from read failures",
+             }],
+        'LoopCount':
+            [[PyTango.DevLong64,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Number of acquisition loops in the on state",
+             }],
+        'ReadCount':
+            [[PyTango.DevLong64,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Number of client reads of the Frequency attribute",
+             }],
+        'ErrorCount':
+            [[PyTango.DevLong64,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Number of failed frequency readings",
+             }],
+        'TimeoutCount':
+            [[PyTango.DevLong64,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Number of serial transactions that got no reply within the adaptive timeout",
+             }],
+        'RetryCount':
+            [[PyTango.DevLong64,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Number of commands sent again after a timeout",
+             }],
+        'ReconnectCount':
+            [[PyTango.DevLong64,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Number of times the port was reopened after a write error",
+             }],
+        'OverlongFrameCount':
+            [[PyTango.DevLong64,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Number of replies longer than the longest valid frame",
+             }],
+        'InvalidReplyCount':
+            [[PyTango.DevLong64,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Number of ? replies (invalid command)",
+             }],
+        'ChecksumErrorCount':
+            [[PyTango.DevLong64,
+             PyTango.SCALAR,
+             PyTango.READ],
+             {
+                'description': "Number of replies rejected for a wrong checksum",
+             }],
+        'LatencyHistogramBins':
+            [[PyTango.DevDouble,
+             PyTango.SPECTRUM,
+             PyTango.READ, 32],
+             {
+                'description': "Upper edges of the latency histogram buckets. The last bucket has no upper edge.",
+                'unit': 'ms',
+             }],
+        'LatencyHistogramCommands':
+            [[PyTango.DevString,
+             PyTango.SPECTRUM,
+             PyTango.READ, 32],
+             {
+                'description': "Command types of the rows in LatencyHistogram, e.g. #0 for frequency reads",
+             }],
+        'LatencyHistogram':
+            [[PyTango.DevLong64,
+             PyTango.IMAGE,
+             PyTango.READ, 32, 32],
+             {
+                'description': "Serial transaction count per latency bucket (columns) and command type (rows)",
+             }],
+        'StatisticsWindow':
+            [[PyTango.DevLong,
+             PyTango.SCALAR,
+             PyTango.READ_WRITE],
+             {
+                'description': "Number of latest readings used for the frequency statistics",
+                'min value': 1,
              }],
         }
 
@@ -0,0 +1,72 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Alarm limits with hysteresis for frequency readings.
+'''
+
+
+class AlarmLimits:
+    def __init__(self, minimum=0.0, maximum=0.0, maxRate=0.0, hysteresis=0.0, rateHysteresis=0.0):
+        """ Minimum, maximum and rate of change limits. A limit of 0 is disabled.
+
+        The alarm goes active when a reading is outside a limit, and inactive
+        again only when the readings are back inside that limit by at least the
+        hysteresis, so that a noisy signal close to a limit does not toggle the
+        alarm. The other limits are checked without hysteresis.
+
+        Input:
+            minimum: lowest allowed reading in Hz
+            maximum: highest allowed reading in Hz
+            maxRate: highest allowed rate of change in Hz/s, either direction
+            hysteresis: margin in Hz to get out of a minimum or maximum alarm
+            rateHysteresis: margin in Hz/s to get out of a rate of change alarm
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.maxRate = maxRate
+        self.hysteresis = hysteresis
+        self.rateHysteresis = rateHysteresis
+        self.reset()
+
+    def reset(self):
+        self.active = False
+        self.reason = ''
+        # Limit that raised the alarm: 'minimum', 'maximum', 'rate' or ''
+        self.limit = ''
+        self.lastValue = None
+        self.lastTime = None
+        self.rate = None
+
+    def evaluate(self, value, timestamp):
+        """ Check a new reading against the limits.
+
+        output:
+            True if the alarm went active or inactive with this reading
+        """
+        if self.lastTime is not None and timestamp > self.lastTime:
+            self.rate = (value - self.lastValue) / (timestamp - self.lastTime)
+        self.lastValue = value
+        self.lastTime = timestamp
+        # Margin to cross to get out of alarm, only on the limit that raised it
+        mMin = self.hysteresis if self.limit == 'minimum' else 0.0
+        mMax = self.hysteresis if self.limit == 'maximum' else 0.0
+        mr = self.rateHysteresis if self.limit == 'rate' else 0.0
+        reason = ''
+        limit = ''
+        if self.minimum != 0 and value < self.minimum + mMin:
+            reason = ''.join(('Frequency ', str(value), ' Hz below ', str(self.minimum), ' Hz'))
+            limit = 'minimum'
+        elif self.maximum != 0 and value > self.maximum - mMax:
+            reason = ''.join(('Frequency ', str(value), ' Hz above ', str(self.maximum), ' Hz'))
+            limit = 'maximum'
+        elif self.maxRate != 0 and self.rate is not None and abs(self.rate) > self.maxRate - mr:
+            reason = ''.join(('Frequency changing ', '%.1f' % self.rate, ' Hz/s, limit ', str(self.maxRate), ' Hz/s'))
+            limit = 'rate'
+        active = reason != ''
+        changed = active != self.active
+        self.active = active
+        self.reason = reason
+        self.limit = limit
+        return changed
@@ -0,0 +1,607 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Event driven counterpart of Superlogics8080_control. One SerialEventLoop
+thread multiplexes any number of serial ports with select, so many ports and
+addresses are served concurrently without a thread blocking in serial.read
+for each of them.
+
+Commands return a Request immediately. The result is delivered to an optional
+callback in the loop thread, or collected with Request.wait from any thread.
+'''
+
+import collections
+import errno
+import heapq
+import os
+import select
+import threading
+import time
+import traceback
+import serial
+import Superlogics8080_codec as scodec
+
+# Guards the creation of the wait events of requests
+waitLock = threading.Lock()
+
+
+class Request:
+    def __init__(self, commands, parse=None, timeout=0.5, callback=None, retries=None):
+        """ One or more commands sent back to back to the same port. The
+        request fails on the first command that fails.
+
+        Input:
+            commands: list of command strings without carriage return
+            parse: callable taking the list of replies and returning the result. None returns the replies.
+            timeout: time in s to wait for each reply. None for the timeout of the port,
+                     see AsyncSuperlogics8080_control.commandTimeout.
+            callback: callable taking the finished request, called in the event loop thread
+            retries: times a command without reply is sent again. None for the
+                     default of the port, see AsyncSuperlogics8080_control.onTimeout.
+        """
+        self.commands = list(commands)
+        self.parse = parse
+        self.timeout = timeout
+        self.callback = callback
+        self.retries = retries
+        # Attempts of the current command after the first, and when it was last written
+        self.tries = 0
+        self.tSent = None
+        self.replies = []
+        self.result = None
+        self.error = None
+        self.t0 = None
+        self.t1 = None
+        # Event for wait, only made when somebody waits since most requests have a callback
+        self.finished = None
+
+    def done(self):
+        return self.t1 is not None
+
+    def finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        with waitLock:
+            self.t1 = time.time()
+            finished = self.finished
+        if finished is not None:
+            finished.set()
+        if self.callback is not None:
+            self.callback(self)
+
+    def wait(self, timeout=None):
+        """ Wait for the request to finish. Not to be called from the event loop thread.
+
+        output:
+            Request result. The request error is raised if it failed.
+        """
+        with waitLock:
+            if self.t1 is None and self.finished is None:
+                self.finished = threading.Event()
+            finished = self.finished
+        if finished is not None:
+            finished.wait(timeout)
+        if self.t1 is None:
+            raise(serial.SerialException('Request not finished'))
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SerialEventLoop:
+    def __init__(self):
+        """ Single thread select loop with file descriptor readers and timers.
+        Only callSoon, callLater, cancelTimer and stop may be called from other threads.
+        """
+        self.readers = {}
+        self.timers = []
+        self.newTimers = []
+        self.timerSeq = 0
+        self.pending = collections.deque()
+        self.pendingLock = threading.Lock()
+        # Time the loop sleeps until in select, None while it is running callbacks
+        self.sleepingUntil = None
+        self.wakeupRead, self.wakeupWrite = os.pipe()
+        # Descriptors to select on, the readers and the wakeup pipe
+        self.fds = [self.wakeupRead]
+        self.stopFlag = False
+        self.thread = None
+
+    def addReader(self, fd, callback):
+        self.readers[fd] = callback
+        self.fds = self.readers.keys() + [self.wakeupRead]
+
+    def removeReader(self, fd):
+        self.readers.pop(fd, None)
+        self.fds = self.readers.keys() + [self.wakeupRead]
+
+    def callLater(self, delay, callback):
+        """ Call callback in the loop thread after delay s. Thread safe.
+
+        output:
+            Timer handle for cancelTimer
+        """
+        with self.pendingLock:
+            self.timerSeq += 1
+            timer = [time.time() + delay, self.timerSeq, callback]
+            self.newTimers.append(timer)
+            # No wakeup needed if the loop is awake, or wakes up before the timer is due anyway
+            wake = self.sleepingUntil is not None and timer[0] < self.sleepingUntil
+        if wake is True:
+            self.wakeup()
+        return timer
+
+    def cancelTimer(self, timer):
+        # Cancelled timers stay in the heap until they reach its front
+        timer[2] = None
+
+    def callSoon(self, callback, *args):
+        """ Run callback(*args) in the loop thread. Thread safe.
+        """
+        with self.pendingLock:
+            self.pending.append((callback, args))
+            # A running loop sees the call before it goes back to select
+            wake = self.sleepingUntil is not None
+        if wake is True:
+            self.wakeup()
+
+    def wakeup(self):
+        try:
+            os.write(self.wakeupWrite, 'x')
+        except OSError:
+            pass
+
+    def callAndWait(self, callback, *args, **kwargs):
+        """ Run callback(*args) in the loop thread and wait for it to finish.
+        Thread safe. Runs at once if called from the loop thread or if the loop
+        is not running.
+
+        Input:
+            timeout: keyword argument, time in s to wait, default 2 s
+        output:
+            Return value of the callback. An exception raised by the callback is
+            raised here, SerialTimeoutException if it did not finish in time.
+        """
+        timeout = kwargs.get('timeout', 2.0)
+        if self.thread is None or self.thread is threading.current_thread():
+            return callback(*args)
+        done = threading.Event()
+        result = []
+        error = []
+
+        def run():
+            try:
+                result.append(callback(*args))
+            except Exception, ex:
+                error.append(ex)
+            finally:
+                done.set()
+        self.callSoon(run)
+        done.wait(timeout)
+        if done.is_set() is False:
+            raise(serial.SerialTimeoutException('Event loop call not finished'))
+        if len(error) > 0:
+            raise error[0]
+        return result[0]
+
+    def runOnce(self, timeout=None):
+        """ Wait for readable ports, due timers or calls from other threads,
+        at most timeout s, and run their callbacks.
+        """
+        with self.pendingLock:
+            if len(self.newTimers) > 0:
+                for timer in self.newTimers:
+                    heapq.heappush(self.timers, timer)
+                self.newTimers = []
+            # Cancelled timers at the front would wake the loop for nothing
+            timers = self.timers
+            while len(timers) > 0 and timers[0][2] is None:
+                heapq.heappop(timers)
+            t = time.time()
+            if len(self.pending) > 0:
+                timeout = 0
+            elif len(self.timers) > 0:
+                toNext = max(self.timers[0][0] - t, 0)
+                if timeout is None or toNext < timeout:
+                    timeout = toNext
+            if timeout is None:
+                self.sleepingUntil = float('inf')
+            else:
+                self.sleepingUntil = t + timeout
+        try:
+            r, w, e = select.select(self.fds, [], [], timeout)
+        except select.error:
+            r = []
+        with self.pendingLock:
+            self.sleepingUntil = None
+        for fd in r:
+            if fd == self.wakeupRead:
+                os.read(self.wakeupRead, 4096)
+                continue
+            callback = self.readers.get(fd)
+            if callback is not None:
+                self.runCallback(callback)
+        t = time.time()
+        while len(self.timers) > 0 and self.timers[0][0] <= t:
+            callback = heapq.heappop(self.timers)[2]
+            if callback is not None:
+                self.runCallback(callback)
+        while len(self.pending) > 0:
+            with self.pendingLock:
+                callback, args = self.pending.popleft()
+            self.runCallback(callback, *args)
+
+    def runCallback(self, callback, *args):
+        # One failing port or device must not stop the loop for the others
+        try:
+            callback(*args)
+        except Exception:
+            traceback.print_exc()
+
+    def run(self):
+        self.stopFlag = False
+        while self.stopFlag is False:
+            self.runOnce(1.0)
+
+    def start(self):
+        """ Run the loop in a daemon thread.
+        """
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        self.callSoon(self.setStopFlag)
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(2.0)
+            self.thread = None
+
+    def setStopFlag(self):
+        self.stopFlag = True
+
+    def close(self):
+        for fd in [self.wakeupRead, self.wakeupWrite]:
+            os.close(fd)
+
+
+class AsyncSuperlogics8080_control:
+    def __init__(self, loop, port, baudrate=9600, timeout=0.5, checksum=False, connect=True):
+        """ Superlogics 8080 modules on one serial port, driven by loop.
+
+        The bus is half duplex, so the requests of a port are sent one at a time
+        in the order they were made. Requests on different ports run concurrently.
+
+        Input:
+            loop: SerialEventLoop serving the port
+            port: serial port name
+            baudrate: port baud rate
+            timeout: default time in s to wait for each reply, when not attached
+            checksum: the modules have checksums enabled
+            connect: open the port now. Otherwise use connect or attach later.
+        """
+        self.loop = loop
+        self.codec = scodec.Superlogics8080_codec(checksum)
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.maxLength = 15
+        self.queue = collections.deque()
+        self.current = None
+        self.timer = None
+        self.rxBuf = bytearray()
+        self.stale = False
+        self.counters = {'transactions': 0, 'timeouts': 0, 'retries': 0, 'overlong': 0, 'invalid': 0, 'checksum': 0}
+        self.s = None
+        self.fd = None
+        # The port is a serial.Serial, its non blocking file descriptor is used
+        # directly since the loop already knows it is ready, see readPort
+        self.directIo = False
+        self.attached = None
+        if connect is True:
+            self.connect()
+
+    def connect(self):
+        """ Open the port in non blocking mode and register it with the loop.
+        Use loop.callSoon(ctrl.connect) to reconnect while requests are running.
+        """
+        self.close()
+        self.s = serial.Serial(self.port, self.baudrate, timeout=0, writeTimeout=0.5)
+        self.fd = self.s.fileno()
+        self.directIo = True
+        self.rxBuf = bytearray()
+        self.stale = False
+        self.loop.addReader(self.fd, self.onReadable)
+
+    def attach(self, ctrl):
+        """ Use the open port of a blocking Superlogics8080_control, with its
+        codec and counters, instead of a port of its own. Read timeouts, retries
+        and round trip times are those of ctrl, see Superlogics8080_control.sendReceive,
+        and transactions go into its latency histograms. Call from the loop thread,
+        and do not use ctrl until detach.
+        """
+        self.close()
+        self.attached = ctrl
+        self.codec = ctrl.codec
+        self.counters = ctrl.counters
+        self.rxBuf = bytearray()
+        self.stale = ctrl.stale
+        self.s = ctrl.s
+        if self.s is None:
+            # Requests fail with port not open
+            return
+        self.fd = self.s.fileno()
+        self.directIo = isinstance(self.s, serial.Serial)
+        self.loop.addReader(self.fd, self.onReadable)
+
+    def detach(self):
+        """ Stop using the port given to attach, leaving it open. Requests that
+        have not finished fail. Call from the loop thread.
+        """
+        ctrl = self.attached
+        if ctrl is None:
+            return
+        if self.fd is not None:
+            self.loop.removeReader(self.fd)
+            self.fd = None
+        if self.stale is True or len(self.rxBuf) > 0:
+            ctrl.stale = True
+        self.s = None
+        self.attached = None
+        if self.current is not None:
+            self.finishCurrent(error=serial.SerialException('Port detached'))
+
+    def close(self):
+        if self.attached is not None:
+            self.detach()
+            return
+        if self.fd is not None:
+            self.loop.removeReader(self.fd)
+            self.fd = None
+        if self.s is not None:
+            try:
+                self.s.close()
+            except Exception:
+                pass
+            self.s = None
+
+    def submit(self, commands, parse=None, timeout=None, callback=None, retries=None):
+        """ Queue a request. Thread safe.
+
+        Input:
+            see Request
+        output:
+            The Request
+        """
+        req = Request(commands, parse, timeout, callback, retries)
+        self.loop.callSoon(self.enqueue, req)
+        return req
+
+    def enqueue(self, req):
+        self.queue.append(req)
+        if self.current is None:
+            self.startNext()
+
+    def startNext(self):
+        while self.current is None and len(self.queue) > 0:
+            req = self.queue.popleft()
+            if self.s is None:
+                req.finish(error=serial.SerialException('Port not open'))
+                continue
+            self.current = req
+            req.t0 = time.time()
+            self.sendCommand()
+
+    def sendCommand(self):
+        req = self.current
+        if self.stale is True:
+            # A late reply to a timed out command could still be on its way
+            self.s.flushInput()
+            self.rxBuf = bytearray()
+            self.stale = False
+        cmd = req.commands[len(req.replies)]
+        frame = self.codec.frame(cmd)
+        try:
+            self.writePort(frame)
+        except Exception, ex:
+            self.finishCurrent(error=ex)
+            return
+        req.tSent = time.time()
+        self.counters['transactions'] += 1
+        self.timer = self.loop.callLater(self.commandTimeout(req, cmd, len(frame)), self.onTimeout)
+
+    def commandTimeout(self, req, cmd, frameLength):
+        """ Time to wait for the reply to cmd: the timeout of the request if it
+        has one, else the adaptive read timeout of the attached control, else the
+        default timeout of the port.
+        """
+        if req.timeout is not None:
+            return req.timeout
+        if self.attached is not None:
+            return self.attached.readTimeout(cmd[:5], frameLength, req.tries)
+        return self.timeout
+
+    def finishCurrent(self, result=None, error=None):
+        req = self.current
+        self.current = None
+        if self.timer is not None:
+            self.loop.cancelTimer(self.timer)
+            self.timer = None
+        try:
+            req.finish(result, error)
+        finally:
+            self.startNext()
+
+    def writePort(self, data):
+        """ Write data to the port. What a serial.Serial does not take at once
+        is written by serial.Serial.write, waiting up to its write timeout.
+        """
+        if self.directIo is True:
+            try:
+                n = os.write(self.fd, data)
+            except OSError, ex:
+                if ex.errno != errno.EAGAIN:
+                    raise
+                n = 0
+            if n == len(data):
+                return
+            data = data[n:]
+        self.s.write(data)
+
+    def readPort(self):
+        """ Everything waiting in the port. serial.Serial.read would wait in select
+        again, so a serial.Serial is read with os.read.
+        """
+        if self.directIo is False:
+            return self.s.read(max(self.s.inWaiting(), 1))
+        try:
+            data = os.read(self.fd, 4096)
+        except OSError, ex:
+            if ex.errno == errno.EAGAIN:
+                return ''
+            raise
+        if len(data) == 0:
+            raise(serial.SerialException('device reports readiness to read but returned no data'))
+        return data
+
+    def onReadable(self):
+        try:
+            data = self.readPort()
+        except Exception, ex:
+            # The port is gone. Fail everything until it is reconnected.
+            self.close()
+            error = serial.SerialException(''.join(('Port error: ', str(ex))))
+            if self.current is not None:
+                self.finishCurrent(error=error)
+            while len(self.queue) > 0:
+                self.queue.popleft().finish(error=error)
+            return
+        if self.current is None:
+            # Nobody is waiting for this, late reply or noise
+            return
+        self.rxBuf.extend(data)
+        while self.current is not None:
+            end = self.rxBuf.find('\r')
+            if end < 0:
+                if len(self.rxBuf) >= self.maxLength:
+                    frame = str(self.rxBuf)
+                    self.rxBuf = bytearray()
+                    self.stale = True
+                    self.counters['overlong'] += 1
+                    self.finishCurrent(error=serial.SerialException(''.join(('Received message too long: ', frame))))
+                break
+            frame = str(self.rxBuf[:end])
+            del self.rxBuf[:end + 1]
+            self.handleReply(frame)
+
+    def handleReply(self, frame):
+        req = self.current
+        self.loop.cancelTimer(self.timer)
+        self.timer = None
+        if len(frame) == 0:
+            self.finishCurrent(error=serial.SerialException('Nothing received'))
+            return
+        if self.attached is not None:
+            cmd = req.commands[len(req.replies)]
+            dt = time.time() - req.tSent
+            self.attached.recordLatency(cmd, dt)
+            self.attached.updateRtt(cmd[:5], dt)
+        req.tries = 0
+        try:
+            frame = self.codec.unframe(frame)
+        except scodec.ChecksumError, ex:
+            self.counters['checksum'] += 1
+            self.finishCurrent(error=ex)
+            return
+        if frame[0] == '?':
+            self.counters['invalid'] += 1
+            self.finishCurrent(error=ValueError('Invalid command'))
+            return
+        req.replies.append(frame)
+        if len(req.replies) < len(req.commands):
+            self.sendCommand()
+            return
+        try:
+            if req.parse is None:
+                result = req.replies
+            else:
+                result = req.parse(req.replies)
+        except Exception, ex:
+            self.finishCurrent(error=ex)
+            return
+        self.finishCurrent(result)
+
+    def onTimeout(self):
+        """ No reply in time. The command is sent again up to the retries of the
+        request, or maxRetries of the attached control if None, before the request fails.
+        """
+        self.timer = None
+        req = self.current
+        if req is None:
+            return
+        self.counters['timeouts'] += 1
+        self.stale = True
+        self.rxBuf = bytearray()
+        retries = req.retries
+        if retries is None:
+            retries = self.attached.maxRetries if self.attached is not None else 0
+        if req.tries < retries:
+            req.tries += 1
+            self.counters['retries'] += 1
+            self.sendCommand()
+            return
+        self.finishCurrent(error=serial.SerialException('Nothing received'))
+
+    def submitQuery(self, names, adr, parse, timeout, callback, retries=None):
+        cmds = [self.codec.command(name, adr) for name in names]
+        return self.submit(cmds, parse, timeout, callback, retries)
+
+    def getFrequency(self, adr=01, timeout=None, callback=None, retries=None):
+        return self.submitQuery(['frequency'], adr, lambda r: scodec.decodeFrequency(r[0]), timeout, callback,
+                                retries)
+
+    def getCounts(self, adr=01, channels=(0, 1), timeout=None, callback=None, retries=None):
+        """ Counter values of the channels as a tuple, see Superlogics8080_control.getCounts
+        """
+        names = [''.join(('count', str(ch))) for ch in channels]
+        return self.submitQuery(names, adr, lambda r: tuple([scodec.decodeFrequency(x) for x in r]),
+                                timeout, callback, retries)
+
+    def getConfiguration(self, adr=01, timeout=None, callback=None):
+        return self.submitQuery(['configuration'], adr, lambda r: scodec.decodeConfiguration(r[0]), timeout, callback)
+
+    def setConfiguration(self, adr=01, mode='frequency', baudrate=9600, checksum=None, timeout=None, callback=None):
+        """ Set mode, baud rate and checksum of the module. The port itself stays
+        at its baud rate and checksum setting, see Superlogics8080_control.setConfiguration.
+        """
+        cmd = self.codec.configurationCommand(adr, mode, baudrate, checksum)
+        return self.submit([cmd], lambda r: r[0], timeout, callback)
+
+    def getInputMode(self, adr=01, timeout=None, callback=None):
+        return self.submitQuery(['inputMode'], adr, lambda r: scodec.decodeInputMode(r[0]), timeout, callback)
+
+    def getStatus(self, adr=01, timeout=None, callback=None):
+        return self.submitQuery(['status'], adr, lambda r: scodec.decodeStatus(r[0]), timeout, callback)
+
+    def getTriggerLevels(self, adr=01, timeout=None, callback=None):
+        """ Trigger levels in V, as a tuple containing (high level, low level)
+        like Superlogics8080_control.getTriggerLevels
+        """
+        return self.submitQuery(['lowLevel', 'highLevel'], adr,
+                                lambda r: (scodec.decodeTriggerLevel(r[1]), scodec.decodeTriggerLevel(r[0])),
+                                timeout, callback)
+
+    def setTriggerLevels(self, adr=01, low_level=0.5, high_level=2.4, timeout=None, callback=None):
+        cmds = [self.codec.triggerLevelCommand(adr, 'L', low_level), self.codec.triggerLevelCommand(adr, 'H', high_level)]
+        return self.submit(cmds, lambda r: None, timeout, callback)
+
+
+if __name__ == '__main__':
+    loop = SerialEventLoop()
+    loop.start()
+    ctrl = AsyncSuperlogics8080_control(loop, '/dev/ttyUSB1')
+    print ctrl.getConfiguration(1).wait(2.0)
+    print ctrl.getFrequency(1).wait(2.0)
+    loop.stop()
@@ -0,0 +1,662 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Benchmarks of Superlogics8080_control and Superlogics8080DS.
+
+The frame reader benchmark runs the control class against an in memory
+stand-in for the serial port that answers every command immediately, so the
+numbers measure the python overhead per transaction rather than the wire time.
+
+The codec benchmark measures the cost of building a command frame and decoding
+its reply, with the original string building and parsing code as reference.
+
+The transaction benchmark runs every command type of the control class
+against Superlogics8080_simulator in a separate process, sweeping baud rates
+and number of module addresses. Results can be written as json and compared
+against a stored baseline.
+
+The port benchmark polls the frequency of the modules on many simulated ports,
+once with a blocking Superlogics8080_control and thread per port, and once
+with a single Superlogics8080_async event loop, and compares throughput,
+thread count, cpu time and memory.
+
+The engine benchmark runs the polling of many simulated counters, each on a
+port of its own, the way Superlogics8080DS does it: once with a state thread
+per device and once in steps on a shared Superlogics8080_engine, and reports
+cpu time per device, threads and context switches.
+
+The replay benchmark runs the commands of a capture of real serial traffic,
+recorded with Superlogics8080_capture, through the control class against a
+replay of the same capture, at the recorded or an accelerated speed.
+
+The read latency benchmark hammers the Frequency attribute of a running
+Superlogics8080DS device from many client threads while it is polling.
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import select
+import sys
+import threading
+import time
+import numpy as np
+import serial
+import Superlogics8080_control as sc
+import Superlogics8080_async as sa
+import Superlogics8080_codec as scodec
+import Superlogics8080_simulator as ssim
+import Superlogics8080_bus as sb
+import Superlogics8080_scheduler as ssched
+import Superlogics8080_engine as sengine
+import Superlogics8080_capture as scap
+
+# Command types of the transaction benchmark. Each takes the control object and an address.
+# Cached data is refreshed so that every call goes to the module.
+commandTypes = [('getFrequency', lambda ctrl, adr: ctrl.getFrequency(adr)),
+                ('getConfiguration', lambda ctrl, adr: ctrl.getConfiguration(adr, refresh=True)),
+                ('getStatus', lambda ctrl, adr: ctrl.getStatus(adr)),
+                ('getTriggerLevels', lambda ctrl, adr: ctrl.getTriggerLevels(adr, refresh=True)),
+                ('setTriggerLevels', lambda ctrl, adr: ctrl.setTriggerLevels(adr, 0.5, 2.4))]
+
+
+class LoopbackSerial:
+    """ Minimal serial port stand-in answering 8080 commands from a reply table.
+    Replies are made available in full as soon as the command is written.
+    """
+    def __init__(self, replies=None):
+        if replies is None:
+            replies = {'$012': '!01510600',
+                       '#010': '>0000C350',
+                       '~010': '!0100'}
+        self.replies = replies
+        self.outBuf = ''
+
+    def write(self, data):
+        self.outBuf = ''.join((self.outBuf, self.replies.get(data[:-1], '?01'), '\r'))
+        return len(data)
+
+    def inWaiting(self):
+        return len(self.outBuf)
+
+    def read(self, size=1):
+        data = self.outBuf[:size]
+        self.outBuf = self.outBuf[size:]
+        return data
+
+    def flushInput(self):
+        self.outBuf = ''
+
+    def close(self):
+        pass
+
+
+class LoopbackControl(sc.Superlogics8080_control):
+    """ Superlogics8080_control connected to a LoopbackSerial instead of a real port.
+    """
+    def connect(self):
+        self.close()
+        self.rxBuf = bytearray()
+        self.s = LoopbackSerial()
+        self.connected = True
+
+
+def legacySendReceive(ctrl, cmd):
+    """ The original one byte at a time reader, kept as reference for the benchmark.
+    """
+    ctrl.s.write(''.join((cmd, '\r')))
+    readBuf = ''
+    readChr = ''
+    maxLength = 15
+    while readChr != '\r' and readBuf.__len__() < maxLength:
+        readChr = ctrl.s.read(1)
+        if readChr == '':
+            break
+        if readChr != '\r':
+            readBuf = ''.join((readBuf, readChr))
+    if readBuf.__len__() >= maxLength:
+        raise(serial.SerialException(''.join(('Received message too long: ', readBuf))))
+    if readBuf.__len__() == 0:
+        raise(serial.SerialException('Nothing received'))
+    if readBuf[0] == '?':
+        raise(ValueError('Invalid command'))
+    return readBuf
+
+
+def legacyFrequency(adr, reply):
+    """ Command building and reply parsing of the original getFrequency, for reference
+    """
+    cmd = '#' + str(adr).zfill(2) + '0'
+    frame = ''.join((cmd, '\r'))
+    return frame, int(reply[1:], 16)
+
+
+def legacyConfiguration(adr, conf):
+    """ Command building and reply parsing of the original getConfiguration, for reference
+    """
+    cmd = '$' + str(adr).zfill(2) + '2'
+    frame = ''.join((cmd, '\r'))
+    retVal = None
+    try:
+        if conf[0] == '!':
+            adr = conf[1:3]
+            mode = conf[3:5]
+            mode_dict = {'50': 'counter',
+                         '51': 'frequency'}
+            baud = conf[5:7].lower()
+            baud_dict = {'03': 1200,
+                         '04': 2400,
+                         '05': 4800,
+                         '06': 9600,
+                         '07': 19200,
+                         '08': 38400,
+                         '09': 57600,
+                         '0a': 115200}
+            retVal = (int(adr), mode_dict[mode], baud_dict[baud])
+    except:
+        retVal = None
+    return frame, retVal
+
+
+def benchmarkCodec(n=200000):
+    """ Encode and decode cost per transaction in us for the original code and the codec,
+    without and with checksums.
+    """
+    replies = {'frequency': '>0000C350', 'configuration': '!01510600'}
+    legacy = {'frequency': legacyFrequency, 'configuration': legacyConfiguration}
+    for name in ['frequency', 'configuration']:
+        reply = replies[name]
+        func = legacy[name]
+        t0 = time.time()
+        for i in xrange(n):
+            func(1, reply)
+        print ''.join(('%-14s original:          %6.3f us' % (name, (time.time() - t0) * 1e6 / n)))
+        for checksum in [False, True]:
+            codec = scodec.Superlogics8080_codec(checksum)
+            decoder = scodec.decoders[name]
+            framed = reply
+            if checksum is True:
+                framed = ''.join((reply, scodec.checksum(reply)))
+            t0 = time.time()
+            for i in xrange(n):
+                codec.frame(codec.command(name, 1))
+                decoder(codec.unframe(framed))
+            print ''.join(('%-14s codec, checksum %-3s %6.3f us' % (name, 'on' if checksum else 'off',
+                                                                     (time.time() - t0) * 1e6 / n)))
+
+
+def runTransactions(sendReceive, cmd, n):
+    """ Run n transactions of cmd through sendReceive.
+
+    output:
+        Transactions per second
+    """
+    t0 = time.time()
+    for i in xrange(n):
+        sendReceive(cmd)
+    return n / (time.time() - t0)
+
+
+def benchmarkFrameReader(n=100000):
+    ctrl = LoopbackControl('loopback')
+    cmd = '#010'
+    legacyRate = runTransactions(lambda c: legacySendReceive(ctrl, c), cmd, n)
+    bufferedRate = runTransactions(ctrl.sendReceive, cmd, n)
+    print ''.join(('Per byte reader: ', str(int(legacyRate)), ' transactions/s'))
+    print ''.join(('Buffered reader: ', str(int(bufferedRate)), ' transactions/s'))
+    print ''.join(('Speedup:         ', '%.2f' % (bufferedRate / legacyRate)))
+
+
+def serveSimulator(conn, addresses, baudrate, latency):
+    sim = ssim.Superlogics8080_simulator(addresses, baudrate, latency)
+    conn.send(sim.start())
+    # Serve until the parent terminates the process
+    conn.recv()
+
+
+def startSimulatorProcess(addresses, baudrate, latency=0.0):
+    """ Run a simulator in a separate process so that its cpu time is not
+    counted in the benchmark.
+
+    output:
+        Tuple containing (process, port name, pipe end). Send anything on the pipe to stop the process.
+    """
+    parentConn, childConn = multiprocessing.Pipe()
+    proc = multiprocessing.Process(target=serveSimulator, args=(childConn, addresses, baudrate, latency))
+    proc.daemon = True
+    proc.start()
+    return proc, parentConn.recv(), parentConn
+
+
+def serveSimulators(conn, portCount, addresses, baudrate, latency):
+    sims = [ssim.Superlogics8080_simulator(addresses, baudrate, latency) for i in range(portCount)]
+    conn.send([sim.start() for sim in sims])
+    conn.recv()
+
+
+def processMemory():
+    """ Resident memory of this process in kB
+    """
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def pollThreaded(ports, addresses, baudrate, duration):
+    """ Poll getFrequency of every address with one blocking control and thread per port.
+
+    output:
+        Tuple containing (transactions, errors, threads and resident memory in kB during the poll)
+    """
+    counts = [[0, 0] for port in ports]
+    stopTime = time.time() + duration
+
+    def poller(port, count):
+        ctrl = sc.Superlogics8080_control(port, baudrate, probe=False)
+        i = 0
+        while time.time() < stopTime:
+            try:
+                ctrl.getFrequency(addresses[i % len(addresses)])
+                count[0] += 1
+            except Exception:
+                count[1] += 1
+            i += 1
+        ctrl.close()
+
+    threads = [threading.Thread(target=poller, args=(ports[k], counts[k])) for k in range(len(ports))]
+    for t in threads:
+        t.start()
+    time.sleep(duration / 2)
+    threadCount = threading.active_count()
+    memory = processMemory()
+    for t in threads:
+        t.join()
+    return sum([c[0] for c in counts]), sum([c[1] for c in counts]), threadCount, memory
+
+
+def pollAsync(ports, addresses, baudrate, duration):
+    """ Poll getFrequency of every address on all ports from one event loop.
+    Each port always has one request in flight, the next one is made from the
+    callback of the previous.
+
+    output:
+        Tuple containing (transactions, errors, threads and resident memory in kB during the poll)
+    """
+    loop = sa.SerialEventLoop()
+    counts = [0, 0]
+    stopTime = time.time() + duration
+    ctrls = [sa.AsyncSuperlogics8080_control(loop, port, baudrate) for port in ports]
+
+    def nextRequest(ctrl, i):
+        def done(req):
+            if req.error is None:
+                counts[0] += 1
+            else:
+                counts[1] += 1
+            if time.time() < stopTime:
+                nextRequest(ctrl, i + 1)
+        ctrl.getFrequency(addresses[i % len(addresses)], callback=done)
+
+    for ctrl in ctrls:
+        nextRequest(ctrl, 0)
+    loop.start()
+    time.sleep(duration / 2)
+    threadCount = threading.active_count()
+    memory = processMemory()
+    time.sleep(duration / 2 + 0.5)
+    loop.stop()
+    for ctrl in ctrls:
+        ctrl.close()
+    loop.close()
+    return counts[0], counts[1], threadCount, memory
+
+
+def benchmarkPorts(portCounts=(1, 10, 30), nAdr=2, baudrate=115200, duration=5.0):
+    """ Compare thread per port polling with the event loop for a number of simulated ports.
+    """
+    for portCount in portCounts:
+        parentConn, childConn = multiprocessing.Pipe()
+        proc = multiprocessing.Process(target=serveSimulators,
+                                       args=(childConn, portCount, range(1, nAdr + 1), baudrate, 0.0))
+        proc.daemon = True
+        proc.start()
+        ports = parentConn.recv()
+        for name, poll in [('threads', pollThreaded), ('event loop', pollAsync)]:
+            mem0 = processMemory()
+            cpu0 = resource.getrusage(resource.RUSAGE_SELF)
+            n, errors, threadCount, memory = poll(ports, range(1, nAdr + 1), baudrate, duration)
+            cpu1 = resource.getrusage(resource.RUSAGE_SELF)
+            cpu = (cpu1.ru_utime + cpu1.ru_stime - cpu0.ru_utime - cpu0.ru_stime) * 1e3 / max(n, 1)
+            print ''.join(('%3d ports %-10s: %8.1f /s  threads %3d  cpu %.3f ms  memory +%d kB  errors %d' %
+                           (portCount, name, n / duration, threadCount, cpu, memory - mem0, errors)))
+        parentConn.send('stop')
+        proc.join(2.0)
+
+
+class PollingDevice:
+    """ The ON state of Superlogics8080DS without Tango: the bus of one port
+    polled on a DeadlineScheduler grid, waiting for commands between the polls.
+    Runs in a thread of its own, or in steps on engine if it is not None.
+    """
+    def __init__(self, port, addresses, baudrate, pollRate, engine=None):
+        self.ctrl = sc.Superlogics8080_control(port, baudrate, probe=False)
+        self.bus = sb.Superlogics8080_bus(self.ctrl, addresses)
+        self.scheduler = ssched.DeadlineScheduler(1.0 / pollRate)
+        self.engine = engine
+        self.readings = 0
+        self.errors = 0
+        self.pollInFlight = False
+        self.stopFlag = False
+        if engine is None:
+            self.wakeup = os.pipe()
+            self.thread = threading.Thread(target=self.run)
+        else:
+            self.asyncCtrl = sa.AsyncSuperlogics8080_control(engine.loop, port, connect=False)
+            self.stepper = sengine.StateStepper(engine, self.step)
+
+    def start(self):
+        self.scheduler.start()
+        if self.engine is None:
+            self.thread.start()
+        else:
+            self.stepper.start()
+
+    def step(self):
+        wait = self.scheduler.timeToDeadline()
+        if self.engine is not None:
+            self.pollInFlight = True
+            self.engine.loop.callLater(max(wait, 0), self.startPoll)
+            return None
+        if wait > 0:
+            return wait
+        self.scheduler.cycleStarted()
+        self.process(self.bus.pollCycle())
+        return max(self.scheduler.timeToDeadline(), 0)
+
+    def startPoll(self):
+        if self.stopFlag is True:
+            return
+        self.scheduler.cycleStarted()
+        if self.asyncCtrl.attached is not self.ctrl:
+            self.asyncCtrl.attach(self.ctrl)
+        self.bus.pollCycleAsync(self.asyncCtrl, self.pollDone)
+
+    def pollDone(self, polled):
+        # Like Superlogics8080DS.pollDone, polls follow each other in the event loop
+        self.process(polled)
+        if self.stopFlag is False:
+            self.engine.loop.callLater(max(self.scheduler.timeToDeadline(), 0), self.startPoll)
+            return
+        self.asyncCtrl.detach()
+        self.pollInFlight = False
+
+    def process(self, polled):
+        for st in polled:
+            if st.consecutiveErrors > 0:
+                self.errors += 1
+            else:
+                self.readings += 1
+
+    def run(self):
+        # The loop of stateHandlerDispatcher, commands are waited for with select
+        while self.stopFlag is False:
+            delay = self.step()
+            select.select([self.wakeup[0]], [], [], delay)
+
+    def stop(self):
+        self.stopFlag = True
+        if self.engine is None:
+            os.write(self.wakeup[1], 'c')
+            self.thread.join(2.0)
+            for fd in self.wakeup:
+                os.close(fd)
+        else:
+            self.stepper.stop()
+            self.engine.loop.callAndWait(self.asyncCtrl.detach)
+        self.ctrl.close()
+
+
+def pollDevices(ports, addresses, baudrate, pollRate, duration, workers):
+    """ Run a PollingDevice per port for duration s, with a thread each if
+    workers is 0, otherwise on an engine with that many workers.
+
+    output:
+        Tuple containing (readings, errors, threads, context switches, cpu time in s)
+    """
+    engine = None
+    if workers > 0:
+        engine = sengine.IoEngine(workers)
+    devices = [PollingDevice(port, addresses, baudrate, pollRate, engine) for port in ports]
+    # Let the devices settle before measuring
+    for dev in devices:
+        dev.start()
+    time.sleep(1.0)
+    r0 = [(dev.readings, dev.errors) for dev in devices]
+    cpu0 = resource.getrusage(resource.RUSAGE_SELF)
+    time.sleep(duration)
+    cpu1 = resource.getrusage(resource.RUSAGE_SELF)
+    threadCount = threading.active_count()
+    readings = sum([dev.readings - r[0] for dev, r in zip(devices, r0)])
+    errors = sum([dev.errors - r[1] for dev, r in zip(devices, r0)])
+    for dev in devices:
+        dev.stop()
+    if engine is not None:
+        engine.stop()
+    switches = cpu1.ru_nvcsw + cpu1.ru_nivcsw - cpu0.ru_nvcsw - cpu0.ru_nivcsw
+    cpu = cpu1.ru_utime + cpu1.ru_stime - cpu0.ru_utime - cpu0.ru_stime
+    return readings, errors, threadCount, switches, cpu
+
+
+def benchmarkEngine(deviceCounts=(1, 10, 50), nAdr=1, baudrate=9600, pollRate=5.0, duration=10.0, workers=4):
+    """ Compare a state thread per device with the shared engine for a number
+    of simulated counters, each on a port of its own.
+    """
+    for deviceCount in deviceCounts:
+        parentConn, childConn = multiprocessing.Pipe()
+        proc = multiprocessing.Process(target=serveSimulators,
+                                       args=(childConn, deviceCount, range(1, nAdr + 1), baudrate, 0.0))
+        proc.daemon = True
+        proc.start()
+        ports = parentConn.recv()
+        for name, w in [('threads', 0), ('engine', workers)]:
+            n, errors, threadCount, switches, cpu = pollDevices(ports, range(1, nAdr + 1), baudrate,
+                                                                pollRate, duration, w)
+            print ''.join(('%3d devices %-8s: %7.1f readings/s  threads %3d  cpu/device %.2f ms/s  '
+                           'context switches %6.0f /s  errors %d' %
+                           (deviceCount, name, n / duration, threadCount, cpu * 1e3 / duration / deviceCount,
+                            switches / duration, errors)))
+        parentConn.send('stop')
+        proc.join(2.0)
+
+
+def benchmarkReplay(filename, speeds=(1.0, 0.0), checksum=False):
+    """ Replay a capture through the control class at each speed, 0 for as fast as possible.
+    """
+    stats = scap.summarize(scap.readCapture(filename))
+    print ''.join(('Capture: %.1f s, %d writes, %d timeouts, %d invalid, %d overlong, %d garbage '
+                   '(%d stray bytes), %d host down' %
+                   (stats['duration'], stats['writes'], stats['timeouts'], stats['invalid'], stats['overlong'],
+                    stats['garbage'], stats['strayBytes'], stats['hostDown'])))
+    for speed in speeds:
+        r = scap.replayTraffic(filename, speed, checksum)
+        n = max(r['transactions'], 1)
+        print ''.join(('speed %-6s: %8.1f transactions/s  cpu %.3f ms/transaction  ok %d  timeout %d  '
+                       'overlong %d  invalid %d  checksum %d  garbage %d  mismatches %d' %
+                       (str(speed) if speed > 0 else 'max', r['transactions'] / r['elapsed'], r['cpu'] * 1e3 / n,
+                        r['ok'], r['timeout'], r['overlong'], r['invalid'], r['checksum'], r['garbage'],
+                        r['mismatches'])))
+
+
+def measureCommand(ctrl, func, addresses, n):
+    """ Call func n times, cycling through addresses.
+
+    output:
+        Dict with transaction rate, latency percentiles in ms, cpu time per
+        transaction in ms and number of errors
+    """
+    lat = np.zeros(n)
+    errors = 0
+    cpu0 = resource.getrusage(resource.RUSAGE_SELF)
+    t0 = time.time()
+    for i in xrange(n):
+        t = time.time()
+        try:
+            func(ctrl, addresses[i % len(addresses)])
+        except Exception:
+            errors += 1
+        lat[i] = time.time() - t
+    dt = time.time() - t0
+    cpu1 = resource.getrusage(resource.RUSAGE_SELF)
+    lat *= 1e3
+    return {'rate': n / dt,
+            'p50': np.percentile(lat, 50),
+            'p95': np.percentile(lat, 95),
+            'p99': np.percentile(lat, 99),
+            'cpu': (cpu1.ru_utime + cpu1.ru_stime - cpu0.ru_utime - cpu0.ru_stime) * 1e3 / n,
+            'errors': errors}
+
+
+def benchmarkTransactions(baudrates=(9600, 115200), addressCounts=(1, 8), n=100, latency=0.0):
+    """ Run every command type in commandTypes against a simulator for each
+    combination of baud rate and number of addresses.
+
+    output:
+        List of result dicts, see measureCommand, with command, baudrate, addresses and n added
+    """
+    results = []
+    for baudrate in baudrates:
+        for nAdr in addressCounts:
+            addresses = range(1, nAdr + 1)
+            proc, port, conn = startSimulatorProcess(addresses, baudrate, latency)
+            ctrl = sc.Superlogics8080_control(port, baudrate)
+            for name, func in commandTypes:
+                res = measureCommand(ctrl, func, addresses, n)
+                res.update({'command': name, 'baudrate': baudrate, 'addresses': nAdr, 'n': n})
+                results.append(res)
+                print ''.join(('%-17s %6d baud %3d adr: %8.1f /s  p50 %7.2f  p95 %7.2f  p99 %7.2f ms  '
+                               'cpu %.3f ms  errors %d' % (name, baudrate, nAdr, res['rate'], res['p50'],
+                                                           res['p95'], res['p99'], res['cpu'], res['errors'])))
+            ctrl.close()
+            conn.send('stop')
+            proc.join(2.0)
+    return results
+
+
+def compareBaseline(results, baseline, tolerance=0.2):
+    """ Compare benchmark results with a baseline from an earlier run.
+    A result is a regression if its rate is more than tolerance lower, or its
+    p95 latency more than tolerance higher, than the baseline.
+
+    output:
+        List of regression descriptions (strings)
+    """
+    key = lambda r: (r['command'], r['baudrate'], r['addresses'])
+    base = dict([(key(r), r) for r in baseline])
+    regressions = []
+    for r in results:
+        b = base.get(key(r))
+        if b is None:
+            continue
+        if r['rate'] < b['rate'] * (1 - tolerance):
+            regressions.append('%s %d baud %d adr: rate %.1f /s, baseline %.1f /s' % (key(r) + (r['rate'], b['rate'])))
+        if r['p95'] > b['p95'] * (1 + tolerance):
+            regressions.append('%s %d baud %d adr: p95 %.2f ms, baseline %.2f ms' % (key(r) + (r['p95'], b['p95'])))
+    return regressions
+
+
+def benchmarkReadLatency(deviceName, nThreads=20, duration=10.0, attrName='Frequency'):
+    """ Read attrName of deviceName as fast as possible from nThreads client threads
+    and report the read latency distribution. The device should be in ON state,
+    polling the counter, while this runs.
+    """
+    import PyTango
+    latencies = [[] for i in range(nThreads)]
+    stopTime = time.time() + duration
+
+    def reader(result):
+        dev = PyTango.DeviceProxy(deviceName)
+        while time.time() < stopTime:
+            t0 = time.time()
+            dev.read_attribute(attrName)
+            result.append(time.time() - t0)
+
+    threads = [threading.Thread(target=reader, args=(latencies[i],)) for i in range(nThreads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    lat = np.array([l for result in latencies for l in result]) * 1e3
+    print ''.join((str(nThreads), ' threads, ', str(lat.shape[0]), ' reads, ',
+                   str(int(lat.shape[0] / duration)), ' reads/s'))
+    print ''.join(('Latency ms: p50 %.2f, p95 %.2f, p99 %.2f, max %.2f' %
+                   (np.percentile(lat, 50), np.percentile(lat, 95), np.percentile(lat, 99), lat.max())))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Superlogics8080 benchmarks')
+    sub = parser.add_subparsers(dest='benchmark')
+    p = sub.add_parser('framereader', help='per byte vs buffered frame reader')
+    p.add_argument('-n', type=int, default=100000, help='number of transactions')
+    p = sub.add_parser('codec', help='command encoding and reply decoding cost')
+    p.add_argument('-n', type=int, default=200000, help='number of transactions')
+    p = sub.add_parser('transactions', help='throughput and latency per command type against the simulator')
+    p.add_argument('-n', type=int, default=100, help='number of transactions per command type')
+    p.add_argument('-b', '--baudrates', type=int, nargs='+', default=[9600, 115200])
+    p.add_argument('-a', '--addresses', type=int, nargs='+', default=[1, 8], help='number of addresses on the bus')
+    p.add_argument('-l', '--latency', type=float, default=0.0, help='simulated module turnaround time in s')
+    p.add_argument('-o', '--output', help='write results as json to this file')
+    p.add_argument('--baseline', help='json results of an earlier run to compare with')
+    p.add_argument('--tolerance', type=float, default=0.2, help='relative change counted as regression')
+    p = sub.add_parser('ports', help='thread per port vs event loop polling of many simulated ports')
+    p.add_argument('-p', '--ports', type=int, nargs='+', default=[1, 10, 30], help='number of ports')
+    p.add_argument('-a', '--addresses', type=int, default=2, help='number of addresses per port')
+    p.add_argument('-b', '--baudrate', type=int, default=115200)
+    p.add_argument('-d', '--duration', type=float, default=5.0)
+    p = sub.add_parser('engine', help='state thread per device vs shared engine for many simulated counters')
+    p.add_argument('-n', '--devices', type=int, nargs='+', default=[1, 10, 50], help='number of devices')
+    p.add_argument('-a', '--addresses', type=int, default=1, help='number of addresses per port')
+    p.add_argument('-b', '--baudrate', type=int, default=9600)
+    p.add_argument('-r', '--rate', type=float, default=5.0, help='poll cycles per s of each device')
+    p.add_argument('-w', '--workers', type=int, default=4, help='worker threads of the engine')
+    p.add_argument('-d', '--duration', type=float, default=10.0)
+    p = sub.add_parser('replay', help='control class throughput on a replayed capture of serial traffic')
+    p.add_argument('capture', help='capture file')
+    p.add_argument('-s', '--speeds', type=float, nargs='+', default=[1.0, 0.0],
+                   help='replay speed factors, 0 for as fast as possible')
+    p.add_argument('--checksum', action='store_true', help='the captured modules used checksums')
+    p = sub.add_parser('readlatency', help='attribute read latency under concurrent client load')
+    p.add_argument('device', help='Tango name of a running Superlogics8080DS device')
+    p.add_argument('-t', '--threads', type=int, default=20)
+    p.add_argument('-d', '--duration', type=float, default=10.0)
+    args = parser.parse_args()
+    if args.benchmark == 'framereader':
+        benchmarkFrameReader(args.n)
+    elif args.benchmark == 'codec':
+        benchmarkCodec(args.n)
+    elif args.benchmark == 'transactions':
+        results = benchmarkTransactions(args.baudrates, args.addresses, args.n, args.latency)
+        if args.output is not None:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=1)
+        if args.baseline is not None:
+            with open(args.baseline) as f:
+                regressions = compareBaseline(results, json.load(f), args.tolerance)
+            for r in regressions:
+                print ''.join(('Regression: ', r))
+            if len(regressions) > 0:
+                sys.exit(1)
+    elif args.benchmark == 'ports':
+        benchmarkPorts(args.ports, args.addresses, args.baudrate, args.duration)
+    elif args.benchmark == 'replay':
+        benchmarkReplay(args.capture, args.speeds, args.checksum)
+    elif args.benchmark == 'engine':
+        benchmarkEngine(args.devices, args.addresses, args.baudrate, args.rate, args.duration, args.workers)
+    else:
+        for n in [1, args.threads // 4, args.threads]:
+            benchmarkReadLatency(args.device, max(n, 1), args.duration)
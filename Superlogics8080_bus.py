@@ -0,0 +1,197 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Round robin polling of several 8080 modules sharing one RS-485 line.
+'''
+
+import time
+
+
+class AddressState:
+    """ Latest result and fault bookkeeping for one module address on the bus.
+    """
+    def __init__(self, adr):
+        self.adr = adr
+        self.frequency = None
+        self.counts = None
+        self.timestamp = None
+        self.faulty = False
+        self.errorCount = 0
+        self.consecutiveErrors = 0
+        self.nextRetry = 0.0
+        self.lastError = ''
+
+
+class Superlogics8080_bus:
+    def __init__(self, control, addresses, maxConsecutiveErrors=3, faultRetryInterval=5.0, mode='frequency'):
+        """ Poll frequency, or the counts of both channels, of a number of modules on the same serial port.
+
+        Input:
+            control: Superlogics8080_control instance owning the port
+            addresses: list of module addresses (integers)
+            maxConsecutiveErrors: failed reads in a row before an address is marked faulty
+            faultRetryInterval: time in s between read attempts on a faulty address
+            mode: 'frequency' or 'counter', the mode the modules are configured to
+        """
+        self.control = control
+        self.mode = mode
+        self.maxConsecutiveErrors = maxConsecutiveErrors
+        self.faultRetryInterval = faultRetryInterval
+        self.addresses = []
+        self.states = {}
+        self.setAddresses(addresses)
+
+    def setAddresses(self, addresses):
+        self.addresses = [int(adr) for adr in addresses]
+        self.states = dict([(adr, self.states.get(adr, AddressState(adr))) for adr in self.addresses])
+
+    def markError(self, adr, ex):
+        """ Record a failed transaction with address adr. The address is taken out of
+        the normal polling cycle after maxConsecutiveErrors errors in a row.
+        """
+        st = self.states[adr]
+        st.frequency = None
+        st.counts = None
+        st.timestamp = time.time()
+        st.errorCount += 1
+        st.consecutiveErrors += 1
+        st.lastError = str(ex)
+        if st.consecutiveErrors >= self.maxConsecutiveErrors:
+            st.faulty = True
+            st.nextRetry = time.time() + self.faultRetryInterval
+
+    def markOk(self, adr):
+        st = self.states[adr]
+        st.faulty = False
+        st.consecutiveErrors = 0
+        st.lastError = ''
+
+    def isDue(self, adr, t=None):
+        st = self.states[adr]
+        if st.faulty is False:
+            return True
+        if t is None:
+            t = time.time()
+        return t >= st.nextRetry
+
+    def rttKey(self, adr):
+        """ Round trip time key of the reading command of adr, see Superlogics8080_control.updateRtt
+        """
+        return self.control.codec.command('count0' if self.mode == 'counter' else 'frequency', adr)[:5]
+
+    def retryTimeout(self, adr):
+        """ Read timeout for an address that has stopped answering, or never has:
+        the longest read timeout measured on the addresses that answer and on adr
+        itself. The maxTimeout of the control if none of them has been measured.
+        """
+        ctrl = self.control
+        timeout = None
+        for a in self.addresses:
+            if a != adr and self.states[a].consecutiveErrors > 0:
+                continue
+            est = ctrl.rtt.get(self.rttKey(a))
+            if est is not None and (timeout is None or est[2] > timeout):
+                timeout = est[2]
+        if timeout is None or timeout > ctrl.maxTimeout:
+            return ctrl.maxTimeout
+        return timeout
+
+    def pollLimits(self, adr):
+        """ Longest read timeout and retries for the next read of adr. An address
+        without round trip measurements of its own waits for the retryTimeout, and
+        after a failed read it only gets one attempt, so that a silent module costs
+        little bus time.
+
+        output:
+            Tuple containing (timeout, retries), None where the control decides
+        """
+        if self.states[adr].consecutiveErrors > 0:
+            return (self.retryTimeout(adr), 0)
+        if self.rttKey(adr) not in self.control.rtt:
+            return (self.retryTimeout(adr), None)
+        return (None, None)
+
+    def poll(self, adr):
+        """ Read an address, within the pollLimits.
+        """
+        st = self.states[adr]
+        timeout, retries = self.pollLimits(adr)
+        try:
+            if self.mode == 'counter':
+                st.counts = self.control.getCounts(adr, maxTimeout=timeout, maxRetries=retries)
+            else:
+                st.frequency = self.control.getFrequency(adr, maxTimeout=timeout, maxRetries=retries)
+        except Exception, ex:
+            self.markError(adr, ex)
+            return st
+        st.timestamp = time.time()
+        self.markOk(adr)
+        return st
+
+    def pollCycle(self, interrupt=None):
+        """ Poll every address that is due once, in address list order.
+        Faulty addresses are only retried every faultRetryInterval so that a
+        silent module does not stall the others.
+
+        Input:
+            interrupt: callable checked before each transaction. The cycle stops early if it returns True.
+        output:
+            List of AddressState for the polled addresses
+        """
+        t = time.time()
+        polled = []
+        for adr in self.addresses:
+            if interrupt is not None and interrupt() is True:
+                break
+            if self.isDue(adr, t):
+                polled.append(self.poll(adr))
+        return polled
+
+    def pollCycleAsync(self, control, done):
+        """ Poll every address that is due once, like pollCycle, through a
+        Superlogics8080_async control attached to the control of the bus. The
+        requests are queued at once and run back to back in its event loop, nothing
+        waits here for the port.
+
+        Input:
+            control: AsyncSuperlogics8080_control on the port of the bus
+            done: callable taking the list of AddressState for the polled addresses,
+                  called in the event loop thread when the last request has finished
+        """
+        t = time.time()
+        due = [adr for adr in self.addresses if self.isDue(adr, t)]
+        if len(due) == 0:
+            control.loop.callSoon(done, [])
+            return
+        remaining = [len(due)]
+
+        def finished(req, adr):
+            st = self.states[adr]
+            if req.error is not None:
+                self.markError(adr, req.error)
+            else:
+                if self.mode == 'counter':
+                    st.counts = req.result
+                else:
+                    st.frequency = req.result
+                st.timestamp = req.t1
+                self.markOk(adr)
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                done([self.states[a] for a in due])
+
+        for adr in due:
+            callback = lambda req, adr=adr: finished(req, adr)
+            timeout, retries = self.pollLimits(adr)
+            if self.mode == 'counter':
+                control.getCounts(adr, timeout=timeout, callback=callback, retries=retries)
+            else:
+                control.getFrequency(adr, timeout=timeout, callback=callback, retries=retries)
+
+    def faultyAddresses(self):
+        return [adr for adr in self.addresses if self.states[adr].faulty is True]
+
+    def allFaulty(self):
+        return len(self.faultyAddresses()) == len(self.addresses)
@@ -0,0 +1,525 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Recording and replay of the raw traffic on a serial port.
+
+A capture file is a text header line followed by one record per port event:
+a little endian header of time since the previous record in us (uint32),
+event type (char) and data length (uint16), followed by the data. The event
+types are O port opened (data is port name and baud rate), C closed,
+W written, R read (empty when the read timed out), F input flushed and
+T a time step without event, for gaps that do not fit in the uint32.
+Times are taken from the monotonic clock.
+
+CaptureWriter.wrap returns a RecordingSerial that records everything going
+through an open port. CaptureReplay.open is a stand-in for serial.Serial that
+answers the commands written to it with the replies that followed the same
+command in a capture, at the recorded reply times divided by a speed
+factor. Captured field traffic, with its garbage, overlong and invalid
+replies, can so be run through Superlogics8080_control and Superlogics8080DS
+without hardware.
+'''
+
+import argparse
+import ctypes
+import ctypes.util
+import fcntl
+import os
+import select
+import struct
+import termios
+import threading
+import time
+import serial
+import Superlogics8080_async as sa
+import Superlogics8080_codec as scodec
+import Superlogics8080_control as sc
+
+captureHeader = 'Superlogics8080 capture v1\n'
+recordHeader = struct.Struct('<IcH')
+maxDelta = 0xffffffff
+maxData = 0xffff
+
+
+class timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+
+CLOCK_MONOTONIC = 1
+clockGettime = None
+for libName in [ctypes.util.find_library('rt'), ctypes.util.find_library('c'), 'libc.so.6']:
+    try:
+        clockGettime = ctypes.CDLL(libName).clock_gettime
+        break
+    except (OSError, TypeError, AttributeError):
+        pass
+
+
+def monotonic():
+    """ Monotonic clock in s, falls back to time.time where clock_gettime is missing
+    """
+    if clockGettime is None:
+        return time.time()
+    ts = timespec()
+    clockGettime(CLOCK_MONOTONIC, ctypes.byref(ts))
+    return ts.tv_sec + ts.tv_nsec * 1e-9
+
+
+class CaptureWriter:
+    def __init__(self, filename, flushInterval=1.0):
+        """ Capture file being written. Records can come from several threads.
+
+        Input:
+            filename: capture file, overwritten
+            flushInterval: time in s between flushes of the file
+        """
+        self.filename = filename
+        self.f = open(filename, 'wb')
+        self.f.write(captureHeader)
+        self.lock = threading.Lock()
+        self.flushInterval = flushInterval
+        self.lastUs = int(monotonic() * 1e6)
+        self.nextFlush = self.lastUs + int(flushInterval * 1e6)
+        self.records = 0
+
+    def wrap(self, s):
+        """ Recording wrapper around the open port s
+        """
+        return RecordingSerial(s, self)
+
+    def record(self, kind, data=''):
+        tUs = int(monotonic() * 1e6)
+        with self.lock:
+            if self.f is None:
+                return
+            dt = max(tUs - self.lastUs, 0)
+            self.lastUs = tUs
+            while dt > maxDelta:
+                self.f.write(recordHeader.pack(maxDelta, 'T', 0))
+                dt -= maxDelta
+            # Data longer than a record holds goes in several records at the same time
+            pos = 0
+            while True:
+                chunk = data[pos:pos + maxData]
+                self.f.write(recordHeader.pack(dt, kind, len(chunk)))
+                self.f.write(chunk)
+                self.records += 1
+                dt = 0
+                pos += maxData
+                if pos >= len(data):
+                    break
+            if tUs >= self.nextFlush:
+                self.f.flush()
+                self.nextFlush = tUs + int(self.flushInterval * 1e6)
+
+    def close(self):
+        with self.lock:
+            if self.f is not None:
+                self.f.close()
+                self.f = None
+
+
+class RecordingSerial:
+    def __init__(self, s, writer):
+        """ Open port s, recording writes, reads, flushes and close to writer.
+        Everything else is passed on to s.
+        """
+        self.__dict__['s'] = s
+        self.__dict__['writer'] = writer
+        writer.record('O', ''.join((str(getattr(s, 'port', '')), ' ', str(getattr(s, 'baudrate', '')))))
+
+    def write(self, data):
+        self.writer.record('W', data)
+        return self.s.write(data)
+
+    def read(self, size=1):
+        data = self.s.read(size)
+        self.writer.record('R', data)
+        return data
+
+    def flushInput(self):
+        self.s.flushInput()
+        self.writer.record('F')
+
+    def close(self):
+        self.writer.record('C')
+        self.s.close()
+
+    def __getattr__(self, name):
+        return getattr(self.s, name)
+
+    def __setattr__(self, name, value):
+        # Port settings such as the timeout go to the port
+        setattr(self.s, name, value)
+
+
+def readCapture(filename):
+    """ Load a capture file.
+
+    output:
+        List of (time in s since the start of the capture, event type, data)
+    """
+    with open(filename, 'rb') as f:
+        header = f.readline()
+        if header != captureHeader:
+            raise(ValueError(''.join(('Not a capture file: ', filename))))
+        raw = f.read()
+    records = []
+    pos = 0
+    tUs = 0
+    size = recordHeader.size
+    # A truncated last record, from a crash while recording, is dropped
+    while pos + size <= len(raw):
+        dt, kind, n = recordHeader.unpack_from(raw, pos)
+        pos += size
+        tUs += dt
+        if pos + n > len(raw):
+            break
+        if kind != 'T':
+            records.append((tUs * 1e-6, kind, raw[pos:pos + n]))
+        pos += n
+    return records
+
+
+def frameStart(frame):
+    """ Number of bytes before the start character ('>', '!' or '?') of a reply frame.
+    All of them if there is none.
+    """
+    for i in xrange(len(frame)):
+        if frame[i] in '>!?':
+            return i
+    return len(frame)
+
+
+def decodeReply(cmd, reply):
+    """ Decode a checked reply to cmd the way the get methods of
+    Superlogics8080_control do. Raises ValueError if it is not a valid answer to cmd.
+    """
+    if len(reply) == 0 or sc.replyMatches(cmd, reply) is False:
+        raise(ValueError(''.join(('Not a reply to ', cmd, ': ', reply))))
+    kind = sc.commandType(cmd)
+    if cmd[0] == '#':
+        return scodec.decodeFrequency(reply)
+    if reply[0] != '!':
+        raise(ValueError(''.join(('Not a reply to ', cmd, ': ', reply))))
+    if kind == '$2':
+        value = scodec.decodeConfiguration(reply)
+    elif kind == '~0':
+        value = scodec.statusNames.get(reply[-2:]) if len(reply) == 5 else None
+    elif kind == '$B':
+        value = scodec.decodeInputMode(reply) if len(reply) == 4 else (-1, None)
+        if value[0] < 0:
+            value = None
+    elif kind in ['$1L', '$1H']:
+        value = scodec.decodeTriggerLevel(reply)
+    else:
+        value = reply
+    if value is None:
+        raise(ValueError(''.join(('Not a reply to ', cmd, ': ', reply))))
+    return value
+
+
+def summarize(records, maxLength=15):
+    """ Event and reply counts of a capture, see readCapture.
+
+    output:
+        Dict with duration, writes, reads, bytesWritten, bytesRead, timeouts
+        (reads that returned nothing), replies, invalid (? replies), overlong
+        (replies of maxLength characters or more), garbage (replies with non
+        printable characters or bytes before the start character), strayBytes
+        (the bytes before the start characters) and hostDown (status replies
+        reporting host down)
+    """
+    stats = dict([(key, 0) for key in ['writes', 'reads', 'bytesWritten', 'bytesRead', 'timeouts', 'opens',
+                                       'replies', 'invalid', 'overlong', 'garbage', 'strayBytes', 'hostDown']])
+    stats['duration'] = records[-1][0] - records[0][0] if len(records) > 0 else 0.0
+    buf = ''
+    lastCommand = ''
+    for t, kind, data in records:
+        if kind == 'W':
+            stats['writes'] += 1
+            stats['bytesWritten'] += len(data)
+            frames = data.split('\r')
+            lastCommand = frames[-2] if len(frames) > 1 else frames[0]
+        elif kind == 'O':
+            stats['opens'] += 1
+            buf = ''
+        elif kind == 'R':
+            stats['reads'] += 1
+            stats['bytesRead'] += len(data)
+            if len(data) == 0:
+                stats['timeouts'] += 1
+                continue
+            buf = ''.join((buf, data))
+            frames = buf.split('\r')
+            buf = frames.pop()
+            if len(buf) >= maxLength:
+                frames.append(buf)
+                buf = ''
+            for frame in frames:
+                stats['replies'] += 1
+                if len(frame) >= maxLength:
+                    stats['overlong'] += 1
+                stray = frameStart(frame)
+                stats['strayBytes'] += stray
+                if stray > 0 or len([c for c in frame if c < ' ' or c > '~']) > 0:
+                    stats['garbage'] += 1
+                elif frame[:1] == '?':
+                    stats['invalid'] += 1
+                elif lastCommand[:1] == '~' and lastCommand[3:4] == '0' and frame[:1] == '!' and frame[3:5] == '04':
+                    stats['hostDown'] += 1
+    return stats
+
+
+class CaptureReplay:
+    def __init__(self, filename, speed=1.0, loop=False, window=256):
+        """ Replay of the module side of a capture. Use open in place of
+        serial.Serial, for example as transport of Superlogics8080_control.
+
+        A command written to a replayed port is looked up among the next window
+        writes of the capture. The reads that followed it in the capture are
+        then made available on the port at the recorded times after the write,
+        divided by speed. Commands that are not found get no reply. Read timeouts
+        of the port are divided by speed as well, so that commands that timed
+        out in the capture also replay faster.
+
+        Input:
+            filename: capture file
+            speed: replay speed factor, 0 or less answers at once
+            loop: continue from the start of the capture when the end is reached
+            window: number of records to look ahead for a command
+        """
+        self.filename = filename
+        self.records = readCapture(filename)
+        self.speed = speed
+        self.loop = loop
+        self.window = window
+        self.position = 0
+        self.writes = 0
+        self.mismatches = 0
+        self.lock = threading.Lock()
+        # Replies are delivered by timers in an event loop thread
+        self.eventLoop = sa.SerialEventLoop()
+        self.eventLoop.start()
+
+    def open(self, port, baudrate=9600, timeout=None, writeTimeout=None, **kwargs):
+        """ Replayed port, takes the arguments of serial.Serial
+        """
+        return ReplaySerial(self, port, baudrate, timeout, writeTimeout)
+
+    def find(self, data):
+        """ Index of the next write of data in the capture, None if it is not within the window
+        """
+        records = self.records
+        end = min(len(records), self.position + self.window)
+        for i in xrange(self.position, end):
+            if records[i][1] == 'W' and records[i][2] == data:
+                return i
+        if self.loop is True:
+            for i in xrange(0, min(self.position, self.window)):
+                if records[i][1] == 'W' and records[i][2] == data:
+                    return i
+        return None
+
+    def replies(self, data):
+        """ Reads that followed a write of data in the capture, and move past them.
+
+        output:
+            List of (time in s after the write, data)
+        """
+        with self.lock:
+            self.writes += 1
+            i = self.find(data)
+            if i is None:
+                self.mismatches += 1
+                return []
+            t0 = self.records[i][0]
+            out = []
+            j = i + 1
+            while j < len(self.records) and self.records[j][1] not in ('W', 'O', 'C'):
+                t, kind, d = self.records[j]
+                if kind == 'R' and len(d) > 0:
+                    if self.speed > 0:
+                        out.append(((t - t0) / self.speed, d))
+                    else:
+                        out.append((0.0, d))
+                j += 1
+            self.position = j
+            return out
+
+    def rewind(self):
+        with self.lock:
+            self.position = 0
+
+    def close(self):
+        self.eventLoop.stop()
+        self.eventLoop.close()
+
+
+class ReplaySerial:
+    def __init__(self, replay, port, baudrate=9600, timeout=None, writeTimeout=None):
+        """ Port answered from a CaptureReplay, see CaptureReplay.open. Replies are
+        written into a pipe, so the port can be read and selected on like a real one.
+        """
+        self.replay = replay
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.writeTimeout = writeTimeout
+        self.rfd, self.wfd = os.pipe()
+        fcntl.fcntl(self.rfd, fcntl.F_SETFL, os.O_NONBLOCK)
+        self.closed = False
+        # Replies scheduled but not yet in the pipe
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def write(self, data):
+        if self.closed is True:
+            raise(serial.SerialException('Port not open'))
+        for delay, d in self.replay.replies(data):
+            with self.lock:
+                self.pending += 1
+            self.replay.eventLoop.callLater(delay, lambda d=d: self.deliver(d))
+        return len(data)
+
+    def deliver(self, data):
+        # In the event loop thread, where close also runs, so the pipe is still open here.
+        # The reply leaves pending as it enters the pipe, see read.
+        with self.lock:
+            self.pending -= 1
+            if self.closed is False:
+                os.write(self.wfd, data)
+
+    def fileno(self):
+        return self.rfd
+
+    def inWaiting(self):
+        return struct.unpack('I', fcntl.ioctl(self.rfd, termios.FIONREAD, '\0\0\0\0'))[0]
+
+    def read(self, size=1):
+        buf = []
+        n = 0
+        deadline = None
+        speed = self.replay.speed
+        if self.timeout is not None:
+            deadline = time.time() + (self.timeout / speed if speed > 0 else self.timeout)
+        while n < size:
+            # Read and check pending together, so that a reply can not be between the two
+            with self.lock:
+                try:
+                    data = os.read(self.rfd, size - n)
+                except OSError:
+                    data = ''
+                pending = self.pending
+            if len(data) > 0:
+                buf.append(data)
+                n += len(data)
+                continue
+            if speed <= 0 and pending <= 0 and self.timeout is not None:
+                # Nothing more will arrive once the scheduled replies are delivered
+                break
+            if deadline is None:
+                # Blocking read, wake up now and then to check pending again
+                wait = 0.1
+            else:
+                wait = deadline - time.time()
+                if wait <= 0:
+                    break
+            select.select([self.rfd], [], [], wait)
+        return ''.join(buf)
+
+    def flushInput(self):
+        try:
+            while len(os.read(self.rfd, 4096)) > 0:
+                pass
+        except OSError:
+            pass
+
+    def flushOutput(self):
+        pass
+
+    def close(self):
+        self.replay.eventLoop.callAndWait(self.closePipe)
+
+    def closePipe(self):
+        if self.closed is True:
+            return
+        self.closed = True
+        for fd in [self.rfd, self.wfd]:
+            os.close(fd)
+
+
+def replayTraffic(filename, speed=1.0, checksum=False, maxLength=15):
+    """ Write the commands of a capture through a Superlogics8080_control
+    connected to a replay of the same capture, at the recorded times divided
+    by speed (0 or less for as fast as possible). Each reply is read and
+    checked the way sendReceive does it, without retries since the retries
+    are in the capture.
+
+    output:
+        Dict with the number of transactions, ok, timeout, overlong, invalid,
+        checksum and garbage (well framed but not decodable, see decodeReply)
+        outcomes, replay mismatches, elapsed time and cpu time in s
+    """
+    replay = CaptureReplay(filename, speed)
+    ctrl = sc.Superlogics8080_control(''.join(('replay:', filename)), probe=False, checksum=checksum,
+                                      transport=replay.open)
+    writes = [(t, data) for t, kind, data in replay.records if kind == 'W']
+    result = {'transactions': 0, 'ok': 0, 'timeout': 0, 'overlong': 0, 'invalid': 0, 'checksum': 0, 'garbage': 0}
+    cpu0 = os.times()
+    t0 = time.time()
+    tStart = writes[0][0] if len(writes) > 0 else 0.0
+    for t, data in writes:
+        if speed > 0:
+            wait = t0 + (t - tStart) / speed - time.time()
+            if wait > 0:
+                time.sleep(wait)
+        if ctrl.stale is True:
+            ctrl.rxBuf = bytearray()
+            ctrl.s.flushInput()
+            ctrl.stale = False
+        tw = time.time()
+        ctrl.writeFrames(data)
+        for frame in data.split('\r')[:-1]:
+            result['transactions'] += 1
+            key = frame[:5]
+            readBuf = ctrl.readFrame(maxLength, ctrl.readTimeout(key, len(frame) + 1), tw)
+            if len(readBuf) == 0:
+                ctrl.stale = True
+                result['timeout'] += 1
+                continue
+            dt = time.time() - tw
+            ctrl.recordLatency(frame, dt)
+            if len(readBuf) < maxLength:
+                ctrl.updateRtt(key, dt)
+            reply, ex = ctrl.checkReply(readBuf, maxLength)
+            if ex is None:
+                try:
+                    decodeReply(frame[:-2] if checksum is True else frame, reply)
+                    result['ok'] += 1
+                except ValueError:
+                    result['garbage'] += 1
+            elif len(readBuf) >= maxLength:
+                result['overlong'] += 1
+            elif isinstance(ex, scodec.ChecksumError):
+                result['checksum'] += 1
+            else:
+                result['invalid'] += 1
+    cpu1 = os.times()
+    result['elapsed'] = time.time() - t0
+    result['cpu'] = max(cpu1[0] + cpu1[1] - cpu0[0] - cpu0[1], 0.0)
+    result['mismatches'] = replay.mismatches
+    ctrl.close()
+    replay.close()
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Summary of a Superlogics 8080 serial traffic capture')
+    parser.add_argument('capture', help='capture file')
+    args = parser.parse_args()
+    records = readCapture(args.capture)
+    for key, value in sorted(summarize(records).items()):
+        print '%-14s %s' % (key, value)
@@ -0,0 +1,197 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Encoding of Superlogics 8080 command frames and decoding of the replies.
+
+Command strings are built once per address and command and then looked up.
+Replies are decoded with fixed tables. When the modules run with checksums
+enabled every frame ends with two hex digits of the byte sum of the frame,
+and replies with a wrong checksum are rejected with ChecksumError.
+'''
+
+modeCodes = {'counter': '50',
+             'frequency': '51'}
+baudCodes = {1200: '03',
+             2400: '04',
+             4800: '05',
+             9600: '06',
+             19200: '07',
+             38400: '08',
+             57600: '09',
+             115200: '0A'}
+modeNames = dict([(v, k) for k, v in modeCodes.items()])
+baudrates = dict([(v, k) for k, v in baudCodes.items()] + [(v.lower(), k) for k, v in baudCodes.items()])
+statusNames = {'00': 'ok',
+               '04': 'host down'}
+inputModeNames = {'0': 'ch1: non-isolated, ch2: non-isolated',
+                  '1': 'ch1: isolated, ch2: isolated',
+                  '2': 'ch1: non-isolated, ch2: isolated',
+                  '3': 'ch1: isolated, ch2: non-isolated'}
+# Data format (FF) bit enabling checksums
+checksumFlag = 0x40
+# Module addresses are two hex digits
+addressCodes = ['%02X' % adr for adr in range(256)]
+hexDigits = '0123456789ABCDEFabcdef'
+
+# Commands without parameters. %s is replaced by the address.
+commandFormats = {'frequency': '#%s0',
+                  'count0': '#%s0',
+                  'count1': '#%s1',
+                  'clearCounter0': '$%s60',
+                  'clearCounter1': '$%s61',
+                  'configuration': '$%s2',
+                  'status': '~%s0',
+                  'resetStatus': '~%s1',
+                  'inputMode': '$%sB',
+                  'lowLevel': '$%s1L',
+                  'highLevel': '$%s1H'}
+
+
+class ChecksumError(ValueError):
+    pass
+
+
+def addressCode(adr):
+    """ Two hex digit code of a module address, 0-255
+    """
+    if adr < 0 or adr > 0xff:
+        raise(ValueError(''.join(('Invalid module address: ', str(adr)))))
+    return addressCodes[adr]
+
+
+def checksum(data):
+    """ Two hex digit checksum of a frame: the sum of its characters modulo 256.
+    """
+    return addressCodes[sum(bytearray(data)) & 0xff]
+
+
+def decodeConfiguration(reply):
+    """ Decode a $AA2 reply.
+
+    output:
+        Tuple containing (address, mode, baud rate), None if the reply is not valid
+    """
+    if reply[:1] != '!' or len(reply) < 7:
+        return None
+    mode = modeNames.get(reply[3:5])
+    baud = baudrates.get(reply[5:7])
+    if mode is None or baud is None:
+        return None
+    try:
+        return (int(reply[1:3], 16), mode, baud)
+    except ValueError:
+        return None
+
+
+def decodeInputMode(reply):
+    inMode = reply[-1:]
+    try:
+        return (int(inMode), inputModeNames.get(inMode, 'unknown mode'))
+    except ValueError:
+        return (-1, 'unknown mode')
+
+
+def decodeFrequency(reply):
+    """ Decode a >HHHHHHHH reading, frequency or count.
+
+    output:
+        Integer value. Raises ValueError if the reply is not a reading.
+    """
+    # Only '>' is left when the hex digits are stripped off the end
+    if len(reply) != 9 or reply.rstrip(hexDigits) != '>':
+        raise(ValueError(''.join(('Not a reading: ', reply))))
+    return int(reply[1:], 16)
+
+
+def decodeStatus(reply):
+    return statusNames.get(reply[-2:], 'unknown status')
+
+
+def decodeTriggerLevel(reply):
+    return float(reply[3:]) / 10
+
+
+decoders = {'frequency': decodeFrequency,
+            'count0': decodeFrequency,
+            'count1': decodeFrequency,
+            'configuration': decodeConfiguration,
+            'status': decodeStatus,
+            'inputMode': decodeInputMode,
+            'lowLevel': decodeTriggerLevel,
+            'highLevel': decodeTriggerLevel}
+
+
+class Superlogics8080_codec:
+    def __init__(self, checksum=False):
+        """ Command and reply framing for the modules on one port.
+
+        Input:
+            checksum: the modules have checksums enabled
+        """
+        self.checksum = checksum
+        # Command strings of every address, indexed by command name and address
+        self.commands = dict([(name, [fmt % aa for aa in addressCodes]) for name, fmt in commandFormats.items()])
+        self.frames = {}
+        self.maxFrames = 4096
+
+    def setChecksum(self, checksum):
+        self.checksum = checksum
+        self.frames = {}
+
+    def command(self, name, adr):
+        """ Command string, without checksum and carriage return, of one of the
+        commands in commandFormats for the module at adr.
+        """
+        if adr < 0 or adr > 0xff:
+            raise(ValueError(''.join(('Invalid module address: ', str(adr)))))
+        return self.commands[name][adr]
+
+    def configurationCommand(self, adr, mode, baudrate, checksum=None):
+        """ %AANNTTCCFF command setting mode, baud rate and checksum of the module at adr.
+
+        Input:
+            checksum: enable checksums on the module. None keeps the current setting of the codec.
+        """
+        if checksum is None:
+            checksum = self.checksum
+        aa = addressCode(adr)
+        return ''.join(('%', aa, aa, modeCodes[mode.lower()], baudCodes[baudrate],
+                        addressCodes[checksumFlag] if checksum is True else '00'))
+
+    def triggerLevelCommand(self, adr, which, level):
+        """ $AA1LNN or $AA1HNN command setting a trigger level in V, limited to 0-5 V.
+
+        Input:
+            which: 'L' or 'H'
+        """
+        level_i = min(max(int(level * 10), 0), 50)
+        return ''.join(('$', addressCode(adr), '1', which, '%02d' % level_i))
+
+    def frame(self, cmd):
+        """ Complete frame to write for a command string, with checksum if enabled
+        and carriage return.
+        """
+        f = self.frames.get(cmd)
+        if f is None:
+            if self.checksum is True:
+                f = ''.join((cmd, checksum(cmd), '\r'))
+            else:
+                f = ''.join((cmd, '\r'))
+            if len(self.frames) < self.maxFrames:
+                self.frames[cmd] = f
+        return f
+
+    def unframe(self, reply):
+        """ Check and remove the checksum of a reply, without carriage return.
+        Empty replies are returned as they are.
+        """
+        if self.checksum is False or len(reply) == 0:
+            return reply
+        if len(reply) < 3 or checksum(reply[:-2]) != reply[-2:].upper():
+            raise(ChecksumError(''.join(('Checksum error: ', reply))))
+        return reply[:-2]
+
+    def decode(self, name, reply):
+        return decoders[name](reply)
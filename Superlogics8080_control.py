@@ -4,21 +4,103 @@ Created on 30 jan 2015
 @author: Filip Lindau
 '''
 
+import bisect
+import collections
+import random
+import time
 import serial
+import Superlogics8080_codec as scodec
+import Superlogics8080_scheduler as ssched
+import Superlogics8080_bus as sb
+
+# Baud rates the 8080 can be configured to
+supportedBaudrates = [1200, 2400, 4800, 9600, 19200, 38400, 57600, 115200]
+
+# Upper edges in ms of the transaction latency histogram buckets.
+# An extra last bucket counts everything slower.
+latencyBins = [0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0, 200.0, 500.0]
+
+
+def commandType(cmd):
+    """ Command without address and parameters, e.g. '#0' for '#010' or '$1L' for '$011L05'
+    """
+    if cmd[0] == '%':
+        return '%'
+    body = cmd[3:]
+    if body[:2] in ['1L', '1H']:
+        return cmd[0] + body[:2]
+    return cmd[0] + body
+
+
+def replyMatches(cmd, reply):
+    """ False if reply can not be the answer to cmd. Readings ('>') carry no address
+    and match any '#' command.
+    """
+    if len(reply) == 0:
+        return True
+    if reply[0] == '>':
+        return cmd[0] == '#'
+    if reply[0] == '!' or reply[0] == '?':
+        return reply[1:3].upper() == cmd[1:3].upper() and (cmd[0] != '#' or reply[0] == '?')
+    return False
+
+
+def backoffDelay(attempt, base=0.05, cap=2.0):
+    """ Jittered exponential backoff: base * 2**attempt limited to cap, randomized by +-50 %.
+    """
+    return min(base * 2 ** attempt, cap) * random.uniform(0.5, 1.5)
 
 
 class Superlogics8080_control:
-    def __init__(self, port):
+    def __init__(self, port, baudrate=9600, probe=True, checksum=False, capture=None, transport=None):
+        """ Input:
+            port: serial port name
+            baudrate: port baud rate
+            probe: read the configuration of the module at address 1 to check the link
+            checksum: the modules have checksums enabled, see setChecksumMode
+            capture: Superlogics8080_capture.CaptureWriter recording the raw traffic, None to not record
+            transport: callable opening the port, taking the arguments of serial.Serial.
+                       None opens a serial port. See Superlogics8080_capture.CaptureReplay.open.
+        """
         self.port = port
+        self.capture = capture
+        self.transport = transport
+        if transport is None:
+            self.transport = serial.Serial
+        self.codec = scodec.Superlogics8080_codec(checksum)
+        self.baudrate = baudrate
+        self.lastGoodBaudrate = baudrate
+        # Read timeouts are derived from the measured round trip times, see readTimeout
+        self.minTimeout = 0.02
+        self.maxTimeout = 0.5
+        self.maxRetries = 2
+        # Commands of a batch written before the first reply is read, see sendBatch.
+        # Only use more than 1 on full duplex links, on a two wire bus the replies collide with the commands.
+        self.pipelineDepth = 1
+        self.rtt = {}
+        self.readTimeoutSetting = self.maxTimeout
+        self.stale = False
+        self.counters = {}
+        self.histograms = {}
+        self.resetStatistics()
+        # Configuration, input mode and trigger levels per address, see getCached
+        self.cache = {}
         try:
             self.close()
         except Exception:
             pass
         self.connected = False
         self.s = None
+        self.rxBuf = bytearray()
         self.connect()
-        conf = self.getConfiguration()
-        if conf is not None:
+        if probe is False:
+            return
+        # The module could be at another baud rate, see probeBaudrate
+        try:
+            conf = self.getConfiguration()
+        except serial.SerialException, ex:
+            conf = ex
+        if isinstance(conf, tuple):
             print 'Configuration ok'
         else:
             print ''.join(('Configuration problem: ', str(conf)))
@@ -34,73 +116,557 @@ class Superlogics8080_control:
         
     def connect(self):
         self.close()
-        self.s = serial.Serial(self.port, 9600, timeout=0.5, writeTimeout=0.5)
+        self.rxBuf = bytearray()
+        self.cache = {}
+        s = self.transport(self.port, self.baudrate, timeout=self.maxTimeout, writeTimeout=0.5)
+        if self.capture is not None:
+            s = self.capture.wrap(s)
+        self.s = s
+        self.readTimeoutSetting = self.maxTimeout
+        self.stale = False
         self.connected = True
-            
-    def sendReceive(self, cmd):
-        c = ''.join((cmd, '\r'))
-        retries = 0
-        writeReady = False
-        while writeReady == False:
+
+    def reconnect(self):
+        """ Get the port working again after an error. An open port handle is
+        reused, and cached module data kept, if its buffers can be flushed.
+        Otherwise the port is reopened.
+
+        output:
+            True if the port was reopened
+        """
+        if self.s is not None:
+            try:
+                self.s.flushInput()
+                self.s.flushOutput()
+                self.rxBuf = bytearray()
+                self.stale = False
+                self.connected = True
+                return False
+            except Exception:
+                pass
+        self.connect()
+        self.counters['reconnects'] += 1
+        return True
+
+    def sendReceive(self, cmd, maxTimeout=None, maxRetries=None):
+        """ Send a command and read the reply. A command that gets no reply is
+        sent again up to maxRetries times, with the read timeout doubled for
+        each attempt, before giving up.
+
+        Input:
+            maxTimeout: longest read timeout, None for the maxTimeout of the control
+            maxRetries: None for the maxRetries of the control
+        """
+        if maxRetries is None:
+            maxRetries = self.maxRetries
+        c = self.codec.frame(cmd)
+        key = cmd[:5]
+        maxLength = 15
+        tries = 0
+        while True:
+            if self.stale is True:
+                # A late reply to a timed out command could still be on its way
+                self.rxBuf = bytearray()
+                self.s.flushInput()
+                self.stale = False
+            t0 = time.time()
             try:
                 self.s.write(c)
-                writeReady = True
             except Exception:
-                self.connect()
+                # Reopens the port if needed
+                self.writeFrames(c)
+            self.counters['transactions'] += 1
+            readBuf = self.readFrame(maxLength, self.readTimeout(key, len(c), tries, maxTimeout), t0)
+            if len(readBuf) > 0:
+                break
+            self.counters['timeouts'] += 1
+            self.stale = True
+            if tries >= maxRetries:
+                break
+            tries += 1
+            self.counters['retries'] += 1
+
+        n = len(readBuf)
+        if n > 0:
+            dt = time.time() - t0
+            self.recordLatency(cmd, dt)
+            if n < maxLength:
+                self.updateRtt(key, dt)
+        reply, ex = self.checkReply(readBuf, maxLength)
+        if ex is not None:
+            raise ex
+        return reply
+
+    def writeFrames(self, data):
+        """ Write data to the port. The port is reopened, with backoff, if the write fails.
+        """
+        retries = 0
+        while True:
+            try:
+                if self.s is None:
+                    raise(serial.SerialException('Port not open'))
+                self.s.write(data)
+                return
+            except Exception:
                 retries += 1
                 if retries > 4:
                     raise
-        
-        readBuf = ''
-        readChr = ''
+                time.sleep(backoffDelay(retries - 1))
+                try:
+                    self.connect()
+                    self.counters['reconnects'] += 1
+                except serial.SerialException:
+                    pass
+
+    def checkReply(self, readBuf, maxLength=15):
+        """ Check a reply frame, remove its checksum and count the error if there is one.
+
+        output:
+            Tuple containing (reply, exception describing what is wrong with it or None if it is ok)
+        """
+        n = len(readBuf)
+        if n >= maxLength:
+            self.stale = True
+            self.counters['overlong'] += 1
+            return readBuf, serial.SerialException(''.join(('Received message too long: ', readBuf)))
+        if n == 0:
+            return readBuf, serial.SerialException('Nothing received')
+        reply = readBuf
+        if self.codec.checksum is True:
+            try:
+                reply = self.codec.unframe(readBuf)
+            except scodec.ChecksumError, ex:
+                self.counters['checksum'] += 1
+                return readBuf, ex
+        if reply[0] == '?':
+            self.counters['invalid'] += 1
+            return reply, ValueError('Invalid command')
+        return reply, None
+
+    def sendBatch(self, commands, window=None, maxTimeout=None, maxRetries=None):
+        """ Send a list of commands, possibly to several addresses, and read the
+        replies in order. Up to window commands are written in one go before the
+        reply to the first of them is read. A command that gets no reply is retried
+        like in sendReceive, and the unanswered commands are then sent again one at
+        a time. Replies are checked against their commands with replyMatches.
+        Readings carry no address, so that a lost reading can not shift the
+        following readings to the wrong command only one '#' command is in flight
+        at a time.
+
+        Input:
+            commands: list of command strings without carriage return
+            window: commands in flight, None uses pipelineDepth
+            maxTimeout, maxRetries: limits of the retries, see sendReceive
+        output:
+            List with the reply string, or the exception, for each command
+        """
+        if window is None:
+            window = self.pipelineDepth
+        if maxRetries is None:
+            maxRetries = self.maxRetries
         maxLength = 15
-        while readChr != '\r' and readBuf.__len__() < maxLength:
-            readChr = self.s.read(1)
-            if readChr == '':
-                break
-            if readChr != '\r':
-                readBuf = ''.join((readBuf, readChr))
-        if readBuf.__len__() >= maxLength:
-            raise(serial.SerialException(''.join(('Received message too long: ', readBuf))))
-        if readBuf.__len__() == 0:
-            raise(serial.SerialException('Nothing received'))
-        if readBuf[0] == '?':
-            raise(ValueError('Invalid command'))
-        return readBuf
-    
-    def getConfiguration(self, adr=01):
-        """ Get configuration
+        n = len(commands)
+        results = [None] * n
+        tries = [0] * n
+        sendTimes = [0.0] * n
+        inFlight = collections.deque()
+        nextCmd = 0
+        while nextCmd < n or len(inFlight) > 0:
+            if self.stale is True:
+                self.rxBuf = bytearray()
+                self.s.flushInput()
+                self.stale = False
+            frames = []
+            reading = len([k for k in inFlight if commands[k][0] == '#']) > 0
+            while nextCmd < n and len(inFlight) < window:
+                if commands[nextCmd][0] == '#':
+                    if reading is True:
+                        break
+                    reading = True
+                frames.append(self.codec.frame(commands[nextCmd]))
+                inFlight.append(nextCmd)
+                nextCmd += 1
+            if len(frames) > 0:
+                t = time.time()
+                try:
+                    self.writeFrames(''.join(frames))
+                except Exception, ex:
+                    for i in inFlight:
+                        results[i] = ex
+                    inFlight.clear()
+                    continue
+                for i in inFlight:
+                    sendTimes[i] = t
+                self.counters['transactions'] += len(frames)
+            i = inFlight[0]
+            key = commands[i][:5]
+            cmdLength = sum([len(commands[k]) + 3 for k in inFlight])
+            readBuf = self.readFrame(maxLength, self.readTimeout(key, cmdLength, tries[i], maxTimeout), sendTimes[i])
+            if readBuf.__len__() == 0:
+                self.counters['timeouts'] += 1
+                self.stale = True
+                if tries[i] < maxRetries:
+                    tries[i] += 1
+                    self.counters['retries'] += 1
+                else:
+                    results[i] = self.checkReply(readBuf, maxLength)[1]
+                    inFlight.popleft()
+                # Send the rest of the window again
+                if len(inFlight) > 0:
+                    nextCmd = inFlight[0]
+                inFlight.clear()
+                window = 1
+                continue
+            reply, ex = self.checkReply(readBuf, maxLength)
+            matchable = readBuf.__len__() < maxLength and not isinstance(ex, scodec.ChecksumError)
+            while len(inFlight) > 0 and matchable is True and replyMatches(commands[inFlight[0]], reply) is False:
+                # The reply to this command was lost and this one belongs to a later one, or is garbage
+                results[inFlight.popleft()] = serial.SerialException(''.join(('Reply does not match command: ',
+                                                                            reply)))
+            if len(inFlight) == 0:
+                self.stale = True
+                continue
+            i = inFlight.popleft()
+            key = commands[i][:5]
+            dt = time.time() - sendTimes[i]
+            self.recordLatency(commands[i], dt)
+            if readBuf.__len__() < maxLength and window == 1:
+                self.updateRtt(key, dt)
+            if ex is None:
+                results[i] = reply
+            else:
+                results[i] = ex
+        return results
+
+    def recordLatency(self, cmd, dt):
+        """ Count a transaction time in s in the latency histogram of the command type.
+        """
+        h = self.commandHistograms.get(cmd)
+        if h is None:
+            t = commandType(cmd)
+            h = self.histograms.get(t)
+            if h is None:
+                h = [0] * (len(latencyBins) + 1)
+                self.histograms[t] = h
+            self.commandHistograms[cmd] = h
+        h[bisect.bisect_left(latencyBins, dt * 1e3)] += 1
+
+    def resetStatistics(self):
+        """ Zero the transaction counters and latency histograms
+        """
+        self.counters = {'transactions': 0, 'timeouts': 0, 'retries': 0, 'reconnects': 0,
+                         'overlong': 0, 'invalid': 0, 'checksum': 0}
+        self.histograms = {}
+        # Histogram of each command string, saves looking up the command type
+        self.commandHistograms = {}
+
+    def updateRtt(self, key, rtt):
+        """ Update the smoothed round trip time and its mean deviation for a
+        command key (command character, address and command type), the same way
+        TCP estimates its retransmission timeout.
+
+        The estimate is kept as [smoothed round trip time, deviation, timeout]. The
+        timeout, the smoothed round trip time plus four deviations and at least
+        minTimeout, only changes when it moves by more than 20 %.
+        Changing the port timeout reconfigures the port, so it should not follow
+        every measurement.
+        """
+        est = self.rtt.get(key)
+        if est is None:
+            est = [rtt, rtt / 2, None]
+            self.rtt[key] = est
+        else:
+            est[1] = 0.75 * est[1] + 0.25 * abs(est[0] - rtt)
+            est[0] = 0.875 * est[0] + 0.125 * rtt
+        timeout = est[0] + 4 * est[1]
+        if timeout < self.minTimeout:
+            timeout = self.minTimeout
+        current = est[2]
+        if current is None or abs(timeout - current) > 0.2 * current:
+            est[2] = timeout
+
+    def readTimeout(self, key, cmdLength, tries=0, maxTimeout=None):
+        """ Read timeout for a command: the timeout of the key, see updateRtt, at
+        least the wire time of the command and a 15 character reply at the current
+        baud rate and at most maxTimeout. Doubled for each retry.
+        Without round trip measurements for the command maxTimeout is used.
+
+        Input:
+            maxTimeout: None for the maxTimeout of the control
+        """
+        if maxTimeout is None:
+            maxTimeout = self.maxTimeout
+        est = self.rtt.get(key)
+        if est is None:
+            return maxTimeout
+        timeout = est[2]
+        wireTime = (cmdLength + 16) * 10.0 / self.baudrate
+        if wireTime > timeout:
+            timeout = wireTime
+        if tries > 0:
+            timeout *= 2 ** tries
+        return timeout if timeout < maxTimeout else maxTimeout
+
+    def setPortBaudrate(self, baudrate):
+        """ Reopen the port at a new baud rate. The modules are not changed.
+        The round trip times measured at the old rate are forgotten.
+        """
+        self.baudrate = baudrate
+        self.rtt = {}
+        self.connect()
+
+    def probeBaudrate(self, adr=01, refresh=True):
+        """ Find the baud rate of the module at adr by trying the supported rates,
+        starting with the current and the last known good rate.
+        The port is left at the found rate, or at the last known good rate
+        if the module did not answer.
+
+        Input:
+            refresh: probe even if the configuration of adr is cached. With False a
+                     cached configuration at the port rate is checked with a status
+                     read only, and the rates are probed if that fails.
         output:
-            Tuple containing (address, mode, baud rate
+            Baud rate, None if the module did not answer at any rate
+        """
+        conf = self.getCached('configuration', adr, refresh)
+        if conf is not None and conf[2] == self.baudrate:
+            try:
+                self.getStatus(adr)
+                self.lastGoodBaudrate = self.baudrate
+                return self.baudrate
+            except Exception:
+                self.invalidateCache(adr)
+        candidates = [self.baudrate, self.lastGoodBaudrate] + sorted(supportedBaudrates, reverse=True)
+        tried = []
+        for baudrate in candidates:
+            if baudrate in tried:
+                continue
+            tried.append(baudrate)
+            # Only retry at the rates the module is expected to use
+            maxRetries = None if baudrate in candidates[:2] else 0
+            if baudrate != self.baudrate:
+                self.setPortBaudrate(baudrate)
+            try:
+                conf = scodec.decodeConfiguration(self.sendReceive(self.codec.command('configuration', adr),
+                                                                   maxRetries=maxRetries))
+            except Exception:
+                conf = None
+            if conf is not None and conf[2] == baudrate:
+                self.cache[('configuration', adr)] = conf
+                self.lastGoodBaudrate = baudrate
+                return baudrate
+        self.setPortBaudrate(self.lastGoodBaudrate)
+        return None
+
+    def verifyLink(self, addresses):
+        """ Check that all modules at addresses answer and report the port baud rate.
         """
-        cmd = '$' + str(adr).zfill(2) + '2'
-        conf = self.sendReceive(cmd)
-        retVal = None
         try:
-            if conf[0] == '!':
-                adr = conf[1:3]
-                mode = conf[3:5]
-                mode_dict = {'50': 'counter',
-                             '51': 'frequency'}
-                baud = conf[5:7].lower()
-                baud_dict = {'03': 1200,
-                             '04': 2400,
-                             '05': 4800,
-                             '06': 9600,
-                             '07': 19200,
-                             '08': 38400,
-                             '09': 57600,
-                             '0a': 115200}
-                retVal = (int(adr), mode_dict[mode], baud_dict[baud])
+            confs = self.getConfigurations(addresses, refresh=True)
+        except Exception:
+            return False
+        for adr in addresses:
+            conf = confs[adr]
+            if conf is None or isinstance(conf, Exception) or conf[2] != self.baudrate:
+                return False
+        return True
+
+    def setLinkSpeed(self, addresses, baudrate):
+        """ Switch the modules at addresses, and then the port, to a new baud rate.
+        If the link does not work at the new rate, modules that did switch are set
+        back and the port returns to the last known good rate.
+
+        Input:
+            addresses: list of module addresses sharing the port
+            baudrate: one of supportedBaudrates
+        output:
+            True if the link now runs at baudrate
+        """
+        if baudrate not in supportedBaudrates:
+            raise(ValueError(''.join(('Unsupported baud rate: ', str(baudrate)))))
+        if self.verifyLink(addresses) is True:
+            self.lastGoodBaudrate = self.baudrate
+        fallbackRate = self.lastGoodBaudrate
+        modes = {}
+        for adr in addresses:
+            try:
+                conf = self.getConfiguration(adr)
+                modes[adr] = conf[1]
+                self.setConfiguration(adr, conf[1], baudrate)
+            except Exception:
+                pass
+        self.setPortBaudrate(baudrate)
+        if self.verifyLink(addresses) is True:
+            self.lastGoodBaudrate = baudrate
+            return True
+
+        # Fall back
+        for adr in modes:
+            try:
+                self.setConfiguration(adr, modes[adr], fallbackRate)
+            except Exception:
+                pass
+        self.setPortBaudrate(fallbackRate)
+        return False
+
+    def setChecksumMode(self, addresses, checksum):
+        """ Switch checksums on or off on the modules at addresses, and then on the
+        port. Every module is reconfigured while the port still uses the old
+        setting, since a module that has switched no longer understands it. If the
+        link does not work afterwards, modules that did switch are set back.
+
+        Input:
+            addresses: list of module addresses sharing the port
+            checksum: enable checksums (bool)
+        output:
+            True if the link now runs with the new setting
+        """
+        oldChecksum = self.codec.checksum
+        confs = {}
+        for adr in addresses:
+            try:
+                conf = self.getConfiguration(adr)
+                self.setConfiguration(adr, conf[1], conf[2], checksum)
+                confs[adr] = conf
+            except Exception:
+                pass
+        self.codec.setChecksum(checksum)
+        if self.verifyLink(addresses) is True:
+            return True
+
+        # Fall back
+        for adr in confs:
+            try:
+                self.setConfiguration(adr, confs[adr][1], confs[adr][2], oldChecksum)
+            except Exception:
+                pass
+        self.codec.setChecksum(oldChecksum)
+        return False
+
+    def readFrame(self, maxLength=15, timeout=None, t0=None):
+        """ Read one carriage return terminated frame from the serial port.
+        Everything waiting in the port is read in bulk into a receive buffer
+        that is split on the terminator. Bytes after the terminator are kept
+        for the next call.
+
+        Input:
+            maxLength: number of characters read before giving up on finding a terminator
+            timeout: time in s to wait for the frame, None uses the port timeout
+            t0: time the command was written, the timeout counts from it. None for now.
+        output:
+            Frame without the terminator. Empty if the read timed out, also when
+            part of a frame had arrived, or at least maxLength characters if it is too long.
+        """
+        buf = self.rxBuf
+        end = buf.find('\r')
+        if end < 0 and timeout is not None:
+            if timeout != self.readTimeoutSetting:
+                self.setReadTimeout(timeout)
+            if t0 is None:
+                t0 = time.time()
+        while end < 0 and len(buf) < maxLength:
+            data = self.s.read(max(self.s.inWaiting(), 1))
+            if data == '':
+                break
+            start = len(buf)
+            buf.extend(data)
+            end = buf.find('\r', start)
+            # Only a frame arriving in pieces needs the clock
+            if end < 0 and timeout is not None and time.time() - t0 > timeout:
+                break
+        if end < 0:
+            if len(buf) < maxLength:
+                # The rest of a partial frame could still arrive, it is flushed before the next command
+                frame = ''
+                self.stale = True
+            else:
+                frame = str(buf)
+            del buf[:]
+        else:
+            frame = str(buf[:end])
+            del buf[:end + 1]
+        return frame
+
+    def setReadTimeout(self, timeout):
+        """ Set the port read timeout. Changing it reconfigures the port, see updateRtt.
+        """
+        self.s.timeout = timeout
+        self.readTimeoutSetting = timeout
+
+    def getCached(self, name, adr, refresh):
+        """ Cached result of a get method for an address, None if not cached or refresh is True.
+        """
+        if refresh is True:
+            return None
+        return self.cache.get((name, adr))
+
+    def invalidateCache(self, adr=None):
+        """ Forget cached module data for an address, or for all addresses if adr is None.
+        """
+        if adr is None:
+            self.cache = {}
+        else:
+            for key in self.cache.keys():
+                if key[1] == adr:
+                    del self.cache[key]
+
+    def refreshCache(self, adr=01):
+        """ Read configuration, input mode and trigger levels of a module into the cache.
+        """
+        names = ['configuration', 'inputMode', 'lowLevel', 'highLevel']
+        self.invalidateCache(adr)
+        replies = self.sendBatch([self.codec.command(name, adr) for name in names])
+        for r in replies:
+            if isinstance(r, Exception):
+                raise r
+        values = [self.codec.decode(name, r) for name, r in zip(names, replies)]
+        if values[0] is not None:
+            self.cache[('configuration', adr)] = values[0]
+        self.cache[('inputMode', adr)] = values[1]
+        self.cache[('triggerLevels', adr)] = (values[3], values[2])
+
+    def getConfigurations(self, addresses, refresh=False):
+        """ Get the configuration of several modules. Addresses without a cached
+        configuration are read in one batch.
+
+        output:
+            Dict with the configuration tuple, see getConfiguration, or the exception, for each address
+        """
+        retVal = {}
+        missing = []
+        for adr in addresses:
+            conf = self.getCached('configuration', adr, refresh)
+            if conf is None:
+                missing.append(adr)
             else:
-                # Invalid command
-                retVal = None
-        except:
-            retVal = None
+                retVal[adr] = conf
+        replies = self.sendBatch([self.codec.command('configuration', adr) for adr in missing])
+        for adr, r in zip(missing, replies):
+            if isinstance(r, Exception):
+                retVal[adr] = r
+                continue
+            conf = scodec.decodeConfiguration(r)
+            if conf is not None:
+                self.cache[('configuration', adr)] = conf
+            retVal[adr] = conf
+        return retVal
 
+    def getConfiguration(self, adr=01, refresh=False):
+        """ Get configuration. The result is cached until setConfiguration,
+        a reconnect or refresh=True.
+
+        output:
+            Tuple containing (address, mode, baud rate
+        """
+        retVal = self.getCached('configuration', adr, refresh)
+        if retVal is not None:
+            return retVal
+        retVal = scodec.decodeConfiguration(self.sendReceive(self.codec.command('configuration', adr)))
+        if retVal is not None:
+            self.cache[('configuration', adr)] = retVal
         return retVal
 
-    def setConfiguration(self, adr=01, mode='frequency', baudrate=9600):
+    def setConfiguration(self, adr=01, mode='frequency', baudrate=9600, checksum=None):
         """
         Set configuration of 8080.
 
@@ -108,88 +674,118 @@ class Superlogics8080_control:
             adr: address    (integer)
             mode: 'frequency' or 'counter' (string)
             baudrate: 1200, 2400, 4800, 9600, 19200, 38400, 57600, 115200 (integer)
+            checksum: enable checksums (bool). None keeps the setting of the port.
+                      The port is not changed, all modules on it have to use the same
+                      setting, see setChecksumMode.
         """
-        mode_dict = {'counter': '50',
-                     'frequency': '51'}
-        baud_dict = {1200: '03',
-                     2400: '04',
-                     4800: '05',
-                     9600: '06',
-                     19200: '07',
-                     38400: '08',
-                     57600: '09',
-                     115200: '0A'}
-        TT = mode_dict[mode.lower()]
-        CC = baud_dict[baudrate]
-
-        conf = str(adr)+str(adr).zfill(2)+TT+CC+'00'
+        conf = self.codec.configurationCommand(adr, mode, baudrate, checksum)
+        self.invalidateCache(adr)
         self.sendReceive(conf)
 
-    def getInputMode(self):
-        cmd = '$01B'
-        resp = self.sendReceive(cmd)  
-        inMode = int(resp[-1])
-        if inMode == 0:
-            s = 'ch1: non-isolated, ch2: non-isolated'
-        elif inMode == 1:
-            s = 'ch1: isolated, ch2: isolated'
-        elif inMode == 2:
-            s = 'ch1: non-isolated, ch2: isolated'
-        elif inMode == 3:
-            s = 'ch1: isolated, ch2: non-isolated'
-        else:
-            s = 'unknown mode'
-        return (inMode, s)
+    def getInputMode(self, adr=01, refresh=False):
+        """ Get input isolation mode. The result is cached until a reconnect or refresh=True.
 
-    def getFrequency(self, adr=01):
-        cmd = '#' + str(adr).zfill(2) + '0'
-        resp = self.sendReceive(cmd)  
-        freq = int(resp[1:], 16)      
-        return freq
+        output:
+            Tuple containing (mode number, description)
+        """
+        retVal = self.getCached('inputMode', adr, refresh)
+        if retVal is not None:
+            return retVal
+        retVal = scodec.decodeInputMode(self.sendReceive(self.codec.command('inputMode', adr)))
+        self.cache[('inputMode', adr)] = retVal
+        return retVal
+
+    def getFrequency(self, adr=01, maxTimeout=None, maxRetries=None):
+        """ Frequency reading in Hz. maxTimeout and maxRetries limit the retries, see sendReceive.
+        """
+        return scodec.decodeFrequency(self.sendReceive(self.codec.command('frequency', adr), maxTimeout, maxRetries))
+
+    def getCounts(self, adr=01, channels=(0, 1), maxTimeout=None, maxRetries=None):
+        """ Counter values of the channels, read in one batch. The module has to be
+        in counter mode, in frequency mode the same commands return frequencies.
+        The counters wrap at 32 bits. maxTimeout and maxRetries limit the retries,
+        see sendReceive.
+
+        output:
+            Tuple with the count of each channel
+        """
+        names = [''.join(('count', str(ch))) for ch in channels]
+        replies = self.sendBatch([self.codec.command(name, adr) for name in names],
+                                 maxTimeout=maxTimeout, maxRetries=maxRetries)
+        for r in replies:
+            if isinstance(r, Exception):
+                raise r
+        return tuple([scodec.decodeFrequency(r) for r in replies])
+
+    def clearCounter(self, adr=01, channel=0):
+        self.sendReceive(self.codec.command(''.join(('clearCounter', str(channel))), adr))
 
     def getStatus(self, adr=01):
-        cmd = '~' + str(adr).zfill(2) + '0'
-        resp = self.sendReceive(cmd)
-        status = int(resp[-2:])
-        if status == 0:
-            return 'ok'
-        elif status == 4:
-            return 'host down'
-        else:
-            return 'unknown status'
+        return scodec.decodeStatus(self.sendReceive(self.codec.command('status', adr)))
 
     def resetStatus(self, adr=01):
-        self.readStatus(adr)
-        cmd = '~' + str(adr).zfill(2) + '1'
-        resp = self.sendReceive(cmd)
+        self.getStatus(adr)
+        self.sendReceive(self.codec.command('resetStatus', adr))
 
-    def getTriggerLevels(self, adr=01):
-        cmd = '$' + str(adr).zfill(2) + '1L'
-        resp = self.sendReceive(cmd)
-        low_level = float(resp[3:])/10
+    def getTriggerLevels(self, adr=01, refresh=False):
+        """ Get trigger levels in V. The result is cached until setTriggerLevels,
+        a reconnect or refresh=True.
 
-        cmd = '$' + str(adr) + '1H'
-        resp = self.sendReceive(cmd)
-        high_level = float(resp[3:]) / 10
+        output:
+            Tuple containing (high level, low level)
+        """
+        retVal = self.getCached('triggerLevels', adr, refresh)
+        if retVal is not None:
+            return retVal
+        replies = self.sendBatch([self.codec.command('lowLevel', adr), self.codec.command('highLevel', adr)])
+        for r in replies:
+            if isinstance(r, Exception):
+                raise r
+        low_level = scodec.decodeTriggerLevel(replies[0])
+        high_level = scodec.decodeTriggerLevel(replies[1])
 
+        self.cache[('triggerLevels', adr)] = (high_level, low_level)
         return high_level, low_level
 
     def setTriggerLevels(self, adr=01, low_level=0.5, high_level=2.4):
-        low_i = int(low_level*10)
-        if low_i < 0:
-            low_i = 0
-        elif low_i > 50:
-            low_i = 50
-        cmd = '$' + str(adr).zfill(2) + '1L' + str(low_i).zfill(2)
-        self.sendReceive(cmd)
-
-        high_i = int(high_level*10)
-        if high_i < 0:
-            high_i = 0
-        elif high_i > 50:
-            high_i = 50
-        cmd = '$' + str(adr).zfill(2) + '1H' + str(high_i).zfill(2)
-        self.sendReceive(cmd)
+        self.cache.pop(('triggerLevels', adr), None)
+        replies = self.sendBatch([self.codec.triggerLevelCommand(adr, 'L', low_level),
+                                  self.codec.triggerLevelCommand(adr, 'H', high_level)])
+        for r in replies:
+            if isinstance(r, Exception):
+                raise r
+
+    def streamFrequency(self, addresses=(1,), rate=None, duration=None):
+        """ Generator of frequency readings, for logging without a Tango server.
+        Every cycle reads each address once. Cycles start on a fixed time grid,
+        see DeadlineScheduler, or back to back at the link speed if rate is None.
+        Cycles that can not start in time are skipped. Addresses that stop
+        answering are only retried now and then, see Superlogics8080_bus.
+
+        Input:
+            addresses: module addresses to read
+            rate: cycles per s, None for as fast as possible
+            duration: time in s to run, None to run until the generator is closed
+        output:
+            Yields tuples containing (timestamp, address, frequency). Frequency is
+            None if the module did not answer.
+        """
+        bus = sb.Superlogics8080_bus(self, addresses)
+        scheduler = None
+        if rate is not None:
+            scheduler = ssched.DeadlineScheduler(1.0 / rate)
+            scheduler.start()
+        stopTime = None
+        if duration is not None:
+            stopTime = time.time() + duration
+        while stopTime is None or time.time() < stopTime:
+            if scheduler is not None:
+                wait = scheduler.timeToDeadline()
+                if wait > 0:
+                    time.sleep(wait)
+                scheduler.cycleStarted()
+            for st in bus.pollCycle():
+                yield st.timestamp, st.adr, st.frequency
 
 
 if __name__ == '__main__':
@@ -0,0 +1,295 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Shared I/O engine for running many Superlogics8080DS devices in one server.
+
+One SerialEventLoop thread does all the waiting, for the replies on every
+serial port and for the timers of every device. The state machine logic of
+the devices runs on a bounded pool of worker threads. Each device has a Strand,
+so that its tasks run one at a time and in order while different devices run
+in parallel. Steps that wait for the port, like probing silent modules, run on
+a second bounded pool so that they can not hold up the others. The number of
+threads is set by the pool sizes and does not grow with the number of devices,
+and a device only wakes up for a poll deadline, a reply or a command.
+'''
+
+import collections
+import Queue
+import threading
+import time
+import traceback
+import Superlogics8080_async as sa
+
+
+class WorkerPool:
+    def __init__(self, workers=4, name='worker'):
+        """ At most workers daemon threads running submitted callables. A thread
+        is started when a task finds all of them busy, and then kept.
+        """
+        self.tasks = Queue.Queue()
+        self.workers = max(1, workers)
+        self.name = name
+        self.threads = []
+        # Threads waiting for a task
+        self.waiting = 0
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args):
+        with self.lock:
+            if self.tasks.qsize() >= self.waiting and len(self.threads) < self.workers:
+                t = threading.Thread(target=self.run,
+                                     name=''.join(('Superlogics8080 ', self.name, ' ', str(len(self.threads)))))
+                t.daemon = True
+                t.start()
+                self.threads.append(t)
+        self.tasks.put((func, args))
+
+    def run(self):
+        while True:
+            with self.lock:
+                self.waiting += 1
+            func, args = self.tasks.get()
+            with self.lock:
+                self.waiting -= 1
+            if func is None:
+                break
+            try:
+                func(*args)
+            except Exception:
+                traceback.print_exc()
+
+    def stop(self, timeout=2.0):
+        for t in self.threads:
+            self.tasks.put((None, ()))
+        for t in self.threads:
+            if t is not threading.current_thread():
+                t.join(timeout)
+        self.threads = []
+
+
+class Strand:
+    def __init__(self, pool):
+        """ Runs posted tasks on the worker pool one at a time, in the order they
+        were posted. Tasks of different strands run in parallel.
+        """
+        self.pool = pool
+        self.tasks = collections.deque()
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.idle = threading.Event()
+        self.idle.set()
+
+    def post(self, func, *args):
+        """ Run func(*args) after the tasks already posted. Thread safe.
+        """
+        with self.lock:
+            self.tasks.append((func, args))
+            if self.running is True:
+                return
+            self.running = True
+            self.idle.clear()
+        self.pool.submit(self.runTasks)
+
+    def runTasks(self):
+        self.thread = threading.current_thread()
+        while True:
+            with self.lock:
+                if len(self.tasks) == 0:
+                    self.running = False
+                    self.thread = None
+                    self.idle.set()
+                    return
+                func, args = self.tasks.popleft()
+            try:
+                func(*args)
+            except Exception:
+                traceback.print_exc()
+
+    def wait(self, timeout=None):
+        """ Wait until no task is running or queued. Returns at once when called from a task.
+
+        output:
+            True if the strand is idle
+        """
+        if self.thread is threading.current_thread():
+            return True
+        self.idle.wait(timeout)
+        return self.idle.is_set()
+
+
+class Timer:
+    """ Handle of IoEngine.callLater
+    """
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class IoEngine:
+    def __init__(self, workers=4, blockingWorkers=None):
+        """ Event loop thread and worker pools shared by the devices of a server.
+
+        Input:
+            workers: maximum number of worker threads running the device logic
+            blockingWorkers: maximum number of threads running steps that wait
+                             for a port, see StateStepper.runBlocking. None for workers.
+        """
+        if blockingWorkers is None:
+            blockingWorkers = workers
+        self.workers = workers
+        self.loop = sa.SerialEventLoop()
+        self.pool = WorkerPool(workers)
+        self.blockingPool = WorkerPool(blockingWorkers, 'blocking worker')
+        self.loop.start()
+
+    def strand(self):
+        return Strand(self.pool)
+
+    def callLater(self, delay, strand, func, *args):
+        """ Post func(*args) to strand after delay s. Thread safe.
+
+        output:
+            Timer, cancel it to drop the call
+        """
+        timer = Timer()
+
+        def fire():
+            if timer.cancelled is False:
+                strand.post(func, *args)
+        self.loop.callLater(delay, fire)
+        return timer
+
+    def stop(self):
+        self.loop.stop()
+        self.pool.stop()
+        self.blockingPool.stop()
+        self.loop.close()
+
+
+class StateStepper:
+    def __init__(self, engine, step, errorDelay=1.0):
+        """ Runs a state machine made of short steps on an engine, instead of
+        in a thread of its own.
+
+        Input:
+            engine: IoEngine
+            step: callable doing one step, run on the strand of the stepper. Returns
+                  the time in s until the next step, or None to wait for wake.
+            errorDelay: time in s until the next step after a step that raised
+        """
+        self.engine = engine
+        self.step = step
+        self.errorDelay = errorDelay
+        self.strand = engine.strand()
+        self.timer = None
+        self.stopped = False
+        self.steps = 0
+        # A blocking step is running, in blockingThread, and a step was asked for in the meantime
+        self.blocking = False
+        self.blockingThread = None
+        self.unblocked = threading.Event()
+        self.unblocked.set()
+        self.woken = False
+
+    def start(self):
+        self.stopped = False
+        self.wake()
+
+    def wake(self):
+        """ Run a step as soon as possible. Thread safe.
+        """
+        self.strand.post(self.runStep)
+
+    def runStep(self):
+        if self.stopped is True:
+            return
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.blocking is True:
+            self.woken = True
+            return
+        self.steps += 1
+        try:
+            delay = self.step()
+        except Exception:
+            traceback.print_exc()
+            delay = self.errorDelay
+        self.schedule(delay)
+
+    def schedule(self, delay):
+        if self.stopped is True or delay is None:
+            return
+        if delay > 0:
+            self.timer = self.engine.callLater(delay, self.strand, self.runStep)
+        else:
+            self.strand.post(self.runStep)
+
+    def runBlocking(self, func):
+        """ Run func, a step that waits for I/O, on the blocking pool of the engine
+        so that it does not hold a worker. Call from a step returning None. The
+        return value of func schedules the next step like that of a step, and
+        wakes while it runs give a step as soon as it is done.
+        """
+        self.woken = False
+        self.blocking = True
+        self.unblocked.clear()
+        self.engine.blockingPool.submit(self.runBlockingTask, func)
+
+    def runBlockingTask(self, func):
+        self.blockingThread = threading.current_thread()
+        try:
+            delay = func()
+        except Exception:
+            traceback.print_exc()
+            delay = self.errorDelay
+        self.blockingThread = None
+        self.strand.post(self.blockingDone, delay)
+
+    def blockingDone(self, delay):
+        self.blocking = False
+        self.unblocked.set()
+        if self.woken is True:
+            self.woken = False
+            delay = 0
+        self.schedule(delay)
+
+    def stop(self, timeout=3.0):
+        """ Stop stepping and wait for a running step to finish.
+
+        output:
+            True if no step is running
+        """
+        self.stopped = True
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        t0 = time.time()
+        if self.strand.wait(timeout) is False:
+            return False
+        if self.blockingThread is not threading.current_thread():
+            if self.unblocked.wait(max(timeout - (time.time() - t0), 0)) is False:
+                return False
+        return self.strand.wait(max(timeout - (time.time() - t0), 0))
+
+
+sharedLock = threading.Lock()
+shared = {}
+
+
+def sharedEngine(workers=4):
+    """ The engine of this process, started on the first call, with at most
+    workers threads in each pool. Later calls return the same engine whatever
+    the number of workers.
+    """
+    with sharedLock:
+        engine = shared.get('engine')
+        if engine is None:
+            engine = IoEngine(workers)
+            shared['engine'] = engine
+        return engine
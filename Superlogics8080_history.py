@@ -0,0 +1,251 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Fixed size history of timestamped frequency readings with running statistics.
+'''
+
+import collections
+import numpy as np
+
+
+class FrequencyHistory:
+    def __init__(self, depth=1000, window=100):
+        """ Ring buffer of frequency readings, preallocated so memory use is fixed.
+
+        Mean, standard deviation, min/max and Allan deviation (at the sample
+        interval) of the latest window samples are updated for every new sample
+        instead of being calculated from the buffer on every read.
+
+        Input:
+            depth: number of samples kept
+            window: number of latest samples used for the statistics, at most depth
+        """
+        self.depth = int(depth)
+        self.values = np.zeros(self.depth)
+        self.timestamps = np.zeros(self.depth)
+        self.count = 0
+        self.window = 1
+        self.setWindow(window)
+
+    def setWindow(self, window):
+        self.window = max(1, min(int(window), self.depth))
+        self.recalculate()
+
+    def index(self, seq):
+        return seq % self.depth
+
+    def append(self, value, timestamp):
+        seq = self.count
+        w = self.window
+        if seq == 0:
+            # The sums are taken relative to an offset near the values, so that
+            # the variance of a large frequency keeps its precision
+            self.offset = float(value)
+        x = float(value) - self.offset
+        if seq >= w:
+            # Remove the sample and the difference leaving the window. Done before
+            # writing the new sample since it could use the same slot.
+            old = self.values[self.index(seq - w)] - self.offset
+            self.sum -= old
+            self.sumSq -= old * old
+            if w > 1:
+                d = self.values[self.index(seq - w + 1)] - self.offset - old
+                self.diffSumSq -= d * d
+        if seq >= 1 and w > 1:
+            d = x - (self.values[self.index(seq - 1)] - self.offset)
+            self.diffSumSq += d * d
+        self.sum += x
+        self.sumSq += x * x
+
+        i = self.index(seq)
+        self.values[i] = value
+        self.timestamps[i] = timestamp
+        self.count += 1
+
+        while len(self.minDeque) > 0 and self.minDeque[-1][1] >= value:
+            self.minDeque.pop()
+        self.minDeque.append((seq, value))
+        while len(self.maxDeque) > 0 and self.maxDeque[-1][1] <= value:
+            self.maxDeque.pop()
+        self.maxDeque.append((seq, value))
+        while self.minDeque[0][0] <= seq - w:
+            self.minDeque.popleft()
+        while self.maxDeque[0][0] <= seq - w:
+            self.maxDeque.popleft()
+
+        # Running sums slowly lose precision, start over once per buffer turn
+        self.sinceRecalculate += 1
+        if self.sinceRecalculate >= self.depth:
+            self.recalculate(rebuildExtrema=False)
+
+    def recalculate(self, rebuildExtrema=True):
+        """ Calculate the window sums from the buffer contents.
+        """
+        v = self.getValues()[-self.window:]
+        if v.shape[0] > 0:
+            self.offset = v[0]
+        else:
+            self.offset = 0.0
+        x = v - self.offset
+        self.sum = x.sum()
+        self.sumSq = (x * x).sum()
+        d = np.diff(x)
+        self.diffSumSq = (d * d).sum()
+        self.sinceRecalculate = 0
+        if rebuildExtrema is True:
+            self.minDeque = collections.deque()
+            self.maxDeque = collections.deque()
+            seq0 = self.count - v.shape[0]
+            for k in range(v.shape[0]):
+                value = v[k]
+                while len(self.minDeque) > 0 and self.minDeque[-1][1] >= value:
+                    self.minDeque.pop()
+                self.minDeque.append((seq0 + k, value))
+                while len(self.maxDeque) > 0 and self.maxDeque[-1][1] <= value:
+                    self.maxDeque.pop()
+                self.maxDeque.append((seq0 + k, value))
+
+    def length(self):
+        return min(self.count, self.depth)
+
+    def ordered(self, a):
+        n = self.length()
+        if self.count <= self.depth:
+            return a[:n].copy()
+        i = self.index(self.count)
+        return np.concatenate((a[i:], a[:i]))
+
+    def getValues(self):
+        """ Stored values, oldest first
+        """
+        return self.ordered(self.values)
+
+    def getTimestamps(self):
+        """ Timestamps of the stored values, oldest first
+        """
+        return self.ordered(self.timestamps)
+
+    def getStatistics(self):
+        """ Statistics over the latest window samples
+
+        output:
+            Dict with mean, std, min, max and allan. Values are None if there are too
+            few samples.
+        """
+        n = min(self.count, self.window)
+        stats = {'mean': None, 'std': None, 'min': None, 'max': None, 'allan': None}
+        if n == 0:
+            return stats
+        m = self.sum / n
+        stats['mean'] = self.offset + m
+        stats['std'] = np.sqrt(max(self.sumSq / n - m * m, 0.0))
+        stats['min'] = self.minDeque[0][1]
+        stats['max'] = self.maxDeque[0][1]
+        if n > 1:
+            stats['allan'] = np.sqrt(max(self.diffSumSq, 0.0) / (2 * (n - 1)))
+        return stats
+
+
+class CounterHistory:
+    def __init__(self, depth=1000, channels=2, bits=32):
+        """ Ring buffer of raw counter readings of a number of channels. Deltas,
+        rates and totals are derived from the raw counts with numpy over the whole
+        buffer when they are read. Counter wrap around is corrected, assuming the
+        counters wrap at most once between two samples. A step back by more than
+        half the counter range can not be told from a wrap, anything else going back
+        is taken as a reset of the counter, which then counted up from 0.
+
+        Input:
+            depth: number of samples kept, at least 2
+            channels: number of counter channels
+            bits: counter width, the counts wrap at 2**bits
+        """
+        self.depth = max(2, int(depth))
+        self.channels = channels
+        self.modulus = 2 ** bits
+        self.counts = np.zeros((self.depth, channels), dtype=np.int64)
+        self.timestamps = np.zeros(self.depth)
+        self.reset()
+
+    def reset(self):
+        """ Forget all samples, e.g. after the counters are cleared.
+        """
+        self.count = 0
+        # Overflow corrected totals at the oldest and the latest sample in the buffer
+        self.baseTotal = np.zeros(self.channels, dtype=np.int64)
+        self.total = np.zeros(self.channels, dtype=np.int64)
+        self.latestRate = None
+
+    def index(self, seq):
+        return seq % self.depth
+
+    def countDeltas(self, new, old):
+        """ Count increase from old to new, arrays of the same shape. A wrap gives
+        a small increase, a step back of more than half the range is a counter reset.
+        """
+        delta = (new - old) % self.modulus
+        return np.where(delta > self.modulus // 2, new, delta)
+
+    def append(self, counts, timestamp):
+        c = np.array(counts, dtype=np.int64)
+        if self.count == 0:
+            self.total = c.copy()
+            self.baseTotal = c.copy()
+        else:
+            last = self.index(self.count - 1)
+            delta = self.countDeltas(c, self.counts[last])
+            self.total += delta
+            dt = timestamp - self.timestamps[last]
+            if dt > 0:
+                self.latestRate = delta / dt
+        if self.count >= self.depth:
+            # The oldest sample is overwritten, the base total moves on to the next one
+            old = self.index(self.count)
+            self.baseTotal += self.countDeltas(self.counts[self.index(self.count + 1)], self.counts[old])
+        i = self.index(self.count)
+        self.counts[i] = c
+        self.timestamps[i] = timestamp
+        self.count += 1
+
+    def length(self):
+        return min(self.count, self.depth)
+
+    def ordered(self, a):
+        n = self.length()
+        if self.count <= self.depth:
+            return a[:n].copy()
+        i = self.index(self.count)
+        return np.concatenate((a[i:], a[:i]))
+
+    def getCounts(self):
+        """ Raw counts, one row per sample, oldest first
+        """
+        return self.ordered(self.counts)
+
+    def getTimestamps(self):
+        return self.ordered(self.timestamps)
+
+    def getDeltas(self):
+        """ Wrap around and reset corrected count increase between consecutive
+        samples, one row less than getCounts
+        """
+        counts = self.getCounts()
+        return self.countDeltas(counts[1:], counts[:-1])
+
+    def getRates(self):
+        """ Count rate in Hz between consecutive samples, one row less than getCounts
+        """
+        dt = np.diff(self.getTimestamps())
+        dt[dt <= 0] = np.nan
+        return self.getDeltas() / dt[:, np.newaxis]
+
+    def getTotals(self):
+        """ Overflow corrected counts, one row per sample, oldest first
+        """
+        totals = np.zeros((self.length(), self.channels), dtype=np.int64)
+        if totals.shape[0] > 0:
+            totals[0] = self.baseTotal
+            totals[1:] = self.baseTotal + np.cumsum(self.getDeltas(), axis=0)
+        return totals
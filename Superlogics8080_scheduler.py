@@ -0,0 +1,70 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Fixed rate scheduling of the acquisition loop on absolute deadlines.
+'''
+
+import time
+
+
+class DeadlineScheduler:
+    def __init__(self, period):
+        """ Keeps cycles on a fixed time grid start + k * period. The time used by a
+        cycle does not shift the following ones. Cycles that can not start before
+        the next grid point are skipped and counted instead of being run late.
+
+        Input:
+            period: cycle period in s
+        """
+        self.period = period
+        self.nextDeadline = time.time()
+        self.cycles = 0
+        self.skipped = 0
+        self.jitter = 0.0
+        self.jitterMax = 0.0
+
+    def setPeriod(self, period):
+        """ Change the period. The new grid starts at the next deadline.
+        """
+        self.period = period
+
+    def start(self, t=None):
+        """ Start a new grid with the first deadline at t (now if None).
+        """
+        if t is None:
+            t = time.time()
+        self.nextDeadline = t
+
+    def timeToDeadline(self):
+        return self.nextDeadline - time.time()
+
+    def cycleStarted(self, t=None):
+        """ Call when a cycle starts, at or after the deadline. Records the jitter
+        (start time minus deadline) and moves on to the next deadline.
+
+        output:
+            Number of cycles skipped because this one started too late
+        """
+        if t is None:
+            t = time.time()
+        late = t - self.nextDeadline
+        self.cycles += 1
+        # Exponentially weighted mean over roughly the last 16 cycles
+        self.jitter += (late - self.jitter) / 16.0
+        if late > self.jitterMax:
+            self.jitterMax = late
+        self.nextDeadline += self.period
+        missed = 0
+        if t >= self.nextDeadline:
+            missed = int((t - self.nextDeadline) / self.period) + 1
+            self.skipped += missed
+            self.nextDeadline += missed * self.period
+        return missed
+
+    def resetStatistics(self):
+        self.cycles = 0
+        self.skipped = 0
+        self.jitter = 0.0
+        self.jitterMax = 0.0
@@ -0,0 +1,253 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Software simulation of Superlogics 8080 frequency counter modules on a pseudo
+terminal. Superlogics8080_control (and so Superlogics8080DS) can open the
+simulator port like a real serial port. Linux only.
+'''
+
+import os
+import random
+import select
+import termios
+import threading
+import time
+import tty
+import Superlogics8080_codec as scodec
+
+termios_speeds = {termios.B1200: 1200,
+                  termios.B2400: 2400,
+                  termios.B4800: 4800,
+                  termios.B9600: 9600,
+                  termios.B19200: 19200,
+                  termios.B38400: 38400,
+                  termios.B57600: 57600,
+                  termios.B115200: 115200}
+
+
+class SimulatedModule:
+    def __init__(self, adr, frequency=1000.0, noise=0.0, mode='frequency', baudrate=9600, inputMode=0):
+        """ One 8080 module on the simulated bus.
+
+        Input:
+            adr: module address (integer, sent as two hex digits)
+            frequency: frequency of the simulated input signal on channel 0 in Hz.
+                       Channel 1 gets half of it.
+            noise: standard deviation of the gaussian noise added to each reading in Hz
+            mode: 'frequency' or 'counter'
+            baudrate: configured baud rate. The module only understands the host at this rate.
+            inputMode: isolation mode returned by $AAB, 0-3
+        """
+        self.adr = adr
+        self.frequency = frequency
+        self.frequency1 = frequency / 2.0
+        self.noise = noise
+        self.mode = mode
+        self.baudrate = baudrate
+        self.inputMode = inputMode
+        self.lowLevel = 5
+        self.highLevel = 24
+        self.hostDown = False
+        self.checksum = False
+        # Counts accumulated up to the time of the last update, they wrap at 32 bits
+        self.counts = [0.0, 0.0]
+        self.countTimes = [time.time(), time.time()]
+
+    def advanceCount(self, channel):
+        """ Add the counts since the last update at the current frequency, so that
+        the count never goes back when the frequency is changed.
+        """
+        frequency = self.frequency1 if channel == 1 else self.frequency
+        t = time.time()
+        self.counts[channel] += max(frequency, 0.0) * (t - self.countTimes[channel])
+        self.countTimes[channel] = t
+
+    def reading(self, channel=0):
+        frequency = self.frequency1 if channel == 1 else self.frequency
+        if self.mode == 'counter':
+            self.advanceCount(channel)
+            value = int(self.counts[channel])
+        else:
+            value = int(round(random.gauss(frequency, self.noise))) if self.noise > 0 else int(frequency)
+        return '>' + ('%08X' % (max(value, 0) & 0xffffffff))
+
+    def handle(self, cmd):
+        """ Reply to a command addressed to this module.
+
+        Input:
+            cmd: command without the carriage return, e.g. '#010'
+        output:
+            Reply without carriage return
+        """
+        aa = '%02X' % self.adr
+        head = cmd[0]
+        body = cmd[3:]
+        if head == '$' and body == '2':
+            return ''.join(('!', aa, scodec.modeCodes[self.mode], scodec.baudCodes[self.baudrate],
+                            '40' if self.checksum is True else '00'))
+        if head == '%' and len(body) == 8:
+            if body[2:4] not in scodec.modeNames or body[4:6] not in scodec.baudrates:
+                return '?' + aa
+            try:
+                adr = int(body[0:2], 16)
+                checksum = (int(body[6:8], 16) & scodec.checksumFlag) != 0
+            except ValueError:
+                return '?' + aa
+            self.adr = adr
+            self.mode = scodec.modeNames[body[2:4]]
+            self.baudrate = scodec.baudrates[body[4:6]]
+            self.checksum = checksum
+            return '!' + ('%02X' % self.adr)
+        if head == '#' and body in ['', '0', '1']:
+            return self.reading(1 if body == '1' else 0)
+        if head == '$' and body in ['60', '61']:
+            channel = int(body[1])
+            self.counts[channel] = 0.0
+            self.countTimes[channel] = time.time()
+            return '!' + aa
+        if head == '~' and body == '0':
+            return ''.join(('!', aa, '04' if self.hostDown is True else '00'))
+        if head == '~' and body == '1':
+            self.hostDown = False
+            return '!' + aa
+        if head == '$' and body in ['1L', '1H']:
+            level = self.lowLevel if body == '1L' else self.highLevel
+            return ''.join(('!', aa, str(level).zfill(2)))
+        if head == '$' and body[:2] in ['1L', '1H'] and len(body) == 4 and body[2:].isdigit():
+            if body[1] == 'L':
+                self.lowLevel = int(body[2:])
+            else:
+                self.highLevel = int(body[2:])
+            return '!' + aa
+        if head == '$' and body == 'B':
+            return ''.join(('!', aa, str(self.inputMode)))
+        return '?' + aa
+
+
+class Superlogics8080_simulator:
+    def __init__(self, addresses=(1,), baudrate=9600, latency=0.0, dropRate=0.0, garbageRate=0.0,
+                 wireTiming=True, checkBaudrate=True, seed=None):
+        """ Simulated multi-drop bus of 8080 modules served on a pseudo terminal.
+
+        Input:
+            addresses: module addresses on the bus
+            baudrate: initial baud rate of all modules
+            latency: module turnaround time in s before a reply is sent
+            dropRate: probability that a command gets no reply
+            garbageRate: probability that a reply is replaced by random bytes
+            wireTiming: delay replies by the time they take on the wire at the module baud rate
+            checkBaudrate: ignore commands when the host port is set to another baud rate than the module
+            seed: random seed for repeatable drops and garbage
+        """
+        self.modules = dict([(adr, SimulatedModule(adr, baudrate=baudrate)) for adr in addresses])
+        self.latency = latency
+        self.dropRate = dropRate
+        self.garbageRate = garbageRate
+        self.wireTiming = wireTiming
+        self.checkBaudrate = checkBaudrate
+        self.random = random.Random(seed)
+        self.commandCount = 0
+        self.master = None
+        self.slave = None
+        self.port = None
+        self.thread = None
+        self.stopFlag = False
+
+    def start(self):
+        """ Open the pseudo terminal and start serving. The port name to open
+        is available in self.port afterwards.
+        """
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.stopFlag = False
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+        return self.port
+
+    def stop(self):
+        self.stopFlag = True
+        if self.thread is not None:
+            self.thread.join(1.0)
+        for fd in [self.master, self.slave]:
+            if fd is not None:
+                os.close(fd)
+        self.master = None
+        self.slave = None
+
+    def hostBaudrate(self):
+        return termios_speeds.get(termios.tcgetattr(self.slave)[5])
+
+    def run(self):
+        buf = ''
+        while self.stopFlag is False:
+            r, w, e = select.select([self.master], [], [], 0.1)
+            if len(r) == 0:
+                continue
+            try:
+                buf = ''.join((buf, os.read(self.master, 4096)))
+            except OSError:
+                break
+            while '\r' in buf:
+                cmd, buf = buf.split('\r', 1)
+                self.handleCommand(cmd)
+
+    def handleCommand(self, cmd):
+        self.commandCount += 1
+        if len(cmd) < 3:
+            return
+        try:
+            module = self.modules.get(int(cmd[1:3], 16))
+        except ValueError:
+            module = None
+        if module is None:
+            # No module with that address, nobody answers
+            return
+        if self.checkBaudrate is True and self.hostBaudrate() != module.baudrate:
+            return
+        checksum = module.checksum
+        if checksum is True:
+            # Commands with a wrong checksum are ignored
+            if len(cmd) < 5 or scodec.checksum(cmd[:-2]) != cmd[-2:].upper():
+                return
+            cmd = cmd[:-2]
+        oldAdr = module.adr
+        reply = module.handle(cmd)
+        if checksum is True:
+            # The reply to a configuration change still uses the old setting
+            reply = ''.join((reply, scodec.checksum(reply)))
+        if module.adr != oldAdr:
+            del self.modules[oldAdr]
+            self.modules[module.adr] = module
+        if self.random.random() < self.dropRate:
+            return
+        if self.random.random() < self.garbageRate:
+            reply = ''.join([chr(self.random.randint(32, 126)) for i in range(len(reply))])
+        delay = self.latency
+        if self.wireTiming is True:
+            # 10 bits per character, command and reply
+            delay += (len(cmd) + len(reply) + 2) * 10.0 / module.baudrate
+        if delay > 0:
+            time.sleep(delay)
+        os.write(self.master, reply + '\r')
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Simulated Superlogics 8080 modules on a pseudo terminal')
+    parser.add_argument('-a', '--addresses', type=int, nargs='+', default=[1])
+    parser.add_argument('-b', '--baudrate', type=int, default=9600)
+    parser.add_argument('-l', '--latency', type=float, default=0.0, help='module turnaround time in s')
+    parser.add_argument('--drop', type=float, default=0.0, help='probability of a dropped reply')
+    parser.add_argument('--garbage', type=float, default=0.0, help='probability of a garbage reply')
+    args = parser.parse_args()
+    sim = Superlogics8080_simulator(args.addresses, args.baudrate, args.latency, args.drop, args.garbage)
+    print ''.join(('Serving 8080 modules ', str(args.addresses), ' on ', sim.start()))
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        sim.stop()
@@ -0,0 +1,145 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Persistent store of timestamped samples in a memory mapped ring file.
+
+The file is a 64 byte header followed by a fixed number of 24 byte records.
+When the file is full the oldest records are overwritten. Appending is a
+store into the mapping, and reading returns numpy views of the mapping, so
+nothing is copied until the data is used. The file can be opened read only
+by other processes while the device server writes to it.
+'''
+
+import os
+import numpy as np
+
+magic = 'S8080ST1'
+headerDtype = np.dtype([('magic', 'S8'),
+                        ('recordSize', '<u4'),
+                        ('reserved', '<u4'),
+                        ('capacity', '<u8'),
+                        ('count', '<u8'),
+                        ('pad', 'V32')])
+recordDtype = np.dtype([('timestamp', '<f8'),
+                        ('value', '<f8'),
+                        ('address', '<u4'),
+                        ('quality', '<u4')])
+
+
+class SampleStore:
+    def __init__(self, filename, maxBytes=64 * 1024 * 1024, readOnly=False):
+        """ Open the store in filename, creating it if it does not exist.
+
+        Input:
+            filename: store file
+            maxBytes: file size of a new store, sets how many records it holds.
+                      An existing store keeps its size.
+            readOnly: open an existing store for reading only
+        """
+        self.filename = filename
+        self.readOnly = readOnly
+        if os.path.exists(filename) is False or os.path.getsize(filename) < headerDtype.itemsize:
+            if readOnly is True:
+                raise(IOError(''.join(('No sample store: ', filename))))
+            self.create(maxBytes)
+        self.mm = np.memmap(filename, dtype=np.uint8, mode='r' if readOnly is True else 'r+')
+        self.header = self.mm[:headerDtype.itemsize].view(headerDtype)
+        if self.header['magic'][0] != magic or self.header['recordSize'][0] != recordDtype.itemsize:
+            raise(ValueError(''.join(('Not a sample store: ', filename))))
+        self.capacity = int(self.header['capacity'][0])
+        end = headerDtype.itemsize + self.capacity * recordDtype.itemsize
+        self.records = self.mm[headerDtype.itemsize:end].view(recordDtype)
+        # Plain views of the count and the record fields, cheaper to write single values to
+        self.countView = self.mm[headerDtype.fields['count'][1]:headerDtype.fields['count'][1] + 8].view('<u8')
+        self.fieldViews = [self.records[name] for name in recordDtype.names]
+
+    def create(self, maxBytes):
+        capacity = max(1, (int(maxBytes) - headerDtype.itemsize) // recordDtype.itemsize)
+        header = np.zeros(1, dtype=headerDtype)
+        header['magic'] = magic
+        header['recordSize'] = recordDtype.itemsize
+        header['capacity'] = capacity
+        with open(self.filename, 'wb') as f:
+            f.write(header.tostring())
+            f.truncate(headerDtype.itemsize + capacity * recordDtype.itemsize)
+
+    def count(self):
+        """ Number of records written since the store was created
+        """
+        return int(self.countView[0])
+
+    def length(self):
+        return min(self.count(), self.capacity)
+
+    def append(self, timestamp, address, value, quality=0):
+        n = self.count()
+        i = n % self.capacity
+        t, v, a, q = self.fieldViews
+        t[i] = timestamp
+        v[i] = value
+        a[i] = address
+        q[i] = quality
+        # The count is updated last so that readers never see a half written record
+        self.countView[0] = n + 1
+
+    def flush(self):
+        """ Write dirty pages to disk. Not needed to survive a restart of the
+        process, only a crash of the machine.
+        """
+        self.mm.flush()
+
+    def close(self):
+        if self.readOnly is False:
+            self.mm.flush()
+        self.records = None
+        self.fieldViews = None
+        self.countView = None
+        self.header = None
+        self.mm = None
+
+    def views(self):
+        """ Stored records, oldest first, as a list of one or two numpy views of
+        the mapping (two when the ring has wrapped).
+        """
+        n = self.count()
+        if n <= self.capacity:
+            return [self.records[:n]]
+        i = n % self.capacity
+        return [self.records[i:], self.records[:i]]
+
+    def query(self, start, end):
+        """ Records with start <= timestamp < end, as a list of numpy views.
+        Assumes timestamps increase with each record.
+        """
+        result = []
+        for v in self.views():
+            t = v['timestamp']
+            i0 = np.searchsorted(t, start, 'left')
+            i1 = np.searchsorted(t, end, 'left')
+            if i1 > i0:
+                result.append(v[i0:i1])
+        return result
+
+    def decimated(self, start, end, maxPoints=1000, address=None):
+        """ Records in the interval, for one address if not None, reduced to at
+        most maxPoints by taking every n:th record.
+
+        output:
+            numpy record array (a copy)
+        """
+        parts = self.query(start, end)
+        if address is not None:
+            parts = [p[p['address'] == address] for p in parts]
+        n = sum([p.shape[0] for p in parts])
+        step = max(1, -(-n // max(1, int(maxPoints))))
+        # Strided views of each part, continuing the stride across the wrap
+        out = []
+        offset = 0
+        for p in parts:
+            out.append(p[(-offset) % step::step])
+            offset += p.shape[0]
+        if len(out) == 0:
+            return np.zeros(0, dtype=recordDtype)
+        return np.concatenate(out)
@@ -0,0 +1,139 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Logging of 8080 frequency readings to file without a Tango server, for
+commissioning and offline analysis. Readings from
+Superlogics8080_control.streamFrequency are written as they arrive, so memory
+use does not grow with the length of the run.
+
+The binary format is a short text header line followed by fixed size little
+endian records of timestamp (float64), address (uint16) and frequency
+(int64, -1 if the module did not answer). readBinary loads a file as a numpy
+record array.
+'''
+
+import argparse
+import os
+import struct
+import sys
+import time
+import numpy as np
+import Superlogics8080_control as sc
+import Superlogics8080_capture as scap
+
+binaryHeader = 'Superlogics8080 frequency log v1\n'
+binaryRecord = struct.Struct('<dHq')
+binaryDtype = np.dtype([('timestamp', '<f8'), ('address', '<u2'), ('frequency', '<i8')])
+
+
+class CsvWriter:
+    def __init__(self, f):
+        self.f = f
+        self.f.write('timestamp,address,frequency\n')
+
+    def write(self, timestamp, adr, value):
+        if value is None:
+            value = ''
+        self.f.write('%.6f,%d,%s\n' % (timestamp, adr, value))
+
+
+class BinaryWriter:
+    def __init__(self, f):
+        self.f = f
+        self.f.write(binaryHeader)
+
+    def write(self, timestamp, adr, value):
+        if value is None:
+            value = -1
+        self.f.write(binaryRecord.pack(timestamp, adr, value))
+
+
+writers = {'csv': CsvWriter,
+           'binary': BinaryWriter}
+
+
+def readBinary(filename):
+    """ Load a binary log. A log that is still being written can end in part of a
+    record, which is left out.
+
+    output:
+        numpy record array with fields timestamp, address and frequency, empty if
+        the file has no complete record yet
+    """
+    with open(filename, 'rb') as f:
+        header = f.readline()
+        if header != binaryHeader:
+            # Empty, or the header is not all written yet
+            if binaryHeader.startswith(header) is True:
+                return np.zeros(0, dtype=binaryDtype)
+            raise(ValueError(''.join(('Not a frequency log: ', filename))))
+        offset = f.tell()
+    n = (os.path.getsize(filename) - offset) // binaryDtype.itemsize
+    if n == 0:
+        # memmap can not map zero bytes
+        return np.zeros(0, dtype=binaryDtype)
+    return np.memmap(filename, dtype=binaryDtype, mode='r', offset=offset, shape=(n,))
+
+
+def logFrequency(samples, f, fmt='csv', flushInterval=1.0):
+    """ Write samples from a streamFrequency generator to the open file f until
+    the generator ends. The file is flushed every flushInterval s.
+
+    output:
+        Tuple containing (number of samples, number of missing readings)
+    """
+    writer = writers[fmt](f)
+    n = 0
+    missing = 0
+    nextFlush = time.time() + flushInterval
+    for timestamp, adr, value in samples:
+        writer.write(timestamp, adr, value)
+        n += 1
+        if value is None:
+            missing += 1
+        if timestamp >= nextFlush:
+            f.flush()
+            nextFlush = timestamp + flushInterval
+    f.flush()
+    return n, missing
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Log Superlogics 8080 frequency readings to file')
+    parser.add_argument('port', help='serial port of the modules')
+    parser.add_argument('-a', '--addresses', type=int, nargs='+', default=[1])
+    parser.add_argument('-b', '--baudrate', type=int, default=9600)
+    parser.add_argument('-r', '--rate', type=float, default=0.0,
+                        help='read cycles per s, 0 for as fast as the link allows')
+    parser.add_argument('-d', '--duration', type=float, help='time to log in s, default until interrupted')
+    parser.add_argument('-f', '--format', choices=sorted(writers.keys()), default='csv')
+    parser.add_argument('-o', '--output', help='output file, default stdout')
+    parser.add_argument('--flush', type=float, default=1.0, help='time in s between flushes of the output file')
+    parser.add_argument('--capture', help='also record the raw serial traffic to this capture file')
+    args = parser.parse_args()
+
+    capture = None
+    if args.capture is not None:
+        capture = scap.CaptureWriter(args.capture)
+    ctrl = sc.Superlogics8080_control(args.port, args.baudrate, probe=False, capture=capture)
+    samples = ctrl.streamFrequency(args.addresses, args.rate if args.rate > 0 else None, args.duration)
+    if args.output is None:
+        out = os.fdopen(sys.stdout.fileno(), 'wb') if args.format == 'binary' else sys.stdout
+    else:
+        out = open(args.output, 'wb')
+    t0 = time.time()
+    try:
+        n, missing = logFrequency(samples, out, args.format, args.flush)
+    except KeyboardInterrupt:
+        n = missing = None
+    finally:
+        samples.close()
+        ctrl.close()
+        if capture is not None:
+            capture.close()
+        if args.output is not None:
+            out.close()
+    if n is not None:
+        sys.stderr.write('%d readings, %d missing, %.1f readings/s\n' % (n, missing, n / (time.time() - t0)))
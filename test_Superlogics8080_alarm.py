@@ -0,0 +1,82 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Tests of the alarm limits of Superlogics8080_alarm, run with
+python -m unittest test_Superlogics8080_alarm
+'''
+
+import unittest
+import Superlogics8080_alarm as sa
+
+
+class TestAlarmLimits(unittest.TestCase):
+    def evaluateAll(self, limits, values):
+        """ Evaluate values one second apart, list of the alarm state after each
+        """
+        states = []
+        for n, value in enumerate(values):
+            limits.evaluate(value, float(n))
+            states.append(limits.active)
+        return states
+
+    def testDisabled(self):
+        limits = sa.AlarmLimits()
+        self.assertEqual(self.evaluateAll(limits, [0.0, 1e9, -1e9]), [False] * 3)
+
+    def testMaximumHysteresis(self):
+        limits = sa.AlarmLimits(maximum=1000.0, hysteresis=10.0)
+        self.assertEqual(self.evaluateAll(limits, [995.0, 1001.0, 999.0, 991.0, 989.0, 995.0, 1000.5]),
+                         [False, True, True, True, False, False, True])
+        self.assertTrue('above' in limits.reason)
+
+    def testMinimumHysteresis(self):
+        limits = sa.AlarmLimits(minimum=100.0, hysteresis=5.0)
+        self.assertEqual(self.evaluateAll(limits, [110.0, 99.0, 101.0, 104.9, 105.1, 102.0]),
+                         [False, True, True, True, False, False])
+        self.assertEqual(limits.reason, '')
+
+    def testHysteresisOfTrippedLimit(self):
+        # A maximum alarm does not widen the minimum limit, nor the other way round
+        limits = sa.AlarmLimits(minimum=100.0, maximum=110.0, hysteresis=5.0)
+        self.assertEqual(self.evaluateAll(limits, [111.0, 104.0, 102.0]), [True, False, False])
+        self.assertEqual(self.evaluateAll(limits, [99.0, 106.0, 104.0]), [True, False, False])
+        # A rate alarm does not widen the frequency limits
+        limits = sa.AlarmLimits(minimum=100.0, maxRate=50.0, hysteresis=20.0, rateHysteresis=10.0)
+        self.assertEqual(self.evaluateAll(limits, [150.0, 210.0, 215.0]), [False, True, False])
+        self.assertEqual(limits.limit, '')
+
+    def testLimitSwitch(self):
+        # From one limit straight past the other, which then holds the alarm
+        limits = sa.AlarmLimits(minimum=100.0, maximum=110.0, hysteresis=2.0)
+        self.assertEqual(self.evaluateAll(limits, [99.0, 111.0, 109.0, 107.0]), [True, True, True, False])
+        self.assertEqual(limits.limit, '')
+
+    def testChanged(self):
+        limits = sa.AlarmLimits(maximum=1000.0, hysteresis=10.0)
+        self.assertFalse(limits.evaluate(900.0, 0.0))
+        self.assertTrue(limits.evaluate(1100.0, 1.0))
+        self.assertFalse(limits.evaluate(1100.0, 2.0))
+        self.assertTrue(limits.evaluate(900.0, 3.0))
+
+    def testRateHysteresis(self):
+        limits = sa.AlarmLimits(maxRate=100.0, rateHysteresis=20.0)
+        # Rates of 50, 150, -90, 70 and 90 Hz/s
+        self.assertEqual(self.evaluateAll(limits, [1000.0, 1050.0, 1200.0, 1110.0, 1180.0, 1270.0]),
+                         [False, False, True, True, False, False])
+
+    def testReset(self):
+        limits = sa.AlarmLimits(maxRate=100.0)
+        limits.evaluate(0.0, 0.0)
+        limits.evaluate(500.0, 1.0)
+        self.assertTrue(limits.active)
+        limits.reset()
+        self.assertFalse(limits.active)
+        # No rate from the reading before the reset
+        self.assertFalse(limits.evaluate(2000.0, 2.0))
+        self.assertEqual(limits.rate, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Tests of the bus polling of Superlogics8080_bus, blocking and through the
+event loop of Superlogics8080_async, against the simulated modules of
+Superlogics8080_simulator. Linux only, run with
+python -m unittest test_Superlogics8080_bus
+'''
+
+import threading
+import unittest
+import Superlogics8080_async as sa
+import Superlogics8080_bus as sb
+import Superlogics8080_control as sc
+import Superlogics8080_simulator as ssim
+
+
+class BusTestCase(unittest.TestCase):
+    def setUp(self):
+        # Modules at addresses 1 and 2, nothing at 3
+        self.sim = ssim.Superlogics8080_simulator([1, 2], 9600, wireTiming=False, seed=2)
+        self.ctrl = sc.Superlogics8080_control(self.sim.start(), 9600, probe=False)
+        self.ctrl.maxTimeout = 0.1
+        self.sim.modules[1].frequency = 1500.0
+        self.sim.modules[2].frequency = 2500.0
+        self.bus = sb.Superlogics8080_bus(self.ctrl, [1, 2, 3], maxConsecutiveErrors=3, faultRetryInterval=60.0)
+
+    def tearDown(self):
+        self.ctrl.close()
+        self.sim.stop()
+
+
+class TestPoll(BusTestCase):
+    def testPollCycle(self):
+        polled = self.bus.pollCycle()
+        self.assertEqual([st.adr for st in polled], [1, 2, 3])
+        self.assertEqual((self.bus.states[1].frequency, self.bus.states[2].frequency), (1500, 2500))
+        self.assertEqual(self.bus.states[3].frequency, None)
+        self.assertEqual(self.bus.states[3].consecutiveErrors, 1)
+        # The limits of the silent address leave the control as it was
+        self.assertEqual((self.ctrl.maxTimeout, self.ctrl.maxRetries), (0.1, 2))
+
+    def testSilentAddress(self):
+        # Full retries on the first read of the silent address, one attempt after that
+        for i in range(3):
+            self.bus.pollCycle()
+        self.assertEqual(self.ctrl.counters['timeouts'], 3 + 1 + 1)
+        self.assertEqual(self.bus.faultyAddresses(), [3])
+        self.assertFalse(self.bus.allFaulty())
+        # A faulty address is left out until faultRetryInterval has passed
+        self.assertEqual([st.adr for st in self.bus.pollCycle()], [1, 2])
+        self.assertEqual(self.ctrl.counters['timeouts'], 5)
+
+    def testPollLimits(self):
+        self.assertEqual(self.bus.pollLimits(1), (0.1, None))
+        self.bus.pollCycle()
+        self.assertEqual(self.bus.pollLimits(1), (None, None))
+        timeout, retries = self.bus.pollLimits(3)
+        self.assertTrue(timeout <= 0.1)
+        self.assertEqual(retries, 0)
+
+    def testRecovery(self):
+        self.bus.faultRetryInterval = 0.0
+        self.sim.dropRate = 1.0
+        for i in range(3):
+            self.bus.pollCycle()
+        self.assertTrue(self.bus.allFaulty())
+        self.sim.dropRate = 0.0
+        self.bus.pollCycle()
+        self.assertEqual(self.bus.faultyAddresses(), [3])
+        self.assertEqual(self.bus.states[1].frequency, 1500)
+
+    def testInterrupt(self):
+        self.assertEqual(self.bus.pollCycle(interrupt=lambda: True), [])
+
+    def testCounterMode(self):
+        for adr in [1, 2]:
+            self.sim.modules[adr].mode = 'counter'
+        self.bus.mode = 'counter'
+        self.bus.setAddresses([1, 2])
+        st = self.bus.poll(1)
+        self.assertEqual(len(st.counts), 2)
+        self.assertEqual(st.frequency, None)
+
+
+class TestPollAsync(BusTestCase):
+    def setUp(self):
+        BusTestCase.setUp(self)
+        self.loop = sa.SerialEventLoop()
+        self.loop.start()
+        self.actrl = sa.AsyncSuperlogics8080_control(self.loop, None, connect=False)
+        self.loop.callAndWait(self.actrl.attach, self.ctrl)
+
+    def tearDown(self):
+        self.loop.callAndWait(self.actrl.detach)
+        self.loop.stop()
+        self.loop.close()
+        BusTestCase.tearDown(self)
+
+    def pollCycle(self):
+        result = []
+        finished = threading.Event()
+
+        def done(polled):
+            result.append(polled)
+            finished.set()
+        self.bus.pollCycleAsync(self.actrl, done)
+        self.assertTrue(finished.wait(5.0))
+        return result[0]
+
+    def testPollCycle(self):
+        polled = self.pollCycle()
+        self.assertEqual([st.adr for st in polled], [1, 2, 3])
+        self.assertEqual((self.bus.states[1].frequency, self.bus.states[2].frequency), (1500, 2500))
+        self.assertEqual(self.bus.states[3].consecutiveErrors, 1)
+        # Same silent address limits as the blocking poll
+        self.pollCycle()
+        self.pollCycle()
+        self.assertEqual(self.ctrl.counters['timeouts'], 3 + 1 + 1)
+        self.assertEqual(self.bus.faultyAddresses(), [3])
+        self.assertEqual([st.adr for st in self.pollCycle()], [1, 2])
+
+    def testNothingDue(self):
+        self.bus.setAddresses([3])
+        self.bus.states[3].faulty = True
+        self.bus.states[3].nextRetry = 1e12
+        self.assertEqual(self.pollCycle(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
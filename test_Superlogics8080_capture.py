@@ -0,0 +1,107 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Tests of the capture and replay of serial traffic in Superlogics8080_capture,
+with captures recorded from Superlogics8080_simulator. Linux only, run with
+python -m unittest test_Superlogics8080_capture
+'''
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import Superlogics8080_capture as scap
+import Superlogics8080_control as sc
+import Superlogics8080_simulator as ssim
+
+
+def recordCapture(filename, dropRate=0.0, garbageRate=0.0, cycles=20):
+    """ Capture of frequency readings of addresses 1 and 2, and of the silent address 3
+    """
+    sim = ssim.Superlogics8080_simulator([1, 2], 9600, wireTiming=False, dropRate=dropRate,
+                                         garbageRate=garbageRate, seed=3)
+    writer = scap.CaptureWriter(filename)
+    ctrl = sc.Superlogics8080_control(sim.start(), 9600, probe=False, capture=writer)
+    ctrl.maxTimeout = 0.02
+    ctrl.maxRetries = 0
+    for i in range(cycles):
+        for adr in [1, 2, 3]:
+            try:
+                ctrl.getFrequency(adr)
+            except Exception:
+                pass
+    ctrl.close()
+    writer.close()
+    sim.stop()
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'capture.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def replay(self, speed, timeout=20.0):
+        """ replayTraffic in a thread, None if it did not finish within timeout
+        """
+        result = []
+        thread = threading.Thread(target=lambda: result.append(scap.replayTraffic(self.filename, speed)))
+        thread.daemon = True
+        thread.start()
+        thread.join(timeout)
+        return result[0] if len(result) > 0 else None
+
+    def testSummary(self):
+        recordCapture(self.filename)
+        stats = scap.summarize(scap.readCapture(self.filename))
+        self.assertEqual(stats['writes'], 60)
+        self.assertEqual(stats['timeouts'], 20)
+        self.assertEqual(stats['replies'], 40)
+        self.assertEqual(stats['garbage'], 0)
+
+    def testReplayTimeoutsAtMaxSpeed(self):
+        # A reply and the command after it could race with the bookkeeping of the
+        # replayed port, leaving the read of the next timeout waiting for good
+        recordCapture(self.filename, cycles=100)
+        for i in range(3):
+            r = self.replay(0.0)
+            self.assertTrue(r is not None, 'Replay at speed 0 did not finish')
+            self.assertEqual((r['transactions'], r['ok'], r['timeout'], r['mismatches']), (300, 200, 100, 0))
+
+    def testReplayGarbage(self):
+        recordCapture(self.filename, dropRate=0.1, garbageRate=0.2)
+        stats = scap.summarize(scap.readCapture(self.filename))
+        r = self.replay(0.0)
+        self.assertTrue(r is not None, 'Replay at speed 0 did not finish')
+        self.assertEqual(r['transactions'], stats['writes'])
+        self.assertEqual(r['timeout'], stats['timeouts'])
+        self.assertTrue(r['garbage'] > 0)
+        self.assertEqual(r['ok'] + r['garbage'] + r['invalid'], stats['replies'])
+
+
+class TestDecode(unittest.TestCase):
+    def testStrayBytes(self):
+        records = [(0.0, 'W', '#010\r'), (0.01, 'R', 'x>000003E8\r'), (0.02, 'W', '#010\r'),
+                   (0.03, 'R', '>000003E8\r')]
+        stats = scap.summarize(records)
+        self.assertEqual(stats['replies'], 2)
+        self.assertEqual(stats['garbage'], 1)
+        self.assertEqual(stats['strayBytes'], 1)
+
+    def testDecodeReply(self):
+        self.assertEqual(scap.decodeReply('#010', '>000003E8'), 1000)
+        self.assertEqual(scap.decodeReply('$012', '!015106'), (1, 'frequency', 9600))
+        self.assertEqual(scap.decodeReply('~010', '!0100'), 'ok')
+        self.assertRaises(ValueError, scap.decodeReply, '#010', '>0000Z3E8')
+        self.assertRaises(ValueError, scap.decodeReply, '#010', '!01')
+        self.assertRaises(ValueError, scap.decodeReply, '$012', '!025106')
+        self.assertRaises(ValueError, scap.decodeReply, '$012', '!01XX06')
+
+
+if __name__ == '__main__':
+    unittest.main()
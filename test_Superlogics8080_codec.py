@@ -0,0 +1,111 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Tests of the command encoding and reply decoding of Superlogics8080_codec, run with
+python -m unittest test_Superlogics8080_codec
+'''
+
+import unittest
+import Superlogics8080_codec as scodec
+
+
+class TestChecksum(unittest.TestCase):
+    def testChecksum(self):
+        # 0x24 + 0x30 + 0x31 + 0x32
+        self.assertEqual(scodec.checksum('$012'), 'B7')
+        self.assertEqual(scodec.checksum(''), '00')
+        # Modulo 256
+        self.assertEqual(scodec.checksum('\xff\x02'), '01')
+
+    def testFrameRoundTrip(self):
+        codec = scodec.Superlogics8080_codec(checksum=True)
+        for name in scodec.commandFormats:
+            for adr in [0, 1, 0x7f, 0xff]:
+                cmd = codec.command(name, adr)
+                frame = codec.frame(cmd)
+                self.assertEqual(frame[-1], '\r')
+                self.assertEqual(codec.unframe(frame[:-1]), cmd)
+        codec.setChecksum(False)
+        self.assertEqual(codec.frame('$012'), '$012\r')
+        self.assertEqual(codec.unframe('!015106'), '!015106')
+
+    def testUnframe(self):
+        codec = scodec.Superlogics8080_codec(checksum=True)
+        self.assertEqual(codec.frame('$012'), '$012B7\r')
+        self.assertEqual(codec.unframe('>000003E8' + scodec.checksum('>000003E8')), '>000003E8')
+        # Lower case checksum digits are accepted
+        self.assertEqual(codec.unframe('$012b7'), '$012')
+        self.assertEqual(codec.unframe(''), '')
+        self.assertRaises(scodec.ChecksumError, codec.unframe, '$012B8')
+        self.assertRaises(scodec.ChecksumError, codec.unframe, '>000003E8')
+        self.assertRaises(scodec.ChecksumError, codec.unframe, 'B7')
+        # A checksum error is a ValueError to callers that do not tell them apart
+        self.assertRaises(ValueError, codec.unframe, '$012B8')
+
+
+class TestCommands(unittest.TestCase):
+    def setUp(self):
+        self.codec = scodec.Superlogics8080_codec()
+
+    def testCommand(self):
+        self.assertEqual(self.codec.command('frequency', 1), '#010')
+        self.assertEqual(self.codec.command('count1', 0xab), '#AB1')
+        self.assertEqual(self.codec.command('highLevel', 2), '$021H')
+        self.assertRaises(ValueError, self.codec.command, 'frequency', 256)
+        self.assertRaises(ValueError, self.codec.command, 'frequency', -1)
+
+    def testConfigurationRoundTrip(self):
+        for mode in scodec.modeCodes:
+            for baudrate in scodec.baudCodes:
+                cmd = self.codec.configurationCommand(0x12, mode, baudrate)
+                # The module answers !AANNTTCCFF on $AA2
+                reply = ''.join(('!', cmd[3:]))
+                self.assertEqual(scodec.decodeConfiguration(reply), (0x12, mode, baudrate))
+        self.assertEqual(self.codec.configurationCommand(1, 'Counter', 9600), '%0101500600')
+        self.assertEqual(self.codec.configurationCommand(1, 'frequency', 9600, checksum=True), '%0101510640')
+        self.assertRaises(ValueError, self.codec.configurationCommand, 256, 'frequency', 9600)
+
+    def testTriggerLevelRoundTrip(self):
+        for level in [0.0, 0.8, 2.4, 5.0]:
+            cmd = self.codec.triggerLevelCommand(1, 'L', level)
+            self.assertAlmostEqual(scodec.decodeTriggerLevel(''.join(('!01', cmd[-2:]))), level)
+        # Limited to 0-5 V
+        self.assertEqual(self.codec.triggerLevelCommand(1, 'H', 7.0), '$011H50')
+        self.assertEqual(self.codec.triggerLevelCommand(1, 'H', -1.0), '$011H00')
+
+
+class TestDecode(unittest.TestCase):
+    def testFrequency(self):
+        self.assertEqual(scodec.decodeFrequency('>000003E8'), 1000)
+        self.assertEqual(scodec.decodeFrequency('>ffffffff'), 0xffffffff)
+        for reply in ['', '>', '!000003E8', '>000003E', '>000003E80', '>0x0003E8', '>-00003E8',
+                      '> 00003E8', '>000003E ', '>0000G3E8', '>>00003E8', '000003E8>']:
+            self.assertRaises(ValueError, scodec.decodeFrequency, reply)
+
+    def testConfiguration(self):
+        self.assertEqual(scodec.decodeConfiguration('!015106'), (1, 'frequency', 9600))
+        self.assertEqual(scodec.decodeConfiguration('!FF500a40'), (0xff, 'counter', 115200))
+        for reply in ['', '?01', '!0151', '!015206', '!0151FF', '!XX5106']:
+            self.assertEqual(scodec.decodeConfiguration(reply), None)
+
+    def testStatus(self):
+        self.assertEqual(scodec.decodeStatus('!0100'), 'ok')
+        self.assertEqual(scodec.decodeStatus('!0104'), 'host down')
+        self.assertEqual(scodec.decodeStatus('!0177'), 'unknown status')
+
+    def testInputMode(self):
+        self.assertEqual(scodec.decodeInputMode('!013'), (3, scodec.inputModeNames['3']))
+        self.assertEqual(scodec.decodeInputMode('!017'), (7, 'unknown mode'))
+        self.assertEqual(scodec.decodeInputMode('!01X'), (-1, 'unknown mode'))
+
+    def testDecoders(self):
+        codec = scodec.Superlogics8080_codec()
+        for name in scodec.decoders:
+            self.assertTrue(name in scodec.commandFormats)
+        self.assertEqual(codec.decode('count0', '>00000010'), 16)
+
+
+if __name__ == '__main__':
+    unittest.main()
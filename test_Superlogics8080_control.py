@@ -0,0 +1,168 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Tests of Superlogics8080_control against the simulated modules of
+Superlogics8080_simulator. Linux only, run with
+python -m unittest test_Superlogics8080_control
+'''
+
+import time
+import unittest
+import serial
+import Superlogics8080_codec as scodec
+import Superlogics8080_control as sc
+import Superlogics8080_simulator as ssim
+
+
+class ControlTestCase(unittest.TestCase):
+    def setUp(self):
+        self.sim = ssim.Superlogics8080_simulator([1, 2], 9600, wireTiming=False, seed=1)
+        self.ctrl = sc.Superlogics8080_control(self.sim.start(), 9600, probe=False)
+        # Keep the timeouts of the silent addresses short
+        self.ctrl.maxTimeout = 0.1
+
+    def tearDown(self):
+        self.ctrl.close()
+        self.sim.stop()
+
+
+class TestCommands(ControlTestCase):
+    def testFrequency(self):
+        self.sim.modules[1].frequency = 12345.0
+        self.sim.modules[2].frequency = 0x1234abcd
+        self.assertEqual(self.ctrl.getFrequency(1), 12345)
+        self.assertEqual(self.ctrl.getFrequency(2), 0x1234abcd)
+
+    def testCounts(self):
+        module = self.sim.modules[1]
+        module.mode = 'counter'
+        module.frequency = 1e6
+        self.ctrl.clearCounter(1, 0)
+        counts = self.ctrl.getCounts(1, channels=(0,))
+        module.frequency = 10.0
+        self.assertTrue(self.ctrl.getCounts(1, channels=(0,))[0] >= counts[0])
+
+    def testConfiguration(self):
+        self.assertEqual(self.ctrl.getConfiguration(1), (1, 'frequency', 9600))
+        self.ctrl.setConfiguration(1, 'counter', 9600)
+        self.assertEqual(self.sim.modules[1].mode, 'counter')
+        self.assertEqual(self.ctrl.getConfiguration(1), (1, 'counter', 9600))
+        self.assertEqual(self.ctrl.getConfiguration(2), (2, 'frequency', 9600))
+
+    def testConfigurations(self):
+        confs = self.ctrl.getConfigurations([1, 2, 3])
+        self.assertEqual(confs[1], (1, 'frequency', 9600))
+        self.assertEqual(confs[2], (2, 'frequency', 9600))
+        self.assertTrue(isinstance(confs[3], serial.SerialException))
+
+    def testChecksumMode(self):
+        self.sim.modules[1].frequency = 2000.0
+        self.assertTrue(self.ctrl.setChecksumMode([1, 2], True))
+        self.assertTrue(self.sim.modules[1].checksum)
+        self.assertTrue(self.sim.modules[2].checksum)
+        self.assertTrue(self.ctrl.codec.checksum)
+        self.assertEqual(self.ctrl.getFrequency(1), 2000)
+        self.assertTrue(self.ctrl.setChecksumMode([1, 2], False))
+        self.assertFalse(self.sim.modules[1].checksum)
+        self.assertEqual(self.ctrl.getFrequency(1), 2000)
+
+    def testStatus(self):
+        self.assertEqual(self.ctrl.getStatus(1), 'ok')
+        self.sim.modules[1].hostDown = True
+        self.assertEqual(self.ctrl.getStatus(1), 'host down')
+        self.ctrl.resetStatus(1)
+        self.assertEqual(self.ctrl.getStatus(1), 'ok')
+
+    def testTriggerLevels(self):
+        self.assertEqual(self.ctrl.getTriggerLevels(1), (2.4, 0.5))
+        self.ctrl.setTriggerLevels(1, 0.8, 3.2)
+        self.assertEqual((self.sim.modules[1].lowLevel, self.sim.modules[1].highLevel), (8, 32))
+        high, low = self.ctrl.getTriggerLevels(1)
+        self.assertAlmostEqual(high, 3.2)
+        self.assertAlmostEqual(low, 0.8)
+        # Limited to 0-5 V
+        self.ctrl.setTriggerLevels(1, -1.0, 7.0)
+        self.assertEqual(self.ctrl.getTriggerLevels(1, refresh=True), (5.0, 0.0))
+
+    def testInputMode(self):
+        self.sim.modules[2].inputMode = 2
+        self.assertEqual(self.ctrl.getInputMode(2), (2, scodec.inputModeNames['2']))
+
+    def testProbeBaudrate(self):
+        self.sim.modules[1].baudrate = 19200
+        self.assertEqual(self.ctrl.probeBaudrate(1), 19200)
+        self.assertEqual((self.ctrl.baudrate, self.ctrl.lastGoodBaudrate), (19200, 19200))
+        self.assertEqual(self.ctrl.probeBaudrate(2), 9600)
+        self.assertEqual(self.ctrl.probeBaudrate(3), None)
+        self.assertEqual(self.ctrl.baudrate, 9600)
+
+    def testProbeCachedBaudrate(self):
+        # A cached configuration at the port rate costs one status read
+        self.ctrl.getConfiguration(1)
+        transactions = self.ctrl.counters['transactions']
+        self.assertEqual(self.ctrl.probeBaudrate(1, refresh=False), 9600)
+        self.assertEqual(self.ctrl.counters['transactions'], transactions + 1)
+        # The rates are probed when the module no longer answers at the cached rate
+        self.sim.modules[1].baudrate = 4800
+        self.assertEqual(self.ctrl.probeBaudrate(1, refresh=False), 4800)
+        self.assertEqual(self.ctrl.getConfiguration(1), (1, 'frequency', 4800))
+
+
+class TestErrors(ControlTestCase):
+    def testTimeout(self):
+        self.assertRaises(serial.SerialException, self.ctrl.getFrequency, 3)
+        self.assertEqual(self.ctrl.counters['timeouts'], self.ctrl.maxRetries + 1)
+        self.assertEqual(self.ctrl.counters['retries'], self.ctrl.maxRetries)
+        # The link still works afterwards
+        self.assertEqual(self.ctrl.getFrequency(1), 1000)
+
+    def testRetryLimits(self):
+        t0 = time.time()
+        self.assertRaises(serial.SerialException, self.ctrl.getFrequency, 3, maxTimeout=0.02, maxRetries=0)
+        self.assertTrue(time.time() - t0 < 0.1)
+        self.assertEqual(self.ctrl.counters['timeouts'], 1)
+        # Two attempts at each channel
+        self.assertRaises(serial.SerialException, self.ctrl.getCounts, 3, maxTimeout=0.02, maxRetries=1)
+        self.assertEqual(self.ctrl.counters['timeouts'], 1 + 2 * 2)
+        # The limits of the control are left as they were
+        self.assertEqual((self.ctrl.maxTimeout, self.ctrl.maxRetries), (0.1, 2))
+
+    def testDroppedReplies(self):
+        self.sim.dropRate = 1.0
+        self.assertRaises(serial.SerialException, self.ctrl.getStatus, 1)
+        self.assertRaises(serial.SerialException, self.ctrl.getCounts, 1)
+        self.sim.dropRate = 0.0
+        self.assertEqual(self.ctrl.getStatus(1), 'ok')
+
+    def testGarbageReply(self):
+        self.sim.garbageRate = 1.0
+        self.assertRaises(ValueError, self.ctrl.getFrequency, 1)
+        self.sim.garbageRate = 0.0
+        self.assertEqual(self.ctrl.getFrequency(1), 1000)
+
+    def testInvalidCommand(self):
+        self.assertRaises(ValueError, self.ctrl.sendReceive, '$01Z')
+        self.assertEqual(self.ctrl.counters['invalid'], 1)
+
+    def testChecksumError(self):
+        self.assertTrue(self.ctrl.setChecksumMode([1, 2], True))
+        self.sim.garbageRate = 1.0
+        self.assertRaises(scodec.ChecksumError, self.ctrl.getFrequency, 1)
+        self.assertEqual(self.ctrl.counters['checksum'], 1)
+        self.sim.garbageRate = 0.0
+        self.assertEqual(self.ctrl.getFrequency(1), 1000)
+
+    def testChecksumMismatch(self):
+        # The port expects checksums that the modules do not send
+        self.ctrl.codec.setChecksum(True)
+        self.assertRaises(scodec.ChecksumError, self.ctrl.getStatus, 1)
+
+    def testInvalidAddress(self):
+        self.assertRaises(ValueError, self.ctrl.getFrequency, 256)
+        self.assertRaises(ValueError, self.ctrl.setConfiguration, -1, 'frequency', 9600)
+
+
+if __name__ == '__main__':
+    unittest.main()
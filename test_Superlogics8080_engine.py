@@ -0,0 +1,130 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Tests of the worker pools, strands and state steppers of Superlogics8080_engine,
+run with
+python -m unittest test_Superlogics8080_engine
+'''
+
+import threading
+import time
+import unittest
+import Superlogics8080_engine as se
+
+
+class EngineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = se.IoEngine(workers=2, blockingWorkers=1)
+
+    def tearDown(self):
+        self.engine.stop()
+
+
+class TestStrand(EngineTestCase):
+    def testOrder(self):
+        # Tasks of a strand run one at a time in order, even with several workers
+        strand = self.engine.strand()
+        result = []
+        for i in range(200):
+            strand.post(result.append, i)
+        self.assertTrue(strand.wait(5.0))
+        self.assertEqual(result, range(200))
+        self.assertTrue(len(self.engine.pool.threads) <= 2)
+
+    def testParallel(self):
+        # A task waiting in one strand does not hold up another strand
+        a = self.engine.strand()
+        b = self.engine.strand()
+        release = threading.Event()
+        ran = threading.Event()
+        a.post(release.wait, 5.0)
+        b.post(ran.set)
+        self.assertTrue(ran.wait(2.0))
+        release.set()
+        self.assertTrue(a.wait(2.0))
+
+    def testCallLater(self):
+        strand = self.engine.strand()
+        fired = []
+        t0 = time.time()
+        self.engine.callLater(0.05, strand, lambda: fired.append(time.time() - t0))
+        self.engine.callLater(0.05, strand, fired.append, 'cancelled').cancel()
+        time.sleep(0.2)
+        self.assertEqual(len(fired), 1)
+        self.assertTrue(fired[0] >= 0.05)
+
+
+class TestStateStepper(EngineTestCase):
+    def testSteps(self):
+        # Returned delays schedule the next step, None waits for wake
+        steps = []
+
+        def step():
+            steps.append(time.time())
+            return 0.02 if len(steps) < 5 else None
+        stepper = se.StateStepper(self.engine, step)
+        stepper.start()
+        time.sleep(0.3)
+        self.assertEqual(len(steps), 5)
+        stepper.wake()
+        time.sleep(0.05)
+        self.assertEqual(len(steps), 6)
+        self.assertTrue(stepper.stop())
+
+    def testErrorDelay(self):
+        steps = []
+
+        def step():
+            steps.append(1)
+            raise(ValueError('step failed'))
+        stepper = se.StateStepper(self.engine, step, errorDelay=0.5)
+        stepper.start()
+        time.sleep(0.2)
+        self.assertTrue(stepper.stop())
+        self.assertEqual(len(steps), 1)
+
+    def testBlocking(self):
+        # A blocking step leaves the worker pool free, and wakes while it runs
+        # give one step when it is done
+        release = threading.Event()
+        steps = []
+
+        def step():
+            steps.append(threading.current_thread())
+            if len(steps) == 1:
+                stepper.runBlocking(lambda: release.wait(5.0) and None)
+            return None
+        stepper = se.StateStepper(self.engine, step)
+        stepper.start()
+        time.sleep(0.05)
+        other = self.engine.strand()
+        ran = threading.Event()
+        other.post(ran.set)
+        self.assertTrue(ran.wait(1.0))
+        stepper.wake()
+        stepper.wake()
+        time.sleep(0.05)
+        self.assertEqual(len(steps), 1)
+        release.set()
+        time.sleep(0.1)
+        self.assertEqual(len(steps), 2)
+        self.assertTrue(stepper.stop())
+
+    def testStopWaitsForBlocking(self):
+        finished = []
+
+        def blocking():
+            time.sleep(0.2)
+            finished.append(1)
+            return None
+        stepper = se.StateStepper(self.engine, lambda: stepper.runBlocking(blocking))
+        stepper.start()
+        time.sleep(0.05)
+        self.assertTrue(stepper.stop())
+        self.assertEqual(finished, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Tests of the ring buffers of Superlogics8080_history, run with
+python -m unittest test_Superlogics8080_history
+'''
+
+import unittest
+import numpy as np
+import Superlogics8080_history as sh
+
+
+class TestFrequencyHistory(unittest.TestCase):
+    def checkStatistics(self, h, values, n):
+        """ Statistics of h after n appended values, against numpy over the window
+        """
+        w = values[max(0, n - h.window):n]
+        stats = h.getStatistics()
+        self.assertAlmostEqual(stats['mean'], w.mean(), delta=1e-6)
+        self.assertAlmostEqual(stats['std'], w.std(), delta=1e-6)
+        self.assertEqual(stats['min'], w.min())
+        self.assertEqual(stats['max'], w.max())
+        if len(w) > 1:
+            self.assertAlmostEqual(stats['allan'], np.sqrt((np.diff(w) ** 2).sum() / (2 * (len(w) - 1))),
+                                   delta=1e-6)
+
+    def testEmpty(self):
+        h = sh.FrequencyHistory(10, 5)
+        self.assertEqual(h.getStatistics()['mean'], None)
+        self.assertEqual(len(h.getValues()), 0)
+
+    def testLargeFrequency(self):
+        # 100 MHz with 1 Hz noise, checked before and after the first buffer turn
+        h = sh.FrequencyHistory(1000, 100)
+        values = 1e8 + np.random.RandomState(1).normal(0.0, 1.0, 2500)
+        for n in range(1, len(values) + 1):
+            h.append(values[n - 1], n)
+            if n in [1, 2, 99, 100, 500, 998, 999, 1000, 1001, 2500]:
+                self.checkStatistics(h, values, n)
+
+    def testWrap(self):
+        h = sh.FrequencyHistory(10, 4)
+        values = np.array([5.0, 1.0, 9.0, 3.0, 7.0, 2.0, 8.0, 4.0, 6.0, 0.0, 5.5, 1.5, 9.5, 3.5])
+        for n in range(1, len(values) + 1):
+            h.append(values[n - 1], float(n))
+            self.checkStatistics(h, values, n)
+        self.assertTrue(np.array_equal(h.getValues(), values[-10:]))
+        self.assertTrue(np.array_equal(h.getTimestamps(), np.arange(5.0, 15.0)))
+
+    def testWindowChange(self):
+        h = sh.FrequencyHistory(20, 5)
+        values = 1e6 + np.arange(30.0) ** 2
+        for n in range(1, len(values) + 1):
+            h.append(values[n - 1], n)
+        h.setWindow(12)
+        self.checkStatistics(h, values, len(values))
+
+
+class TestCounterHistory(unittest.TestCase):
+    def testWrap(self):
+        # 8 bit counters wrapping at 256
+        h = sh.CounterHistory(10, channels=2, bits=8)
+        counts = [(250, 10), (254, 20), (3, 30), (100, 40), (200, 50), (5, 60)]
+        for n, c in enumerate(counts):
+            h.append(c, float(n))
+        self.assertEqual(h.getDeltas()[:, 0].tolist(), [4, 5, 97, 100, 61])
+        self.assertEqual(h.getDeltas()[:, 1].tolist(), [10] * 5)
+        self.assertEqual(h.getTotals()[:, 0].tolist(), [250, 254, 259, 356, 456, 517])
+        self.assertEqual(h.total.tolist(), [517, 60])
+        self.assertTrue(np.array_equal(h.getRates(), h.getDeltas().astype(float)))
+
+    def testCounterReset(self):
+        # A step back of less than half the range is a reset, counting up from 0
+        h = sh.CounterHistory(10, channels=1, bits=16)
+        for n, c in enumerate([1000, 2000, 3000, 50, 150]):
+            h.append((c,), float(n))
+        self.assertEqual(h.getDeltas()[:, 0].tolist(), [1000, 1000, 50, 100])
+        self.assertEqual(h.getTotals()[-1, 0], 3150)
+
+    def testBufferTurn(self):
+        # The totals keep counting when the oldest samples are overwritten
+        h = sh.CounterHistory(4, channels=1, bits=8)
+        for n in range(20):
+            h.append(((n * 100) % 256,), float(n))
+        self.assertEqual(h.length(), 4)
+        self.assertEqual(h.getTimestamps().tolist(), [16.0, 17.0, 18.0, 19.0])
+        self.assertEqual(h.getTotals()[:, 0].tolist(), [1600, 1700, 1800, 1900])
+        self.assertEqual(h.total.tolist(), [1900])
+
+    def testReset(self):
+        h = sh.CounterHistory(4, channels=1)
+        h.append((100,), 0.0)
+        h.append((200,), 1.0)
+        h.reset()
+        self.assertEqual(h.latestRate, None)
+        h.append((7,), 5.0)
+        self.assertEqual(h.getTotals()[:, 0].tolist(), [7])
+        h.append((17,), 7.0)
+        self.assertEqual(h.latestRate.tolist(), [5.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Tests of the deadline scheduling of Superlogics8080_scheduler, run with
+python -m unittest test_Superlogics8080_scheduler
+'''
+
+import unittest
+import Superlogics8080_scheduler as ssched
+
+
+class TestDeadlineScheduler(unittest.TestCase):
+    def testGrid(self):
+        # Late starts do not shift the following deadlines
+        s = ssched.DeadlineScheduler(0.1)
+        s.start(100.0)
+        for k, late in enumerate([0.0, 0.03, 0.01, 0.09, 0.0]):
+            self.assertEqual(s.cycleStarted(100.0 + k * 0.1 + late), 0)
+        self.assertAlmostEqual(s.nextDeadline, 100.5)
+        self.assertEqual((s.cycles, s.skipped), (5, 0))
+        self.assertAlmostEqual(s.jitterMax, 0.09)
+
+    def testSkipped(self):
+        s = ssched.DeadlineScheduler(1.0)
+        s.start(10.0)
+        # Started 3.5 periods late, the deadlines at 11, 12 and 13 are skipped
+        self.assertEqual(s.cycleStarted(13.5), 3)
+        self.assertAlmostEqual(s.nextDeadline, 14.0)
+        self.assertEqual(s.skipped, 3)
+        # Exactly on the next deadline skips it too
+        self.assertEqual(s.cycleStarted(15.0), 1)
+        self.assertAlmostEqual(s.nextDeadline, 16.0)
+
+    def testPeriodChange(self):
+        s = ssched.DeadlineScheduler(1.0)
+        s.start(0.0)
+        s.cycleStarted(0.0)
+        s.setPeriod(0.25)
+        s.cycleStarted(1.0)
+        self.assertAlmostEqual(s.nextDeadline, 1.25)
+
+    def testJitter(self):
+        s = ssched.DeadlineScheduler(1.0)
+        s.start(0.0)
+        for k in range(200):
+            s.cycleStarted(k + 0.01)
+        self.assertAlmostEqual(s.jitter, 0.01)
+        s.resetStatistics()
+        self.assertEqual((s.cycles, s.skipped, s.jitter, s.jitterMax), (0, 0, 0.0, 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
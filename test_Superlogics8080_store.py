@@ -0,0 +1,113 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Tests of the memory mapped sample store of Superlogics8080_store, run with
+python -m unittest test_Superlogics8080_store
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import Superlogics8080_store as sst
+
+
+class TestSampleStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'samples.s8080')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def openStore(self, capacity):
+        return sst.SampleStore(self.filename, sst.headerDtype.itemsize + capacity * sst.recordDtype.itemsize)
+
+    def fill(self, store, n, addresses=(1,)):
+        for i in range(n):
+            store.append(float(i), addresses[i % len(addresses)], 1000.0 + i, i % 3)
+
+    def timestamps(self, parts):
+        return np.concatenate([p['timestamp'] for p in parts]).tolist() if len(parts) > 0 else []
+
+    def testAppend(self):
+        store = self.openStore(10)
+        self.assertEqual(store.capacity, 10)
+        self.assertEqual(store.length(), 0)
+        self.assertEqual(self.timestamps(store.query(0.0, 100.0)), [])
+        self.fill(store, 4)
+        views = store.views()
+        self.assertEqual(len(views), 1)
+        self.assertEqual(views[0]['value'].tolist(), [1000.0, 1001.0, 1002.0, 1003.0])
+        self.assertEqual(views[0]['quality'].tolist(), [0, 1, 2, 0])
+        store.close()
+
+    def testWrap(self):
+        store = self.openStore(10)
+        self.fill(store, 25)
+        self.assertEqual((store.count(), store.length()), (25, 10))
+        views = store.views()
+        self.assertEqual(len(views), 2)
+        self.assertEqual(self.timestamps(views), range(15, 25))
+        # Query intervals inside either part and across the wrap
+        self.assertEqual(self.timestamps(store.query(16.0, 19.0)), [16.0, 17.0, 18.0])
+        self.assertEqual(self.timestamps(store.query(21.0, 23.5)), [21.0, 22.0, 23.0])
+        self.assertEqual(self.timestamps(store.query(18.0, 22.0)), [18.0, 19.0, 20.0, 21.0])
+        self.assertEqual(self.timestamps(store.query(0.0, 15.0)), [])
+        store.close()
+
+    def testReopen(self):
+        store = self.openStore(10)
+        self.fill(store, 13)
+        store.close()
+        # An existing store keeps its size
+        store = sst.SampleStore(self.filename, 1024 * 1024)
+        self.assertEqual((store.capacity, store.count()), (10, 13))
+        store.close()
+        reader = sst.SampleStore(self.filename, readOnly=True)
+        self.assertEqual(self.timestamps(reader.views()), range(3, 13))
+        reader.close()
+
+    def testReadOnlyMissing(self):
+        self.assertRaises(IOError, sst.SampleStore, self.filename, readOnly=True)
+
+    def testNotAStore(self):
+        with open(self.filename, 'wb') as f:
+            f.write('x' * 1000)
+        self.assertRaises(ValueError, sst.SampleStore, self.filename)
+
+    def testDecimation(self):
+        store = self.openStore(100)
+        self.fill(store, 100)
+        d = store.decimated(0.0, 100.0, maxPoints=10)
+        self.assertEqual(d['timestamp'].tolist(), range(0, 100, 10))
+        # Rounded up step, never more than maxPoints
+        d = store.decimated(0.0, 100.0, maxPoints=30)
+        self.assertEqual(d['timestamp'].tolist(), range(0, 100, 4))
+        d = store.decimated(10.0, 20.0, maxPoints=1000)
+        self.assertEqual(d['timestamp'].tolist(), range(10, 20))
+        self.assertEqual(store.decimated(200.0, 300.0).shape[0], 0)
+        store.close()
+
+    def testDecimationAcrossWrap(self):
+        # The stride continues from the older part into the newer one
+        store = self.openStore(10)
+        self.fill(store, 27)
+        d = store.decimated(0.0, 100.0, maxPoints=4)
+        self.assertEqual(d['timestamp'].tolist(), [17.0, 20.0, 23.0, 26.0])
+        store.close()
+
+    def testDecimationOfAddress(self):
+        store = self.openStore(100)
+        self.fill(store, 60, addresses=(1, 2, 3))
+        d = store.decimated(0.0, 100.0, maxPoints=5, address=2)
+        self.assertEqual(d['timestamp'].tolist(), range(1, 60, 12))
+        self.assertTrue((d['address'] == 2).all())
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
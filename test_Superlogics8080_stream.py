@@ -0,0 +1,59 @@
+'''
+Created on 18 oct 2026
+
+@author: Filip Lindau
+
+Tests of the frequency log files of Superlogics8080_stream, run with
+python -m unittest test_Superlogics8080_stream
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+import Superlogics8080_stream as sstream
+
+
+class TestBinaryLog(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'log.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def writeFile(self, data):
+        with open(self.filename, 'wb') as f:
+            f.write(data)
+
+    def testRoundTrip(self):
+        with open(self.filename, 'wb') as f:
+            writer = sstream.BinaryWriter(f)
+            writer.write(1.5, 1, 1000)
+            writer.write(2.5, 2, None)
+            writer.write(3.5, 1, 0x7fffffff)
+        r = sstream.readBinary(self.filename)
+        self.assertEqual(r['timestamp'].tolist(), [1.5, 2.5, 3.5])
+        self.assertEqual(r['address'].tolist(), [1, 2, 1])
+        self.assertEqual(r['frequency'].tolist(), [1000, -1, 0x7fffffff])
+
+    def testEmpty(self):
+        # Empty, part of the header, or only the header
+        for data in ['', sstream.binaryHeader[:10], sstream.binaryHeader]:
+            self.writeFile(data)
+            r = sstream.readBinary(self.filename)
+            self.assertEqual(len(r), 0)
+            self.assertEqual(r.dtype, sstream.binaryDtype)
+
+    def testPartialRecord(self):
+        self.writeFile(''.join((sstream.binaryHeader, sstream.binaryRecord.pack(1.0, 3, 42), '\x00' * 7)))
+        r = sstream.readBinary(self.filename)
+        self.assertEqual(r['frequency'].tolist(), [42])
+
+    def testNotALog(self):
+        self.writeFile('timestamp,address,frequency\n')
+        self.assertRaises(ValueError, sstream.readBinary, self.filename)
+
+
+if __name__ == '__main__':
+    unittest.main()